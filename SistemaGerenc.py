@@ -2,17 +2,93 @@ import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
-import io
+import time
+from collections import deque
 import pandas as pd
 from pathlib import Path
 from PIL import Image
 import shutil  # <-- Adicionado para a função de upload do professor
+from armazenamento import (
+    CacheTabela,
+    ErroFormatoCSV,
+    GravadorEmSegundoPlano,
+    RegistroAlteracoes,
+    SequenciaIDs,
+    compactar_tipos,
+    criar_armazenamento,
+    expandir_tipos,
+)
+from agregados import NOTA_APROVACAO, AgregadosTurmas
+from consultas import ErroConsulta, MotorConsultas
+from importacao import (
+    ErroImportacao,
+    exportar_usuarios,
+    importar_notas,
+    importar_usuarios,
+)
+from notas import COLUNAS_PROVAS, PoliticaNotas, motor_notas
+from indices import (
+    IndiceTrigramas,
+    IndiceUsuarios,
+    ProjecaoNivel,
+    UsuarioAmbiguo,
+    anexar_linhas,
+    converter_campos_usuario,
+    definir_valor,
+    definir_valores,
+)
 
 # --- 1. CONSTANTES E FUNÇÕES LGPD ---
 CAMINHO_ARQUIVO = "Output/SistemaAcademico.csv"
 DIR_ATIVIDADES = "atividades"
-SECAO_ALVO = "[USUARIOS]"
 CONSENT_FILE = "lgpd_consent.txt"
+# Modo de leitura do CSV: "tipado" (uma passada do read_csv com tipos e
+# decimal declarados), "pyarrow" (o mesmo com o parser do pyarrow, se
+# instalado), "paralelo" (o "tipado" dividido entre processos, para arquivos
+# com milhões de linhas), "mmap" (busca a seção direto nos bytes), "blocos"
+# (normaliza em blocos de linhas, com menos memória no pico) ou "linhas"
+MODO_LEITURA = "tipado"
+# Snapshot colunar ao lado do CSV (.feather com pyarrow, senão .npz) para
+# acelerar a primeira leitura depois que o App é aberto
+USAR_SNAPSHOT = True
+
+# Onde os usuários são persistidos: "csv" (arquivo único, regravado a cada
+# salvamento) ou "sqlite" (Output/SistemaAcademico.db, gravação por linha)
+BACKEND_ARMAZENAMENTO = "csv"
+# Backend "csv": cada salvamento só acrescenta as linhas alteradas num diário
+# (Output/SistemaAcademico.csv.diario); o CSV é regravado no logout, ao fechar
+# o App e quando as gravações ficam ESPERA_COMPACTAR_DIARIO segundos paradas
+USAR_DIARIO = True
+ESPERA_COMPACTAR_DIARIO = 5
+# Tabela em memória com tipos compactos (category nas colunas de poucos
+# valores, float32 nas notas, int32 em ID/IDADE); ver compactar_tipos.
+# Desligado por padrão: economiza memória em tabelas grandes, mas cada edição
+# precisa respeitar esses tipos (definir_valor/definir_valores)
+USAR_TIPOS_COMPACTOS = False
+# Pesos e arredondamento da MEDIA por curso; os demais usam a política padrão
+# (NP1 * 4 + NP2 * 4 + PIM * 2) / 10 com duas casas. Ex.:
+# {"PYTHON": PoliticaNotas(pesos={"NP1": 3, "NP2": 3, "PIM": 4}, casas=1)}
+POLITICAS_NOTAS = {}
+# De quanto em quanto tempo (ms) a interface confere as gravações concluídas
+INTERVALO_VERIFICACAO_GRAVACOES = 200
+# Busca enquanto digita: espera (ms) depois da última tecla antes de filtrar
+ATRASO_BUSCA_DIGITADA = 250
+# Acima disso, um termo que estende o anterior é buscado pelo índice de
+# trigramas (e cruzado com o resultado anterior) em vez de conferir linha a linha
+LIMITE_REFINAR_BUSCA = 5000
+# Mostra a latência de cada busca no canto da janela (alternar com F12)
+MOSTRAR_LATENCIA_BUSCA = False
+
+# Cache do DataFrame lido do CSV (evita reler o arquivo a cada recarga)
+cache_tabela = CacheTabela(modo=MODO_LEITURA, usar_snapshot=USAR_SNAPSHOT)
+armazenamento = criar_armazenamento(
+    BACKEND_ARMAZENAMENTO, CAMINHO_ARQUIVO, cache_tabela, usar_diario=USAR_DIARIO
+)
+# Próximos IDs de usuário: o mesmo arquivo .seq do programa em C
+# (SISTEMA_ACADEMICO_SEQ ou Output/SistemaAcademico.csv.seq)
+sequencia_ids = SequenciaIDs()
+for curso_politica, politica_notas in POLITICAS_NOTAS.items():
+    motor_notas.definir_politica(curso_politica, politica_notas)
 
 
 def check_lgpd_consent():
@@ -69,86 +145,18 @@ class LGPDPopup(ctk.CTkToplevel):
 
 
 # === FUNÇÃO DE CARREGAMENTO
-def carregar_tabela(caminho_arquivo):
-    if not os.path.exists(caminho_arquivo):
-        messagebox.showerror(
-            "Erro de Leitura",
-            f"Arquivo CSV não encontrado no caminho: {caminho_arquivo}",
-        )
-        return pd.DataFrame()
+def carregar_tabela():
+    """Carrega a tabela de usuários pelo backend configurado."""
     try:
-        with open(caminho_arquivo, "r", encoding="utf-8", errors="ignore") as f:
-            lines = f.readlines()
-
-        start_index = -1
-        end_index = -1
-        for i, line in enumerate(lines):
-            if line.strip().upper() == SECAO_ALVO:
-                start_index = i + 1
-                break
-        if start_index == -1:
-            messagebox.showerror(
-                "Erro de Formato",
-                f"Não foi possível encontrar a seção {SECAO_ALVO} no arquivo {caminho_arquivo}.",
-            )
-            return pd.DataFrame()
-
-        for i in range(start_index, len(lines)):
-            if lines[i].strip().startswith("["):
-                end_index = i
-                break
-        if end_index == -1:
-            end_index = len(lines)
-
-        usuarios_lines = lines[start_index:end_index]
-        usuarios_lines_clean = [line for line in usuarios_lines if line.strip()]
-
-        header_default = (
-            "id;nome;email;senha;nivel;curso;turma;idade;np1;np2;pim;media;atividade"
-        )
-        if len(usuarios_lines_clean) <= 1:
-            header_line = (
-                usuarios_lines_clean[0] if usuarios_lines_clean else header_default
-            )
-            colunas = [col.strip() for col in header_line.split(";")]
-            return pd.DataFrame(columns=colunas)
-
-        header_line = usuarios_lines_clean[0]
-        colunas = [col.strip() for col in header_line.split(";")]
-        data_lines = "".join(usuarios_lines_clean[1:])
-        csv_file_like = io.StringIO(data_lines)
-        df = pd.read_csv(csv_file_like, sep=";", header=None, names=colunas)
-
-        df.columns = df.columns.str.strip().str.upper()
-
-        column_map = {"TURMA": "ID_TURMAS", "ATIVIDADE": "STATUS DO ALUNO"}
-        df.rename(columns=column_map, inplace=True)
-
-        cols_numericas = ["NP1", "NP2", "PIM", "MEDIA"]
-        for col in cols_numericas:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.replace(",", ".", regex=False)
-                df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-        cols_inteiras = ["ID", "IDADE"]
-        for col in cols_inteiras:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
-
-        if "NOME" in df.columns:
-            df["NOME"] = df["NOME"].astype(str).str.upper()
-        if "EMAIL" in df.columns:
-            df["EMAIL"] = df["EMAIL"].astype(str).str.lower()
-        if "SENHA" in df.columns:
-            df["SENHA"] = df["SENHA"].astype(str)
-        if "NIVEL" in df.columns:
-            df["NIVEL"] = df["NIVEL"].astype(str).str.upper()
-
-        if all(col in df.columns for col in ["NP1", "NP2", "PIM"]):
-            df["MEDIA"] = (df["NP1"] * 4 + df["NP2"] * 4 + df["PIM"] * 2) / 10
-            df["MEDIA"] = df["MEDIA"].round(2)
-
-        return df
+        # No backend CSV, o cache só relê o arquivo quando ele mudou em disco
+        df = armazenamento.carregar()
+        return compactar_tipos(df) if USAR_TIPOS_COMPACTOS else df
+    except FileNotFoundError as e:
+        messagebox.showerror("Erro de Leitura", str(e))
+        return pd.DataFrame()
+    except ErroFormatoCSV as e:
+        messagebox.showerror("Erro de Formato", str(e))
+        return pd.DataFrame()
     except Exception as e:
         messagebox.showerror(
             "Erro de Leitura", f"Não foi possível ler o arquivo CSV.\nErro: {e}"
@@ -418,6 +426,14 @@ class GerenciarTurmasFrame(ctk.CTkFrame):
 
         self.frame_filtros_acoes.grid_columnconfigure(4, weight=1)  # Espaçador
 
+        # Totais do curso filtrado (lidos dos agregados, sem groupby)
+        self.label_resumo_curso = ctk.CTkLabel(
+            self.frame_filtros_acoes, text="", text_color="#B0B6BB"
+        )
+        self.label_resumo_curso.grid(
+            row=1, column=0, columnspan=4, padx=10, pady=(0, 5), sticky="w"
+        )
+
         if self.main_app.current_user.get("NIVEL") == "PROFESSOR":
             botao_enviar_atividade = ctk.CTkButton(
                 self.frame_filtros_acoes,
@@ -440,54 +456,43 @@ class GerenciarTurmasFrame(ctk.CTkFrame):
             return df_full[column_name].astype(str).str.strip().unique().tolist()
         return []
 
-    def gerar_dados_turmas(self):
-        """Gera um DataFrame de resumo com estatísticas por Turma."""
-        df_full = self.main_app.data_frame_full
-        if df_full is None or df_full.empty:
-            return pd.DataFrame(
-                columns=["TURMA", "CURSO", "TOTAL ALUNOS", "MÉDIA GERAL"]
-            )
-
-        df_alunos = df_full[df_full["NIVEL"] == "ALUNO"].copy()
-
-        if df_alunos.empty or "ID_TURMAS" not in df_alunos.columns:
-            return pd.DataFrame(
-                columns=["TURMA", "CURSO", "TOTAL ALUNOS", "MÉDIA GERAL"]
-            )
-
-        # Agrupar e calcular estatísticas
-        df_resumo = (
-            df_alunos.groupby("ID_TURMAS")
-            .agg({"ID": "count", "MEDIA": "mean", "CURSO": "first"})
-            .reset_index()
-        )
-
-        df_resumo.rename(
-            columns={
-                "ID_TURMAS": "TURMA",
-                "ID": "TOTAL ALUNOS",
-                "MEDIA": "MÉDIA GERAL",
-            },
-            inplace=True,
-        )
-
-        # Formatação
-        df_resumo["MÉDIA GERAL"] = df_resumo["MÉDIA GERAL"].round(2)
-        df_resumo["TURMA"] = df_resumo["TURMA"].astype(str)
-        df_resumo.sort_values(by="TURMA", inplace=True)
-        df_resumo.reset_index(drop=True, inplace=True)
-        return df_resumo
+    def gerar_dados_turmas(self, curso=None):
+        """Resumo por Turma (de um curso, se informado) lido dos agregados do App."""
+        return self.main_app.agregados_turmas.tabela(curso)
 
     def filtrar_turmas(self, *args):
         """Aplica o filtro de curso e atualiza a tabela."""
         curso_selecionado = self.combo_filtro_curso.get()
-        df_filtrado = self.gerar_dados_turmas()
-
-        if curso_selecionado != "Todos os Cursos":
-            df_filtrado = df_filtrado[df_filtrado["CURSO"] == curso_selecionado.upper()]
-
+        if curso_selecionado == "Todos os Cursos":
+            df_filtrado = self.gerar_dados_turmas()
+        else:
+            df_filtrado = self.gerar_dados_turmas(curso_selecionado.upper())
+        self._atualizar_resumo_curso(curso_selecionado)
         self.mostrar_tabela_turmas(df_filtrado)
 
+    def _atualizar_resumo_curso(self, curso_selecionado):
+        agregados = self.main_app.agregados_turmas
+        if curso_selecionado == "Todos os Cursos":
+            estatisticas, nome = agregados.geral(), "Instituição"
+        else:
+            estatisticas = agregados.cursos.get(curso_selecionado.upper())
+            nome = curso_selecionado
+        if estatisticas is None or not estatisticas.n:
+            self.label_resumo_curso.configure(text="")
+            return
+        mediana, p10, p90 = estatisticas.quantis([0.5, 0.1, 0.9])
+        desvio = estatisticas.desvio
+        self.label_resumo_curso.configure(
+            text=(
+                f"📊 {nome}: {estatisticas.n} aluno(s) | "
+                f"média {estatisticas.media:.2f}"
+                + ("" if pd.isna(desvio) else f" | desvio {desvio:.2f}")
+                + f" | mediana {mediana:.2f} | P10 {p10:.2f} | P90 {p90:.2f}"
+                f" | aprovação {estatisticas.taxa_aprovacao:.1f}%"
+                f" | {estatisticas.distribuicao()}"
+            )
+        )
+
     def limpar_filtros(self):
         """Limpa o filtro e recarrega a tabela completa de turmas."""
         self.combo_filtro_curso.set("Todos os Cursos")
@@ -496,14 +501,17 @@ class GerenciarTurmasFrame(ctk.CTkFrame):
     def atualizar_tabela_turmas(self, force_reload_csv=False):
         """Recarrega os dados do CSV (se necessário), gera o resumo e exibe a tabela."""
         if force_reload_csv:
-            self.main_app.data_frame_full = carregar_tabela(CAMINHO_ARQUIVO)
+            if not self.main_app.recarregar_dados(
+                lambda: self.atualizar_tabela_turmas(force_reload_csv=True)
+            ):
+                return
             # Atualiza a lista de cursos no combobox após recarregar
             cursos = ["Todos os Cursos"] + self._get_unique_values("CURSO")
             self.combo_filtro_curso.configure(values=cursos)
             self.combo_filtro_curso.set("Todos os Cursos")
 
         self.df_turmas = self.gerar_dados_turmas()
-        self.mostrar_tabela_turmas(self.df_turmas)
+        self.filtrar_turmas()
 
     def mostrar_tabela_turmas(self, df):
         """Exibe o DataFrame de Turmas na Treeview."""
@@ -552,6 +560,10 @@ class GerenciarTurmasFrame(ctk.CTkFrame):
                 col_width = 150
             elif col == "TOTAL ALUNOS":
                 col_width = 120
+            elif col in ("MEDIANA", "P10", "P90"):
+                col_width = 80
+            elif col == "APROVAÇÃO (%)":
+                col_width = 110
 
             self.tabela_turmas_widget.column(
                 col, anchor="center", width=col_width, minwidth=50
@@ -574,14 +586,21 @@ class GerenciarTurmasFrame(ctk.CTkFrame):
                     row_list[j] = value.upper()
             # --- FIM DA ALTERAÇÃO ---
 
-            # Formatação de campos numéricos (MÉDIA GERAL)
-            if "MÉDIA GERAL" in colunas:
-                media_index = colunas.index("MÉDIA GERAL")
-                try:
-                    media_valor = float(row_list[media_index])
-                    row_list[media_index] = f"{media_valor:.2f}"
-                except (ValueError, TypeError):
-                    pass
+            # Formatação de campos numéricos (notas com 2 casas, aprovação com 1)
+            for col_nota, formato in (
+                ("MÉDIA GERAL", "{:.2f}"),
+                ("MEDIANA", "{:.2f}"),
+                ("P10", "{:.2f}"),
+                ("P90", "{:.2f}"),
+                ("APROVAÇÃO (%)", "{:.1f}"),
+            ):
+                if col_nota in colunas:
+                    media_index = colunas.index(col_nota)
+                    try:
+                        media_valor = float(row_list[media_index])
+                        row_list[media_index] = formato.format(media_valor)
+                    except (ValueError, TypeError):
+                        pass
 
             self.tabela_turmas_widget.insert("", "end", iid=i, values=row_list)
 
@@ -751,6 +770,35 @@ class MainApp(ctk.CTk):
 
         self.data_frame_full = None
         self.data_frame = pd.DataFrame()
+        # Linhas inseridas/atualizadas/excluídas desde o último salvamento
+        self.alteracoes = RegistroAlteracoes()
+        # E-mail/nome -> ID e ID -> rótulo da linha em data_frame_full
+        self.indice_usuarios = IndiceUsuarios()
+        # Linhas/colunas visíveis para o nível do usuário logado (rótulos)
+        self.projecao = None
+        # Coluna -> IndiceTrigramas do filtro geral (montado no primeiro uso)
+        self.indices_busca = {}
+        # Consultas compostas (CURSO = X E MEDIA < 5 ...) com cache por versão
+        self.consultas = MotorConsultas(self.indice_usuarios, self._indice_busca)
+        # Contagem/soma/soma dos quadrados da MEDIA por turma e por curso
+        self.agregados_turmas = AgregadosTurmas()
+        # Incrementada a cada alteração/recarga de data_frame_full
+        self.versao_dados = 0
+        # Busca enquanto digita: after() pendente, instante da última tecla e
+        # (coluna, termo, rótulos, versão, projeção) do resultado exibido
+        self._busca_agendada = None
+        self._instante_tecla = None
+        self._busca_anterior = None
+        self.latencias_busca = deque(maxlen=100)
+        self.label_latencia_busca = None
+        self.mostrar_latencia_busca = MOSTRAR_LATENCIA_BUSCA
+        self.ultima_gravacao = None
+        # Os salvamentos rodam numa thread; o resultado volta pelo after()
+        self.gravador = GravadorEmSegundoPlano(
+            armazenamento, compactar_ocioso=ESPERA_COMPACTAR_DIARIO
+        )
+        self.gravacoes_concluidas = 0
+        self.label_gravacoes = None
         self.tabela_widget = None
         self.frame_tabela_dados = None
         self.current_user = None
@@ -758,6 +806,10 @@ class MainApp(ctk.CTk):
         self.container = ctk.CTkFrame(self)
         self.container.pack(fill="both", expand=True)
 
+        self.protocol("WM_DELETE_WINDOW", self.fechar_app)
+        self.bind("<F12>", self._alternar_latencia_busca)
+        self.after(INTERVALO_VERIFICACAO_GRAVACOES, self._verificar_gravacoes)
+
     def start_app_with_lgpd_check(self):
         """Verifica o consentimento LGPD antes de iniciar o app."""
         self.center_window(400, 480)
@@ -793,6 +845,12 @@ class MainApp(ctk.CTk):
         self.container.grid_columnconfigure(0, weight=1)
         self.container.grid_rowconfigure(0, weight=1)
 
+    def sair(self):
+        """Logout: grava o que estiver pendente antes de voltar ao login."""
+        self.gravador.aguardar()
+        self._consolidar_armazenamento()
+        self.show_login()
+
     def show_main_content(self):
         """Mostra a tela principal após o login."""
         for widget in self.container.winfo_children():
@@ -813,6 +871,7 @@ class MainApp(ctk.CTk):
         banner_frame.pack(fill="x", padx=10, pady=(10, 5))
         banner_frame.grid_columnconfigure(0, weight=1)
         banner_frame.grid_columnconfigure(1, weight=0)
+        banner_frame.grid_columnconfigure(2, weight=0)
         info_text = f"👤 Logado como: {user_name} (ID: {user_id}) | Nível: {user_level}"
         info_label = ctk.CTkLabel(
             banner_frame,
@@ -821,10 +880,16 @@ class MainApp(ctk.CTk):
             text_color="#B0B6BB",
         )
         info_label.grid(row=0, column=0, padx=20, pady=5, sticky="w")
+        # Indicador das gravações em segundo plano
+        self.label_gravacoes = ctk.CTkLabel(
+            banner_frame, text="", font=("Arial", 12), text_color="#B0B6BB"
+        )
+        self.label_gravacoes.grid(row=0, column=1, padx=10, pady=5, sticky="e")
+        self._atualizar_indicador_gravacoes()
         logout_button = ctk.CTkButton(
-            banner_frame, text="Sair", command=self.show_login, width=80, fg_color="red"
+            banner_frame, text="Sair", command=self.sair, width=80, fg_color="red"
         )
-        logout_button.grid(row=0, column=1, padx=(0, 10), pady=5, sticky="e")
+        logout_button.grid(row=0, column=2, padx=(0, 10), pady=5, sticky="e")
 
     def handle_forgot_password(self):
         messagebox.showinfo(
@@ -835,7 +900,7 @@ class MainApp(ctk.CTk):
 
     def authenticate_user(self, username_or_email, password):
         if self.data_frame_full is None:
-            self.data_frame_full = carregar_tabela(CAMINHO_ARQUIVO)
+            self.recarregar_dados()
         df_auth = self.data_frame_full
 
         if df_auth is None or df_auth.empty:
@@ -853,18 +918,19 @@ class MainApp(ctk.CTk):
             )
             return False
 
-        input_lower = username_or_email.strip().lower()
-        user_row = df_auth[
-            (df_auth["EMAIL"] == input_lower)
-            | (df_auth["NOME"] == username_or_email.strip().upper())
-        ]
+        try:
+            user = self.indice_usuarios.buscar_usuario(df_auth, username_or_email)
+        except UsuarioAmbiguo as e:
+            messagebox.showerror(
+                "Login Falhou",
+                f"{e}\nEntre com o e-mail para identificar o usuário.",
+            )
+            return False
 
-        if user_row.empty:
+        if user is None:
             messagebox.showerror("Login Falhou", "Usuário não encontrado.")
             return False
 
-        user = user_row.iloc[0]
-
         if str(user["SENHA"]) == str(password):
             self.current_user = user
             messagebox.showinfo("Sucesso", f"Bem-vindo(a), {user['NOME']}!")
@@ -874,13 +940,149 @@ class MainApp(ctk.CTk):
             messagebox.showerror("Login Falhou", "Senha incorreta.")
             return False
 
+    def recarregar_dados(self, repetir=None):
+        """
+        Relê a tabela do armazenamento, descartando alterações não salvas.
+
+        Com gravações ainda em andamento, reler traria uma versão antiga; em
+        vez de travar a interface esperando, agenda `repetir` com self.after()
+        e devolve False (True quando a tabela foi relida).
+        """
+        if self.gravador.pendentes:
+            if repetir is not None:
+                self.after(INTERVALO_VERIFICACAO_GRAVACOES, repetir)
+            return False
+        self.data_frame_full = carregar_tabela()
+        self.indice_usuarios.reconstruir(self.data_frame_full)
+        self.projecao = None  # Remontada na próxima exibição da tabela
+        self.indices_busca = {}
+        self.consultas.reconstruir(self.data_frame_full)
+        self.agregados_turmas.reconstruir(self.data_frame_full)
+        self.versao_dados += 1
+        self.alteracoes.limpar()
+        return True
+
+    # --- Registro das alterações feitas em data_frame_full ---
+    # (chamados depois de o DataFrame ser alterado; mantêm também os índices)
+    def _registrar_insercao(self, user_id):
+        self.alteracoes.marcar_inserido(user_id)
+        self.versao_dados += 1
+        self.indice_usuarios.inserir(self.data_frame_full, user_id)
+        if self.projecao is not None:
+            self.projecao.inserir(self.data_frame_full, self._rotulo_usuario(user_id))
+        self._atualizar_indices_busca(self._rotulo_usuario(user_id))
+        self.consultas.marcar_alterada(self._rotulo_usuario(user_id))
+        self.agregados_turmas.inserir(
+            self.data_frame_full, self._rotulo_usuario(user_id)
+        )
+
+    def _registrar_atualizacao(self, user_id):
+        self.alteracoes.marcar_atualizado(user_id)
+        self.versao_dados += 1
+        self.indice_usuarios.atualizar(self.data_frame_full, user_id)
+        if self.projecao is not None:
+            self.projecao.atualizar(self.data_frame_full, self._rotulo_usuario(user_id))
+        self._atualizar_indices_busca(self._rotulo_usuario(user_id))
+        self.consultas.marcar_alterada(self._rotulo_usuario(user_id))
+        self.agregados_turmas.atualizar(
+            self.data_frame_full, self._rotulo_usuario(user_id)
+        )
+
+    def _registrar_exclusao(self, user_id):
+        self.alteracoes.marcar_excluido(user_id)
+        self.versao_dados += 1
+        rotulo = self.indice_usuarios.remover(user_id)
+        if self.projecao is not None:
+            self.projecao.remover(rotulo)
+        for indice in self.indices_busca.values():
+            indice.remover(rotulo)
+        self.consultas.marcar_alterada(rotulo)
+        self.agregados_turmas.remover(rotulo)
+
+    def aplicar_politica_notas(self, curso, politica):
+        """
+        Troca a política de notas de um curso (curso=None: a padrão) e
+        recalcula a MEDIA da tabela inteira numa passada. Só as linhas cuja
+        MEDIA mudou ficam pendentes para o próximo "Salvar".
+        """
+        motor_notas.definir_politica(curso, politica)
+        if self.data_frame_full is None or self.data_frame_full.empty:
+            return pd.Index([])
+        alteradas = motor_notas.recalcular_todos(self.data_frame_full, self.alteracoes)
+        self._registrar_notas_em_lote(alteradas)
+        return alteradas
+
+    def _registrar_insercoes_em_lote(self, ids):
+        """
+        Muitos usuários anexados de uma vez (as inserções já foram marcadas):
+        remonta índices e resumos uma vez em vez de passar por
+        _registrar_insercao para cada um.
+        """
+        if not len(ids):
+            return
+        self.indice_usuarios.reconstruir(self.data_frame_full)
+        self.projecao = None
+        self.indices_busca = {}
+        self.consultas.reconstruir(self.data_frame_full)
+        self.agregados_turmas.reconstruir(self.data_frame_full)
+        self.versao_dados += 1
+
+    def _registrar_notas_em_lote(self, rotulos):
+        """
+        Notas/MEDIA de muitas linhas mudaram de uma vez (as alterações já
+        foram marcadas): remonta o que depende delas em vez de repassar
+        linha a linha pelos _registrar_*.
+        """
+        if not len(rotulos):
+            return
+        self.consultas.reconstruir(self.data_frame_full)
+        self.agregados_turmas.reconstruir(self.data_frame_full)
+        for coluna in [*COLUNAS_PROVAS, "MEDIA"]:
+            self.indices_busca.pop(coluna, None)
+        self.versao_dados += 1
+
+    def _atualizar_indices_busca(self, rotulo):
+        if rotulo is None:
+            return
+        for coluna, indice in self.indices_busca.items():
+            indice.atualizar(rotulo, self.data_frame_full.at[rotulo, coluna])
+
+    def _indice_busca(self, coluna):
+        """Índice de trigramas da coluna, remontado quando acumula muitas edições."""
+        indice = self.indices_busca.get(coluna)
+        if indice is None or indice.precisa_reconstruir:
+            indice = IndiceTrigramas(self.data_frame_full[coluna])
+            self.indices_busca[coluna] = indice
+        return indice
+
+    def _projecao_atual(self):
+        """Projeção do nível logado, montada uma vez por carga dos dados."""
+        nivel = self.current_user["NIVEL"]
+        user_id = self.current_user["ID"] if nivel == "ALUNO" else None
+        if (
+            self.projecao is None
+            or self.projecao.nivel != nivel
+            or self.projecao.user_id != user_id
+        ):
+            self.projecao = ProjecaoNivel(nivel, user_id).reconstruir(
+                self.data_frame_full
+            )
+        return self.projecao
+
+    def _rotulo_usuario(self, user_id):
+        """Rótulo (para .loc) da linha do ID em data_frame_full, ou None."""
+        return self.indice_usuarios.rotulo(self.data_frame_full, user_id)
+
     def _gerar_novo_id(self):
+        return sequencia_ids.reservar(1, obter_maximo=self._maior_id_carregado)[0]
+
+    def _maior_id_carregado(self):
+        """Maior ID da tabela (só usado para iniciar a sequência de IDs)."""
         if self.data_frame_full is None or self.data_frame_full.empty:
-            return 1
+            return 0
         if "ID" in self.data_frame_full.columns:
-            max_id = self.data_frame_full["ID"].max()
-            return int(max_id) + 1
-        return 1
+            return int(self.data_frame_full["ID"].max())
+        return 0
 
     def create_main_tabs(self, master):
         style = ttk.Style(self)
@@ -1061,6 +1263,31 @@ class MainApp(ctk.CTk):
             command=lambda: self.atualizar_tabela(reload_csv=True),
         ).grid(row=0, column=10, padx=5, pady=5, sticky="ew")
 
+        # Com o banco SQLite, o CSV vira formato de troca com o programa em C
+        if BACKEND_ARMAZENAMENTO == "sqlite":
+            ctk.CTkButton(
+                master_frame,
+                text="📥 Importar CSV",
+                command=self.importar_csv_para_banco,
+            ).grid(row=1, column=0, padx=5, pady=5, sticky="ew")
+            ctk.CTkButton(
+                master_frame,
+                text="📤 Exportar CSV",
+                command=self.exportar_banco_para_csv,
+            ).grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+
+        ctk.CTkButton(
+            master_frame,
+            text="📥 Importar Usuários em Lote",
+            command=self.importar_usuarios_em_lote,
+            fg_color="#007BFF",
+        ).grid(row=1, column=2, padx=5, pady=5, sticky="ew")
+        ctk.CTkButton(
+            master_frame,
+            text="📤 Exportar Usuários",
+            command=self.exportar_usuarios_em_lote,
+        ).grid(row=1, column=3, padx=5, pady=5, sticky="ew")
+
     def _criar_controles_coordenador(self, master_frame):
         # Aumentamos o número de colunas para acomodar o novo botão
         for i in range(6):
@@ -1109,7 +1336,7 @@ class MainApp(ctk.CTk):
 
     def _criar_controles_professor(self, master_frame):
         # Aumentamos o número de colunas para acomodar os novos botões
-        for i in range(4):
+        for i in range(5):
             master_frame.grid_columnconfigure(i, weight=1)
 
         ctk.CTkButton(
@@ -1141,6 +1368,13 @@ class MainApp(ctk.CTk):
             command=lambda: self.atualizar_tabela(reload_csv=True),
         ).grid(row=0, column=3, padx=5, pady=5, sticky="ew")
 
+        ctk.CTkButton(
+            master_frame,
+            text="📥 Importar Notas",
+            command=self.importar_notas_planilha,
+            fg_color="#28A745",
+        ).grid(row=0, column=4, padx=5, pady=5, sticky="ew")
+
     # --- FIM DA SEÇÃO DE HELPER DE CONTROLES ---
 
     def abrir_janela_meus_dados(self):
@@ -1235,13 +1469,20 @@ class MainApp(ctk.CTk):
             colunas_filtro.extend(colunas_filtradas)
 
         self.combo_filtro_coluna = ctk.CTkComboBox(
-            master_frame, values=colunas_filtro, width=180
+            master_frame,
+            values=colunas_filtro,
+            width=180,
+            command=lambda _: self._agendar_busca_digitada(),
         )
         self.combo_filtro_coluna.grid(row=0, column=1, padx=5, pady=10, sticky="w")
         self.entrada_filtro_geral = ctk.CTkEntry(
             master_frame, placeholder_text="Digite o valor...", width=180
         )
         self.entrada_filtro_geral.grid(row=0, column=2, padx=5, pady=10, sticky="w")
+        # Filtra enquanto digita (o botão Buscar continua funcionando)
+        self.entrada_filtro_geral.bind(
+            "<KeyRelease>", lambda _: self._agendar_busca_digitada()
+        )
         ctk.CTkButton(
             master_frame, text="Buscar", command=self.filtrar_geral, width=80
         ).grid(row=0, column=3, padx=5, pady=10, sticky="w")
@@ -1249,6 +1490,23 @@ class MainApp(ctk.CTk):
             master_frame, text="Limpar Filtros", command=self.limpar_filtros
         ).grid(row=0, column=4, padx=(20, 10), pady=10, sticky="w")
 
+        # Consulta composta, ex.: CURSO = PYTHON E MEDIA < 5 E STATUS = ATIVO
+        ctk.CTkLabel(master_frame, text="Consulta:").grid(
+            row=1, column=0, padx=(10, 5), pady=(0, 10), sticky="w"
+        )
+        self.entrada_consulta = ctk.CTkEntry(
+            master_frame,
+            placeholder_text="CURSO = PYTHON E MEDIA < 5 E STATUS = ATIVO",
+            width=370,
+        )
+        self.entrada_consulta.grid(
+            row=1, column=1, columnspan=2, padx=5, pady=(0, 10), sticky="ew"
+        )
+        self.entrada_consulta.bind("<Return>", lambda _: self.executar_consulta())
+        ctk.CTkButton(
+            master_frame, text="Consultar", command=self.executar_consulta, width=80
+        ).grid(row=1, column=3, padx=5, pady=(0, 10), sticky="w")
+
     def excluir_usuario(self):
         if self.current_user["NIVEL"] != "ADMINISTRADOR":
             messagebox.showwarning(
@@ -1270,14 +1528,12 @@ class MainApp(ctk.CTk):
                 f"Tem certeza que deseja EXCLUIR o usuário ID {user_id} ({user_nome})? Esta ação é permanente.",
             ):
                 return
-            idx_full_list = self.data_frame_full[
-                self.data_frame_full["ID"] == user_id
-            ].index
-            if not idx_full_list.empty:
-                self.data_frame_full.drop(idx_full_list, inplace=True)
-                self.salvar_dados()
-                messagebox.showinfo(
-                    "Sucesso", f"Usuário ID {user_id} excluído e arquivo CSV salvo."
+            idx_full = self._rotulo_usuario(user_id)
+            if idx_full is not None:
+                self.data_frame_full.drop(idx_full, inplace=True)
+                self._registrar_exclusao(user_id)
+                self.salvar_dados(
+                    ("Sucesso", f"Usuário ID {user_id} excluído e arquivo CSV salvo.")
                 )
             else:
                 messagebox.showwarning(
@@ -1320,6 +1576,147 @@ class MainApp(ctk.CTk):
             reload_csv=False, general_filter_text=texto, filter_column=coluna
         )
 
+    def executar_consulta(self):
+        """Mostra as linhas visíveis que satisfazem a expressão da consulta."""
+        if self.current_user["NIVEL"] not in [
+            "ADMINISTRADOR",
+            "COORDENADOR",
+            "PROFESSOR",
+        ]:
+            messagebox.showwarning(
+                "Permissão Negada",
+                "Consultas são exclusivas para Admin, Coordenador ou Professor.",
+            )
+            return
+        if self.data_frame_full is None or self.data_frame_full.empty:
+            return
+        projecao = self._projecao_atual()
+        colunas = projecao.colunas(self.data_frame_full)
+        try:
+            # Só as colunas que o nível enxerga podem aparecer na expressão
+            encontrados = self.consultas.consultar(
+                self.data_frame_full,
+                self.entrada_consulta.get(),
+                colunas_permitidas=colunas,
+            )
+        except ErroConsulta as e:
+            messagebox.showerror("Consulta inválida", str(e))
+            return
+        rotulos = projecao.rotulos()
+        rotulos = rotulos[rotulos.isin(encontrados)]
+        self._busca_anterior = None
+        self.data_frame = self.data_frame_full.loc[rotulos, colunas].reset_index(
+            drop=True
+        )
+        self.mostrar_tabela(self.data_frame)
+
+    # --- Busca enquanto digita ---
+    def _agendar_busca_digitada(self):
+        """Reinicia a espera a cada tecla; só a última dispara a busca."""
+        self._instante_tecla = time.perf_counter()
+        if self._busca_agendada is not None:
+            self.after_cancel(self._busca_agendada)
+        self._busca_agendada = self.after(
+            ATRASO_BUSCA_DIGITADA, self._executar_busca_digitada
+        )
+
+    def _executar_busca_digitada(self):
+        self._busca_agendada = None
+        if (
+            self.data_frame_full is None
+            or self.data_frame_full.empty
+            or not self.entrada_filtro_geral.winfo_exists()  # Tela já trocada
+        ):
+            return
+        coluna = self.combo_filtro_coluna.get()
+        termo = self.entrada_filtro_geral.get().strip().lower()
+        projecao = self._projecao_atual()
+        colunas = projecao.colunas(self.data_frame_full)
+        if termo and coluna not in colunas:
+            return  # Ainda sem coluna escolhida
+        anterior = self._busca_anterior
+        mesmo_contexto = (
+            anterior is not None
+            and anterior[0] == coluna
+            and anterior[3] == self.versao_dados
+            and anterior[4] is projecao
+        )
+        if mesmo_contexto and anterior[1] == termo:
+            return  # Tecla que não mudou o texto (setas, Shift...)
+
+        inicio = time.perf_counter()
+        if not termo:
+            rotulos, modo = projecao.rotulos(), "sem filtro"
+        elif mesmo_contexto and termo.startswith(anterior[1]):
+            # O termo só cresceu: o resultado novo está contido no anterior
+            indice = self._indice_busca(coluna)
+            if len(anterior[2]) <= LIMITE_REFINAR_BUSCA or len(termo) < 3:
+                rotulos = indice.refinar(anterior[2], termo)
+            else:
+                encontrados = indice.buscar(termo)
+                rotulos = anterior[2][anterior[2].isin(encontrados)]
+            modo = "refinada"
+        else:
+            rotulos = projecao.rotulos()
+            encontrados = self._indice_busca(coluna).buscar(termo)
+            rotulos = rotulos[rotulos.isin(encontrados)]
+            modo = "completa"
+        consulta = time.perf_counter() - inicio
+
+        self._busca_anterior = (coluna, termo, rotulos, self.versao_dados, projecao)
+        self.data_frame = self.data_frame_full.loc[rotulos, colunas].reset_index(
+            drop=True
+        )
+        self.mostrar_tabela(self.data_frame)
+        fim = time.perf_counter()
+        self._registrar_latencia_busca(
+            total=fim - self._instante_tecla,
+            consulta=consulta,
+            tabela=fim - inicio - consulta,
+            linhas=len(rotulos),
+            modo=modo,
+        )
+
+    def _registrar_latencia_busca(self, **medicao):
+        self.latencias_busca.append(medicao)
+        if self.mostrar_latencia_busca:
+            self._atualizar_label_latencia_busca()
+
+    def _alternar_latencia_busca(self, event=None):
+        self.mostrar_latencia_busca = not self.mostrar_latencia_busca
+        if self.mostrar_latencia_busca:
+            self._atualizar_label_latencia_busca()
+        elif self.label_latencia_busca is not None:
+            self.label_latencia_busca.destroy()
+            self.label_latencia_busca = None
+
+    def _atualizar_label_latencia_busca(self):
+        """Sobreposição de depuração: última busca e média das recentes."""
+        if (
+            self.label_latencia_busca is None
+            or not self.label_latencia_busca.winfo_exists()
+        ):
+            self.label_latencia_busca = ctk.CTkLabel(
+                self, text="", font=("Consolas", 11), fg_color="#222222"
+            )
+            self.label_latencia_busca.place(relx=1.0, rely=1.0, anchor="se")
+        if not self.latencias_busca:
+            texto = "busca: sem medições"
+        else:
+            ultima = self.latencias_busca[-1]
+            media = sum(m["total"] for m in self.latencias_busca) / len(
+                self.latencias_busca
+            )
+            texto = (
+                f"busca {ultima['modo']}: {ultima['linhas']} linhas | "
+                f"tecla→tela {ultima['total'] * 1000:.0f} ms "
+                f"(consulta {ultima['consulta'] * 1000:.1f} ms, "
+                f"tabela {ultima['tabela'] * 1000:.0f} ms) | "
+                f"média {media * 1000:.0f} ms em {len(self.latencias_busca)}"
+            )
+        self.label_latencia_busca.configure(text=texto)
+        self.label_latencia_busca.lift()
+
     def limpar_filtros(self):
         if self.current_user["NIVEL"] in ["ADMINISTRADOR", "COORDENADOR", "PROFESSOR"]:
             self.combo_filtro_coluna.set("Filtrar por Coluna...")
@@ -1338,65 +1735,37 @@ class MainApp(ctk.CTk):
         general_filter_text=None,
         filter_column=None,
     ):
-        if reload_csv:
-            self.data_frame_full = carregar_tabela(CAMINHO_ARQUIVO)
+        self._busca_anterior = None  # A tabela exibida deixa de ser a da busca
+        if reload_csv and not self.recarregar_dados(
+            lambda: self.atualizar_tabela(
+                reload_csv, filter_status, general_filter_text, filter_column
+            )
+        ):
+            return  # Refeita quando as gravações pendentes terminarem
         if self.data_frame_full is None or self.data_frame_full.empty:
             self.data_frame = pd.DataFrame()
             self.mostrar_tabela(self.data_frame)
             return
 
-        df_display = self.data_frame_full.copy()
+        df_full = self.data_frame_full
         user_level = self.current_user["NIVEL"]
-        columns_to_drop = []
-        rows_filter = None
-
-        if user_level == "ALUNO":
-            user_id = self.current_user["ID"]
-            rows_filter = df_display["ID"] == user_id
-            columns_to_drop.extend(
-                ["STATUS DO ALUNO", "SENHA", "ID_TURMAS", "EMAIL", "IDADE", "NIVEL"]
-            )
-        elif user_level == "PROFESSOR":
-            rows_filter = df_display["NIVEL"] == "ALUNO"
-            columns_to_drop.append("SENHA")
-            columns_to_drop.append("ID_TURMAS")
-        elif user_level == "COORDENADOR":
-            rows_filter = df_display["NIVEL"].isin(
-                ["ALUNO", "PROFESSOR", "COORDENADOR"]
-            )
-            columns_to_drop.append("SENHA")
-            columns_to_drop.extend(["NP1", "NP2", "PIM"])
-            columns_to_drop.append("ID_TURMAS")
-        elif user_level == "ADMINISTRADOR":
-            columns_to_drop.append("SENHA")
-
-        if rows_filter is not None:
-            df_display = df_display[rows_filter].copy()
-
-        cols_to_drop_final = [
-            col for col in columns_to_drop if col in df_display.columns
-        ]
-        if cols_to_drop_final:
-            df_display = df_display.drop(columns=cols_to_drop_final)
+        # Linhas e colunas do nível vêm da projeção (só rótulos, sem cópia);
+        # os filtros reduzem os rótulos e a tabela é montada uma vez no fim
+        projecao = self._projecao_atual()
+        rotulos = projecao.rotulos()
+        colunas = projecao.colunas(df_full)
 
         if user_level in ["ADMINISTRADOR", "COORDENADOR", "PROFESSOR"]:
             if filter_status:
-                df_display = df_display[
-                    df_display["STATUS DO ALUNO"] == filter_status.upper()
-                ]
-            if (
-                general_filter_text
-                and filter_column
-                and filter_column in df_display.columns
-            ):
-                search_term = general_filter_text.lower()
-                df_display = df_display[
-                    df_display[filter_column]
-                    .astype(str)
-                    .str.lower()
-                    .str.contains(search_term, na=False)
-                ]
+                status = df_full["STATUS DO ALUNO"].loc[rotulos]
+                rotulos = rotulos[(status == filter_status.upper()).to_numpy()]
+            if general_filter_text and filter_column and filter_column in colunas:
+                encontrados = self._indice_busca(filter_column).buscar(
+                    general_filter_text
+                )
+                rotulos = rotulos[rotulos.isin(encontrados)]
 
+        df_display = df_full.loc[rotulos, colunas]
         self.data_frame = df_display.reset_index(drop=True)
         self.mostrar_tabela(self.data_frame)
 
@@ -1408,6 +1777,8 @@ class MainApp(ctk.CTk):
     def mostrar_tabela(self, df):
         for widget in self.frame_tabela_dados.winfo_children():
             widget.destroy()
+        # Tipos compactos de volta a str/float64 (nota 7.35, não 7.3499999)
+        df = expandir_tipos(df)
 
         if df.empty:
             ctk.CTkLabel(
@@ -1481,7 +1852,9 @@ class MainApp(ctk.CTk):
                     row_list[media_index] = f"{media_valor:.2f}"
                     if user_level == "ALUNO":
                         tag_para_aplicar = (
-                            ("aprovado",) if media_valor >= 7.0 else ("reprovado",)
+                            ("aprovado",)
+                            if media_valor >= NOTA_APROVACAO
+                            else ("reprovado",)
                         )
                 except (ValueError, TypeError):
                     pass
@@ -1511,18 +1884,20 @@ class MainApp(ctk.CTk):
             idx_visible = int(selecionado)
             user_id = self.data_frame.loc[idx_visible, "ID"]
 
-            # Encontra o índice no DataFrame completo
-            idx_full_list = self.data_frame_full[
-                self.data_frame_full["ID"] == user_id
-            ].index
+            # Encontra a linha no DataFrame completo
+            idx_full = self._rotulo_usuario(user_id)
 
-            if not idx_full_list.empty:
-                idx_full = idx_full_list[0]
-                self.data_frame_full.loc[idx_full, "STATUS DO ALUNO"] = novo_status
+            if idx_full is not None:
+                definir_valor(
+                    self.data_frame_full, idx_full, "STATUS DO ALUNO", novo_status
+                )
+                self._registrar_atualizacao(user_id)
 
                 # Atualiza o DataFrame visível (se a coluna existir)
                 if "STATUS DO ALUNO" in self.data_frame.columns:
-                    self.data_frame.loc[idx_visible, "STATUS DO ALUNO"] = novo_status
+                    definir_valor(
+                        self.data_frame, idx_visible, "STATUS DO ALUNO", novo_status
+                    )
 
                 # Atualiza a Treeview
                 current_values = list(self.data_frame.loc[idx_visible].values)
@@ -1632,13 +2007,16 @@ class MainApp(ctk.CTk):
                     new_user_data[col] = new_value
                 elif col == "SENHA":
                     new_user_data[col] = new_value
+            email = new_user_data.get("EMAIL", "")
+            # E-mail repetido deixaria o login ambíguo
+            if self.indice_usuarios.ids_por_email(email):
+                messagebox.showerror(
+                    "Erro de Validação",
+                    f"O e-mail '{email}' já está cadastrado para outro usuário.",
+                )
+                return
             new_user_data["ID"] = self._gerar_novo_id()
             new_user_data["STATUS DO ALUNO"] = "ATIVO"
-            np1 = new_user_data.get("NP1", 0)
-            np2 = new_user_data.get("NP2", 0)
-            pim = new_user_data.get("PIM", 0)
-            media = (np1 * 4 + np2 * 4 + pim * 2) / 10
-            new_user_data["MEDIA"] = round(media, 2)
             colunas_completas = self.data_frame_full.columns
             for col in colunas_completas:
                 if col not in new_user_data:
@@ -1647,13 +2025,14 @@ class MainApp(ctk.CTk):
                     )
             new_user_df = pd.DataFrame([new_user_data])
             new_user_df = new_user_df[colunas_completas]
-            self.data_frame_full = pd.concat(
-                [self.data_frame_full, new_user_df], ignore_index=True
-            )
-            self.salvar_dados()
-            messagebox.showinfo(
-                "Sucesso",
-                f"Novo usuário '{new_user_data['NOME']}' (ID: {new_user_data['ID']}) adicionado com sucesso!",
+            motor_notas.recalcular(new_user_df)
+            self.data_frame_full = anexar_linhas(self.data_frame_full, new_user_df)
+            self._registrar_insercao(new_user_data["ID"])
+            self.salvar_dados(
+                (
+                    "Sucesso",
+                    f"Novo usuário '{new_user_data['NOME']}' (ID: {new_user_data['ID']}) adicionado com sucesso!",
+                )
             )
             window.destroy()
         except Exception as e:
@@ -1673,11 +2052,10 @@ class MainApp(ctk.CTk):
         idx = int(selecionado)
         user_data_series = self.data_frame.loc[idx]
         user_id = user_data_series["ID"]
-        full_user_data_row = self.data_frame_full[self.data_frame_full["ID"] == user_id]
-        if full_user_data_row.empty:
+        full_user_data = self.indice_usuarios.linha(self.data_frame_full, user_id)
+        if full_user_data is None:
             messagebox.showerror("Erro", "Dados completos do usuário não encontrados.")
             return
-        full_user_data = full_user_data_row.iloc[0]
         edit_window = ctk.CTkToplevel(self)
         edit_window.title(f"Editar Usuário ID: {user_id}")
         edit_window.geometry("400x600")
@@ -1718,43 +2096,26 @@ class MainApp(ctk.CTk):
 
     def salvar_edicao_usuario(self, user_id, entries, window):
         try:
-            user_index = self.data_frame_full[
-                self.data_frame_full["ID"] == user_id
-            ].index[0]
-            for col, entry_widget in entries.items():
-                new_value = entry_widget.get().strip()
-                if col in ["IDADE", "NP1", "NP2", "PIM"]:
-                    try:
-                        new_value_converted = 0 if not new_value else float(new_value)
-                        if col in ["NP1", "NP2", "PIM"] and not (
-                            0 <= new_value_converted <= 10
-                        ):
-                            messagebox.showerror(
-                                "Erro", f"Notas devem estar entre 0 e 10."
-                            )
-                            return
-                        self.data_frame_full.loc[user_index, col] = new_value_converted
-                    except ValueError:
-                        messagebox.showerror(
-                            "Erro", f"O campo '{col}' deve ser um número."
-                        )
-                        return
-                elif col in ["NOME", "NIVEL", "CURSO"]:
-                    self.data_frame_full.loc[user_index, col] = new_value.upper()
-                elif col == "EMAIL":
-                    self.data_frame_full.loc[user_index, col] = new_value.lower()
-                elif col == "ID_TURMAS":
-                    self.data_frame_full.loc[user_index, col] = new_value
-                elif col == "SENHA":
-                    self.data_frame_full.loc[user_index, col] = new_value
-            if all(
-                col in self.data_frame_full.columns for col in ["NP1", "NP2", "PIM"]
-            ):
-                row = self.data_frame_full.loc[user_index]
-                media = (row["NP1"] * 4 + row["NP2"] * 4 + row["PIM"] * 2) / 10
-                self.data_frame_full.loc[user_index, "MEDIA"] = media
-            self.salvar_dados()
-            messagebox.showinfo("Sucesso", "Usuário atualizado com sucesso!")
+            user_index = self._rotulo_usuario(user_id)
+            if user_index is None:
+                messagebox.showerror(
+                    "Erro", "Dados completos do usuário não encontrados."
+                )
+                return
+            # Valida todos os campos antes de gravar: um erro no meio não pode
+            # deixar a linha alterada sem passar por _registrar_atualizacao
+            try:
+                novos_valores = converter_campos_usuario(
+                    {col: entry.get() for col, entry in entries.items()}
+                )
+            except ValueError as e:
+                messagebox.showerror("Erro de Validação", str(e))
+                return
+            definir_valores(self.data_frame_full, user_index, novos_valores)
+            # NP1/NP2/PIM ou o CURSO (e com ele a política) podem ter mudado
+            motor_notas.recalcular(self.data_frame_full, [user_index])
+            self._registrar_atualizacao(user_id)
+            self.salvar_dados(("Sucesso", "Usuário atualizado com sucesso!"))
             window.destroy()
         except Exception as e:
             messagebox.showerror(
@@ -1783,11 +2144,10 @@ class MainApp(ctk.CTk):
             )
             return
         user_id = user_data_series["ID"]
-        full_user_data_row = self.data_frame_full[self.data_frame_full["ID"] == user_id]
-        if full_user_data_row.empty:
+        full_user_data = self.indice_usuarios.linha(self.data_frame_full, user_id)
+        if full_user_data is None:
             messagebox.showerror("Erro", "Dados completos do usuário não encontrados.")
             return
-        full_user_data = full_user_data_row.iloc[0]
         edit_window = ctk.CTkToplevel(self)
         edit_window.title(f"Lançar Notas - Aluno ID: {user_id}")
         edit_window.geometry("400x300")
@@ -1827,37 +2187,155 @@ class MainApp(ctk.CTk):
 
     def salvar_edicao_notas(self, user_id, entries, window):
         try:
-            user_index = self.data_frame_full[
-                self.data_frame_full["ID"] == user_id
-            ].index[0]
-            for col, entry_widget in entries.items():
-                new_value = entry_widget.get().strip()
-                try:
-                    new_value_converted = 0 if not new_value else float(new_value)
-                    if not (0 <= new_value_converted <= 10):
-                        messagebox.showerror(
-                            "Erro de Validação",
-                            f"A nota {col} deve estar entre 0 e 10.",
-                        )
-                        return
-                    self.data_frame_full.loc[user_index, col] = new_value_converted
-                except ValueError:
-                    messagebox.showerror(
-                        "Erro de Validação",
-                        f"O campo '{col}' deve ser um número (use . para decimais).",
-                    )
-                    return
-            row = self.data_frame_full.loc[user_index]
-            media = (row["NP1"] * 4 + row["NP2"] * 4 + row["PIM"] * 2) / 10
-            self.data_frame_full.loc[user_index, "MEDIA"] = round(media, 2)
-            self.salvar_dados()
-            messagebox.showinfo("Sucesso", "Notas do aluno atualizadas com sucesso!")
+            user_index = self._rotulo_usuario(user_id)
+            if user_index is None:
+                messagebox.showerror(
+                    "Erro", "Dados completos do usuário não encontrados."
+                )
+                return
+            try:
+                novas_notas = converter_campos_usuario(
+                    {col: entry.get() for col, entry in entries.items()}
+                )
+            except ValueError as e:
+                messagebox.showerror("Erro de Validação", str(e))
+                return
+            definir_valores(self.data_frame_full, user_index, novas_notas)
+            motor_notas.recalcular(self.data_frame_full, [user_index])
+            self._registrar_atualizacao(user_id)
+            self.salvar_dados(("Sucesso", "Notas do aluno atualizadas com sucesso!"))
             window.destroy()
         except Exception as e:
             messagebox.showerror(
                 "Erro ao Salvar", f"Ocorreu um erro ao salvar as notas: {e}"
             )
 
+    def importar_notas_planilha(self):
+        """
+        Lança as notas dos alunos de uma turma a partir de uma planilha (ID ou
+        EMAIL, NP1, NP2, PIM): tudo é validado e aplicado de uma vez e salvo
+        numa única gravação. Alunos de outras turmas são recusados; as linhas
+        recusadas podem ser salvas num relatório.
+        """
+        if self.current_user["NIVEL"] != "PROFESSOR":
+            messagebox.showwarning("Permissão Negada", "Acesso negado.")
+            return
+        if self.data_frame_full is None or self.data_frame_full.empty:
+            messagebox.showwarning("Aviso", "A tabela não está carregada.")
+            return
+
+        df_alunos = self.data_frame_full[self.data_frame_full["NIVEL"] == "ALUNO"]
+        turmas = df_alunos["ID_TURMAS"].astype(str).str.strip().unique().tolist()
+        turmas = sorted(t for t in turmas if t and t.upper() != "GERAL")
+        if not turmas:
+            messagebox.showwarning(
+                "Aviso", "Não há turmas com alunos cadastrados.", parent=self
+            )
+            return
+
+        # Começa na turma do aluno selecionado na tabela, se houver
+        turma_inicial = turmas[0]
+        selecionado = (
+            self.tabela_widget.focus()
+            if isinstance(self.tabela_widget, ttk.Treeview)
+            else ""
+        )
+        if selecionado and int(selecionado) in self.data_frame.index:
+            turma_selecionada = str(
+                self.data_frame.loc[int(selecionado), "ID_TURMAS"]
+            ).strip()
+            if turma_selecionada in turmas:
+                turma_inicial = turma_selecionada
+
+        window = ctk.CTkToplevel(self)
+        window.title("Importar Notas")
+        window.geometry("400x200")
+        window.transient(self)
+        window.grab_set()
+
+        frame = ctk.CTkFrame(window)
+        frame.pack(padx=20, pady=20, fill="both", expand=True)
+        ctk.CTkLabel(frame, text="Selecione a Turma:", font=("Arial", 12, "bold")).pack(
+            pady=(5, 5)
+        )
+        combo_turma = ctk.CTkComboBox(frame, values=turmas, width=250)
+        combo_turma.set(turma_inicial)
+        combo_turma.pack(pady=(0, 15))
+        ctk.CTkButton(
+            frame,
+            text="Escolher Planilha...",
+            command=lambda: self._importar_notas_da_turma(
+                window, combo_turma.get().strip()
+            ),
+            fg_color="#007BFF",
+        ).pack(pady=10)
+
+    def _importar_notas_da_turma(self, window, turma):
+        """Lê a planilha escolhida e lança as notas dos alunos de "turma"."""
+        if not turma:
+            messagebox.showwarning(
+                "Aviso", "Por favor, selecione uma turma.", parent=window
+            )
+            return
+        window.destroy()
+        caminho = filedialog.askopenfilename(
+            title="Selecione a planilha de notas",
+            filetypes=(
+                ("Planilhas", "*.csv *.xlsx"),
+                ("Arquivos CSV", "*.csv"),
+                ("Excel", "*.xlsx"),
+                ("Todos os arquivos", "*.*"),
+            ),
+        )
+        if not caminho:
+            return
+        try:
+            resultado = importar_notas(
+                self.data_frame_full,
+                caminho,
+                self.indice_usuarios,
+                self.alteracoes,
+                turma=turma,
+            )
+        except ErroImportacao as e:
+            messagebox.showerror("Importar Notas", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror(
+                "Erro ao Importar", f"Não foi possível ler a planilha: {e}"
+            )
+            return
+
+        alteradas = resultado["alteradas"]
+        self._registrar_notas_em_lote(alteradas)
+        if len(alteradas):
+            self.salvar_dados()
+            self.atualizar_tabela(reload_csv=False)
+
+        relatorio = resultado["relatorio"]
+        resumo = (
+            f"Turma {turma}: {resultado['linhas']} linhas lidas, "
+            f"{resultado['validas']} válidas.\n"
+            f"{len(alteradas)} alunos com notas alteradas."
+        )
+        if relatorio.empty:
+            messagebox.showinfo("Importar Notas", resumo)
+            return
+        linhas_com_erro = relatorio["LINHA"].nunique()
+        if messagebox.askyesno(
+            "Importar Notas",
+            f"{resumo}\n{linhas_com_erro} linhas foram recusadas.\n\n"
+            "Deseja salvar o relatório de erros?",
+        ):
+            destino = filedialog.asksaveasfilename(
+                title="Salvar relatório de erros",
+                defaultextension=".csv",
+                initialfile="erros_importacao_notas.csv",
+                filetypes=(("Arquivos CSV", "*.csv"),),
+            )
+            if destino:
+                relatorio.to_csv(destino, sep=";", index=False, encoding="utf-8-sig")
+
     # --- Funções de Envio de Atividade (Aluno) ---
     def open_activity_submission_window(self):
         """
@@ -1957,7 +2435,11 @@ class MainApp(ctk.CTk):
 
     # --- FIM DAS FUNÇÕES DE ENVIO ---
 
-    def salvar_dados(self):
+    def salvar_dados(self, aviso=None):
+        """
+        Envia as alterações pendentes ao gravador. aviso = (título, mensagem)
+        é mostrado só quando a gravação terminar com sucesso.
+        """
         if self.current_user["NIVEL"] not in [
             "ADMINISTRADOR",
             "COORDENADOR",
@@ -1974,74 +2456,239 @@ class MainApp(ctk.CTk):
                 "Não foi possível salvar, o banco de dados está vazio ou não foi carregado.",
             )
             return
-        try:
-            df_to_save = self.data_frame_full.copy()
-            column_map_save = {
-                "ID": "id",
-                "NOME": "nome",
-                "EMAIL": "email",
-                "SENHA": "senha",
-                "IDADE": "idade",
-                "NIVEL": "nivel",
-                "CURSO": "curso",
-                "ID_TURMAS": "turma",
-                "NP1": "np1",
-                "NP2": "np2",
-                "PIM": "pim",
-                "MEDIA": "media",
-                "STATUS DO ALUNO": "atividade",
-            }
-            df_to_save.rename(columns=column_map_save, inplace=True)
-            final_csv_cols = [
-                "id",
-                "nome",
-                "email",
-                "senha",
-                "nivel",
-                "curso",
-                "turma",
-                "idade",
-                "np1",
-                "np2",
-                "pim",
-                "media",
-                "atividade",
-            ]
-            df_to_save = df_to_save.reindex(columns=final_csv_cols)
-            for col in ["np1", "np2", "pim", "media"]:
-                if col in df_to_save.columns:
-                    df_to_save[col] = df_to_save[col].apply(
-                        lambda x: (
-                            f"{x:.2f}".replace(".", ",")
-                            if pd.notna(x) and pd.notnull(x)
-                            else ""
-                        )
+        if self.alteracoes.vazio:
+            messagebox.showinfo("Salvar", "Nenhuma alteração pendente para salvar.")
+            return
+        # A gravação acontece na thread do gravador; o resultado é tratado
+        # em _verificar_gravacoes
+        self.gravador.enviar(self.data_frame_full, self.alteracoes, aviso)
+        self.alteracoes.limpar()
+        self._atualizar_indicador_gravacoes()
+
+    # --- Gravações em segundo plano ---
+    def _verificar_gravacoes(self):
+        """Trata as gravações concluídas pelo gravador (roda na thread do Tk)."""
+        resultados = self.gravador.coletar_concluidos()
+        for resultado in resultados:
+            if resultado["erro"] is not None:
+                # Devolve as alterações para a lista de pendentes (nova tentativa
+                # no próximo "Salvar")
+                if resultado["alteracoes"] is not None:
+                    self.alteracoes.mesclar(resultado["alteracoes"])
+                if resultado["compactacao"]:
+                    messagebox.showerror(
+                        "Erro ao Salvar",
+                        f"Não foi possível consolidar o arquivo CSV: {resultado['erro']}\n"
+                        "As alterações continuam no diário e serão reaplicadas.",
                     )
-            Path(CAMINHO_ARQUIVO).parent.mkdir(parents=True, exist_ok=True)
-            with open(CAMINHO_ARQUIVO, "w", encoding="utf-8", newline="") as f:
-                f.write("[USUARIOS]\n")
-                df_to_save.to_csv(
-                    f, sep=";", index=False, header=True, lineterminator="\r\n"
-                )
+                else:
+                    messagebox.showerror(
+                        "Erro ao Salvar",
+                        f"Ocorreu um erro ao salvar os dados: {resultado['erro']}\n"
+                        "As alterações continuam pendentes; use 'Salvar' para tentar de novo.",
+                    )
+                continue
+            self.gravacoes_concluidas += resultado["pedidos"]
+            self.ultima_gravacao = resultado
+            for titulo, mensagem in resultado["avisos"]:
+                messagebox.showinfo(titulo, mensagem)
+
+        if resultados:
+            self._atualizar_indicador_gravacoes()
+            if (
+                self.frame_tabela_dados is not None
+                and self.frame_tabela_dados.winfo_exists()
+            ):
+                # O DataFrame em memória é o que foi gravado: não precisa reler
+                self.atualizar_tabela(reload_csv=False)
+                self._atualizar_aba_turmas()
+        self.after(INTERVALO_VERIFICACAO_GRAVACOES, self._verificar_gravacoes)
+
+    def _atualizar_indicador_gravacoes(self):
+        if self.label_gravacoes is None or not self.label_gravacoes.winfo_exists():
+            return
+        pendentes = self.gravador.pendentes
+        if pendentes:
+            texto = f"💾 Gravando... ({pendentes} pendente(s))"
+        elif self.ultima_gravacao is not None:
+            g = self.ultima_gravacao
+            texto = (
+                f"✔ Salvo: {g['linhas']} linha(s) em {g['latencia'] * 1000:.0f} ms"
+                f" | {self.gravacoes_concluidas} gravação(ões)"
+            )
+        else:
+            texto = ""
+        self.label_gravacoes.configure(text=texto)
+
+    def _atualizar_aba_turmas(self):
+        """Atualiza a aba "Gerenciar Turmas" se ela existir."""
+        for widget in self.abas.winfo_children():
+            if isinstance(widget, ctk.CTkFrame) and "Gerenciar Turmas" in self.abas.tab(
+                widget, "text"
+            ):
+                for child in widget.winfo_children():
+                    if isinstance(child, GerenciarTurmasFrame):
+                        child.atualizar_tabela_turmas()
+                        break
+
+    def _consolidar_armazenamento(self):
+        """Consolida o diário no CSV (formato lido pelo programa em C)."""
+        try:
+            armazenamento.compactar()
+        except Exception as e:
+            messagebox.showerror(
+                "Erro ao Salvar",
+                f"Não foi possível consolidar o arquivo CSV: {e}\n"
+                "As alterações continuam no diário e serão reaplicadas.",
+            )
+
+    def fechar_app(self):
+        """Termina as gravações pendentes antes de fechar a janela."""
+        self.gravador.parar()
+        self._consolidar_armazenamento()
+        cache_tabela.aguardar_snapshots()
+        self.destroy()
+
+    def importar_csv_para_banco(self):
+        """Substitui os usuários do banco pelos de um CSV no formato [USUARIOS]."""
+        caminho = filedialog.askopenfilename(
+            title="Selecione o CSV a importar",
+            filetypes=(("Arquivos CSV", "*.csv"), ("Todos os arquivos", "*.*")),
+        )
+        if not caminho:
+            return
+        if not messagebox.askyesno(
+            "Importar CSV",
+            "Os usuários atuais do banco serão substituídos pelos do arquivo. Continuar?",
+        ):
+            return
+        self._importar_csv(caminho)
+
+    def _importar_csv(self, caminho):
+        """
+        Importa depois das gravações pendentes (elas não podem sobrescrever o
+        que foi importado) e relê a tabela antes de ajustar a sequência de IDs.
+        """
+        if self.gravador.pendentes:
+            self.after(
+                INTERVALO_VERIFICACAO_GRAVACOES, lambda: self._importar_csv(caminho)
+            )
+            return
+        try:
+            total = armazenamento.importar_csv(caminho)
+            # Sem gravações pendentes a recarga acontece agora, não num after()
+            self.recarregar_dados()
+            # Os IDs importados não podem ser entregues de novo pela sequência
+            sequencia_ids.ajustar(self._maior_id_carregado())
+        except Exception as e:
+            messagebox.showerror("Erro ao Importar", f"Ocorreu um erro: {e}")
+            return
+        self.atualizar_tabela(reload_csv=False)
+        messagebox.showinfo("Importar CSV", f"{total} usuários importados.")
+
+    def exportar_banco_para_csv(self):
+        """Gera o CSV (formato do programa em C) a partir do banco."""
+        caminho = filedialog.asksaveasfilename(
+            title="Exportar usuários para CSV",
+            defaultextension=".csv",
+            initialfile=os.path.basename(CAMINHO_ARQUIVO),
+            filetypes=(("Arquivos CSV", "*.csv"),),
+        )
+        if not caminho:
+            return
+        try:
+            total = armazenamento.exportar_csv(caminho)
             messagebox.showinfo(
-                "Salvo",
-                "Todas as alterações (Status e Edições) foram salvas com sucesso no arquivo CSV.",
-            )
-            self.atualizar_tabela(reload_csv=True)
-
-            # Atualiza a aba "Gerenciar Turmas" se ela existir
-            for widget in self.abas.winfo_children():
-                if isinstance(
-                    widget, ctk.CTkFrame
-                ) and "Gerenciar Turmas" in self.abas.tab(widget, "text"):
-                    for child in widget.winfo_children():
-                        if isinstance(child, GerenciarTurmasFrame):
-                            child.atualizar_tabela_turmas()
-                            break
+                "Exportar CSV", f"{total} usuários exportados para:\n{caminho}"
+            )
+        except Exception as e:
+            messagebox.showerror("Erro ao Exportar", f"Ocorreu um erro: {e}")
+
+    def importar_usuarios_em_lote(self):
+        """
+        Cadastra os usuários de um CSV/JSONL: o arquivo é validado em blocos,
+        os IDs saem de uma única reserva da sequência e tudo é salvo numa
+        única gravação. As linhas recusadas podem ser salvas num relatório.
+        """
+        if self.current_user["NIVEL"] != "ADMINISTRADOR":
+            messagebox.showwarning("Permissão Negada", "Acesso negado.")
+            return
+        caminho = filedialog.askopenfilename(
+            title="Selecione o arquivo de usuários",
+            filetypes=(
+                ("CSV ou JSONL", "*.csv *.jsonl"),
+                ("Arquivos CSV", "*.csv"),
+                ("JSON Lines", "*.jsonl"),
+                ("Todos os arquivos", "*.*"),
+            ),
+        )
+        if not caminho:
+            return
+        try:
+            self.data_frame_full, resultado = importar_usuarios(
+                self.data_frame_full,
+                caminho,
+                self.indice_usuarios,
+                sequencia_ids,
+                self.alteracoes,
+            )
+        except ErroImportacao as e:
+            messagebox.showerror("Importar Usuários", str(e))
+            return
         except Exception as e:
             messagebox.showerror(
-                "Erro ao Salvar", f"Ocorreu um erro ao salvar os dados: {e}"
+                "Erro ao Importar", f"Não foi possível ler o arquivo: {e}"
             )
+            return
+
+        ids = resultado["ids"]
+        self._registrar_insercoes_em_lote(ids)
+        if len(ids):
+            self.salvar_dados()
+            self.atualizar_tabela(reload_csv=False)
+
+        relatorio = resultado["relatorio"]
+        resumo = f"{resultado['linhas']} linhas lidas, {len(ids)} usuários cadastrados"
+        if len(ids):
+            resumo += f" (IDs {ids[0]} a {ids[-1]})"
+        resumo += "."
+        if relatorio.empty:
+            messagebox.showinfo("Importar Usuários", resumo)
+            return
+        if messagebox.askyesno(
+            "Importar Usuários",
+            f"{resumo}\n{relatorio['LINHA'].nunique()} linhas foram recusadas.\n\n"
+            "Deseja salvar o relatório de erros?",
+        ):
+            destino = filedialog.asksaveasfilename(
+                title="Salvar relatório de erros",
+                defaultextension=".csv",
+                initialfile="erros_importacao_usuarios.csv",
+                filetypes=(("Arquivos CSV", "*.csv"),),
+            )
+            if destino:
+                relatorio.to_csv(destino, sep=";", index=False, encoding="utf-8-sig")
+
+    def exportar_usuarios_em_lote(self):
+        """Grava todos os usuários em CSV ou JSONL (formato aceito na importação)."""
+        if self.data_frame_full is None or self.data_frame_full.empty:
+            messagebox.showwarning("Exportar Usuários", "Não há usuários carregados.")
+            return
+        caminho = filedialog.asksaveasfilename(
+            title="Exportar usuários",
+            defaultextension=".csv",
+            initialfile="usuarios.csv",
+            filetypes=(("Arquivos CSV", "*.csv"), ("JSON Lines", "*.jsonl")),
+        )
+        if not caminho:
+            return
+        try:
+            total = exportar_usuarios(self.data_frame_full, caminho)
+            messagebox.showinfo(
+                "Exportar Usuários", f"{total} usuários exportados para:\n{caminho}"
+            )
+        except Exception as e:
+            messagebox.showerror("Erro ao Exportar", f"Ocorreu um erro: {e}")
 
     def _anexar_arquivo_dialog(self):
         """Abre o seletor de arquivos para o ALUNO."""
@@ -2376,20 +3023,15 @@ class MainApp(ctk.CTk):
             # Converte e anexa ao DataFrame completo
             new_turma_df = pd.DataFrame([new_turma_data], columns=colunas_completas)
 
-            if self.data_frame_full is None:
-                self.data_frame_full = new_turma_df
-            else:
-                self.data_frame_full = pd.concat(
-                    [self.data_frame_full, new_turma_df], ignore_index=True
-                )
+            self.data_frame_full = anexar_linhas(self.data_frame_full, new_turma_df)
 
             # 4. Salva no CSV
-            self.salvar_dados()
-
-            messagebox.showinfo(
-                "Sucesso",
-                f"Turma '{nova_turma}' criada com sucesso e salva no banco de dados.",
-                parent=window,
+            self._registrar_insercao(new_id)
+            self.salvar_dados(
+                (
+                    "Sucesso",
+                    f"Turma '{nova_turma}' criada com sucesso e salva no banco de dados.",
+                )
             )
             window.destroy()
 
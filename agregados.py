@@ -0,0 +1,474 @@
+"""
+Resumos do Sistema Acadêmico calculados por partes.
+
+Os acumuladores recebem a tabela em blocos (o DataFrame inteiro é só um
+bloco) e guardam apenas somas, contagens e um histograma das notas por
+grupo. Assim o mesmo resumo
+serve para a tabela em memória e para arquivos lidos com
+armazenamento.ler_usuarios_em_blocos(), sem montar a tabela completa.
+
+AgregadosTurmas guarda as mesmas somas já prontas para a tabela em
+memória do App e as atualiza linha a linha a cada alteração.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import LINHAS_POR_BLOCO_LEITURA, ler_usuarios_em_blocos
+
+# Mesmo limite das marcas aprovado/reprovado da tabela principal
+NOTA_APROVACAO = 7.0
+# Histograma de MEDIA em centésimos: 0,00 a 10,00
+FAIXAS_CENTESIMOS = 1001
+# Folga (em centésimos) para uma MEDIA float32 ainda cair na sua faixa
+TOLERANCIA_CENTESIMO = 1e-3
+# Faixas de 1 ponto mostradas na coluna DISTRIBUIÇÃO
+FAIXAS_DISTRIBUICAO = 10
+_BARRAS = "▁▂▃▄▅▆▇█"
+
+COLUNAS_RESUMO_TURMAS = [
+    "TURMA",
+    "TOTAL ALUNOS",
+    "MÉDIA GERAL",
+    "MEDIANA",
+    "P10",
+    "P90",
+    "APROVAÇÃO (%)",
+    "DISTRIBUIÇÃO",
+    "CURSO",
+]
+
+
+def _centesimos(medias):
+    """
+    (faixas, na_grade): a faixa do histograma de cada MEDIA e se ela cabe
+    exatamente nela (duas casas, de 0 a 10). As demais têm faixa 0.
+    """
+    escaladas = np.asarray(medias, dtype=np.float64) * 100
+    faixas = np.rint(escaladas)
+    na_grade = (
+        (np.abs(escaladas - faixas) <= TOLERANCIA_CENTESIMO)
+        & (faixas >= 0)
+        & (faixas < FAIXAS_CENTESIMOS)
+    )
+    return np.where(na_grade, faixas, 0).astype(np.intp), na_grade
+
+
+class _Estatisticas:
+    """
+    Resumo de MEDIA de um grupo: contagem, soma, soma dos quadrados e um
+    histograma com uma faixa por centésimo de nota.
+
+    Com a política padrão a MEDIA vai de 0 a 10 com duas casas e o histograma
+    é um "sketch" exato: mediana e percentis saem dele sem guardar as notas,
+    dois resumos se juntam somando as contagens (turma -> curso ->
+    instituição) e, ao contrário de t-digest/KLL, uma nota pode ser retirada
+    quando o aluno é editado ou excluído. Custa 4 KB por grupo.
+
+    Notas que não caem numa faixa (política com mais casas, dados fora de 0
+    a 10) ficam em "fora", {nota: alunos}, e entram nos cálculos pelo valor
+    exato.
+    """
+
+    __slots__ = ("n", "soma", "soma_quadrados", "contagens", "fora")
+
+    def __init__(self):
+        self.n = 0
+        self.soma = 0.0
+        self.soma_quadrados = 0.0
+        self.contagens = np.zeros(FAIXAS_CENTESIMOS, dtype=np.int32)
+        self.fora = {}
+
+    def somar(self, media, sinal=1):
+        self.n += sinal
+        self.soma += sinal * media
+        self.soma_quadrados += sinal * media * media
+        faixa = round(media * 100)
+        if (
+            0 <= faixa < FAIXAS_CENTESIMOS
+            and abs(media * 100 - faixa) <= TOLERANCIA_CENTESIMO
+        ):
+            self.contagens[faixa] += sinal
+        else:
+            self._somar_fora(media, sinal)
+
+    def _somar_fora(self, media, alunos):
+        alunos += self.fora.get(media, 0)
+        if alunos:
+            self.fora[media] = alunos
+        else:
+            del self.fora[media]
+
+    def somar_lote(self, n, soma, soma_quadrados, contagens, fora=None):
+        self.n += n
+        self.soma += soma
+        self.soma_quadrados += soma_quadrados
+        self.contagens += contagens.astype(np.int32, copy=False)
+        for media, alunos in (fora or {}).items():
+            self._somar_fora(media, alunos)
+        return self
+
+    def mesclar(self, outro):
+        return self.somar_lote(
+            outro.n, outro.soma, outro.soma_quadrados, outro.contagens, outro.fora
+        )
+
+    def _notas(self):
+        """(notas distintas em ordem crescente, alunos com cada uma)."""
+        notas = np.arange(FAIXAS_CENTESIMOS) / 100
+        if not self.fora:
+            return notas, self.contagens
+        notas = np.concatenate([notas, np.fromiter(self.fora, np.float64)])
+        contagens = np.concatenate(
+            [self.contagens, np.fromiter(self.fora.values(), np.int64)]
+        )
+        ordem = np.argsort(notas, kind="stable")
+        return notas[ordem], contagens[ordem]
+
+    @property
+    def media(self):
+        return self.soma / self.n if self.n else float("nan")
+
+    @property
+    def desvio(self):
+        """Desvio padrão amostral (NaN com menos de dois alunos)."""
+        if self.n < 2:
+            return float("nan")
+        variancia = (self.soma_quadrados - self.soma * self.soma / self.n) / (
+            self.n - 1
+        )
+        return math.sqrt(max(variancia, 0.0))
+
+    def quantis(self, qs):
+        """Quantis como np.quantile (interpolação linear) sobre as notas."""
+        if not self.n:
+            return [float("nan")] * len(qs)
+        notas, contagens = self._notas()
+        acumulado = np.cumsum(contagens)
+        posicoes = (self.n - 1) * np.asarray(qs, dtype=np.float64)
+        baixo = np.floor(posicoes)
+        nota_baixa = notas[np.searchsorted(acumulado, baixo, side="right")]
+        nota_alta = notas[np.searchsorted(acumulado, np.ceil(posicoes), side="right")]
+        return (nota_baixa + (posicoes - baixo) * (nota_alta - nota_baixa)).tolist()
+
+    @property
+    def taxa_aprovacao(self):
+        """Percentual de notas >= NOTA_APROVACAO."""
+        if not self.n:
+            return float("nan")
+        aprovados = int(self.contagens[int(round(NOTA_APROVACAO * 100)) :].sum())
+        aprovados += sum(
+            alunos for media, alunos in self.fora.items() if media >= NOTA_APROVACAO
+        )
+        return 100 * aprovados / self.n
+
+    def histograma(self, faixas=FAIXAS_DISTRIBUICAO):
+        """Alunos por faixa de nota (0–1, 1–2, ..., 9–10; o 10 entra na última)."""
+        limites = np.linspace(0, FAIXAS_CENTESIMOS - 1, faixas + 1).astype(int)
+        limites[-1] = FAIXAS_CENTESIMOS
+        contagens = np.add.reduceat(self.contagens, limites[:-1])
+        for media, alunos in self.fora.items():
+            contagens[min(max(int(media * faixas // 10), 0), faixas - 1)] += alunos
+        return contagens.tolist()
+
+    def distribuicao(self):
+        """Histograma em uma linha de texto (uma barra por faixa)."""
+        contagens = self.histograma()
+        maior = max(contagens, default=0)
+        if not maior:
+            return ""
+        return "".join(
+            _BARRAS[math.ceil(c / maior * len(_BARRAS)) - 1] if c else " "
+            for c in contagens
+        )
+
+
+def _estatisticas_por_grupo(codigos, medias, grupos):
+    """Um _Estatisticas por código de grupo (0..grupos-1), com bincount."""
+    n = np.bincount(codigos, minlength=grupos)
+    soma = np.bincount(codigos, weights=medias, minlength=grupos)
+    quadrados = np.bincount(codigos, weights=medias * medias, minlength=grupos)
+    faixas, na_grade = _centesimos(medias)
+    contagens = np.bincount(
+        codigos[na_grade] * FAIXAS_CENTESIMOS + faixas[na_grade],
+        minlength=grupos * FAIXAS_CENTESIMOS,
+    ).reshape(grupos, FAIXAS_CENTESIMOS)
+
+    # Notas fora da grade: alunos por (grupo, nota)
+    fora = {}
+    if not na_grade.all():
+        pares = pd.DataFrame(
+            {"grupo": codigos[~na_grade], "media": medias[~na_grade]}
+        ).value_counts(sort=False)
+        for (codigo, media), alunos in pares.items():
+            fora.setdefault(codigo, {})[float(media)] = int(alunos)
+    return {
+        int(codigo): _Estatisticas().somar_lote(
+            int(n[codigo]),
+            float(soma[codigo]),
+            float(quadrados[codigo]),
+            contagens[codigo],
+            fora.get(codigo),
+        )
+        for codigo in np.flatnonzero(n)
+    }
+
+
+def montar_tabela_turmas(turmas, cursos_das_turmas):
+    """
+    DataFrame do resumo a partir de {turma: _Estatisticas} e {turma: curso}.
+    Lê só os resumos das turmas: o custo não depende do número de alunos.
+    """
+    nomes = sorted(turmas)
+    linhas = []
+    for turma in nomes:
+        e = turmas[turma]
+        mediana, p10, p90 = e.quantis([0.5, 0.1, 0.9])
+        linhas.append(
+            (e.n, e.media, mediana, p10, p90, e.taxa_aprovacao, e.distribuicao())
+        )
+    n, media, mediana, p10, p90, aprovacao, distribuicao = (
+        zip(*linhas) if linhas else [()] * 7
+    )
+    return pd.DataFrame(
+        {
+            "TURMA": pd.Series(nomes, dtype="str"),
+            "TOTAL ALUNOS": np.array(n, dtype=np.int64),
+            "MÉDIA GERAL": np.round(np.array(media, dtype=np.float64), 2),
+            "MEDIANA": np.round(np.array(mediana, dtype=np.float64), 2),
+            "P10": np.round(np.array(p10, dtype=np.float64), 2),
+            "P90": np.round(np.array(p90, dtype=np.float64), 2),
+            "APROVAÇÃO (%)": np.round(np.array(aprovacao, dtype=np.float64), 1),
+            "DISTRIBUIÇÃO": pd.Series(distribuicao, dtype="str"),
+            "CURSO": pd.Series([cursos_das_turmas.get(t) for t in nomes], dtype=object),
+        },
+        columns=COLUNAS_RESUMO_TURMAS,
+    )
+
+
+def mesclar_estatisticas(grupos):
+    """Junta vários resumos (ex.: as turmas de um curso ou a instituição inteira)."""
+    total = _Estatisticas()
+    for estatisticas in grupos:
+        total.mesclar(estatisticas)
+    return total
+
+
+class ResumoTurmas:
+    """Estatísticas de MEDIA e curso de cada turma, bloco a bloco."""
+
+    def __init__(self):
+        self.turmas = {}  # turma -> _Estatisticas
+        self.cursos_das_turmas = {}  # turma -> curso da primeira linha
+        self.linhas_lidas = 0
+
+    def adicionar(self, bloco):
+        """Acumula um bloco da tabela de usuários. Devolve o próprio resumo."""
+        self.linhas_lidas += len(bloco)
+        if not {"NIVEL", "ID_TURMAS", "MEDIA"} <= set(bloco.columns):
+            return self
+        medias = bloco["MEDIA"].to_numpy(dtype=np.float64, na_value=np.nan)
+        alunos = (
+            (bloco["NIVEL"] == "ALUNO").to_numpy()
+            & bloco["ID_TURMAS"].notna().to_numpy()
+            & ~np.isnan(medias)
+        )
+        if not alunos.any():
+            return self
+
+        # Chaves como texto: categorias e tipos diferentes entre blocos
+        # precisam cair no mesmo grupo
+        codigos, nomes = pd.factorize(
+            bloco["ID_TURMAS"].to_numpy(dtype=object)[alunos].astype(str)
+        )
+        for codigo, parcial in _estatisticas_por_grupo(
+            codigos, medias[alunos], len(nomes)
+        ).items():
+            self.turmas.setdefault(nomes[codigo], _Estatisticas()).mesclar(parcial)
+
+        if "CURSO" in bloco.columns:
+            cursos = bloco["CURSO"].to_numpy(dtype=object)[alunos]
+            com_curso = pd.notna(cursos)
+            # Primeira linha com curso de cada turma no bloco
+            _, primeiras = np.unique(codigos[com_curso], return_index=True)
+            for codigo, curso in zip(
+                codigos[com_curso][primeiras], cursos[com_curso][primeiras]
+            ):
+                self.cursos_das_turmas.setdefault(nomes[codigo], curso)
+        return self
+
+    def tabela(self):
+        """DataFrame no formato de GerenciarTurmasFrame.gerar_dados_turmas()."""
+        return montar_tabela_turmas(self.turmas, self.cursos_das_turmas)
+
+
+def resumir_turmas_csv(caminho_arquivo, linhas_por_bloco=LINHAS_POR_BLOCO_LEITURA):
+    """Resumo por turma direto do CSV, sem carregar a tabela inteira."""
+    resumo = ResumoTurmas()
+    for bloco in ler_usuarios_em_blocos(caminho_arquivo, linhas_por_bloco):
+        resumo.adicionar(bloco)
+    return resumo.tabela()
+
+
+class AgregadosTurmas:
+    """
+    Estatísticas de MEDIA (com mediana, percentis, aprovação e histograma)
+    por turma e por curso, mantidas linha a linha.
+
+    Montadas uma vez por carga (reconstruir) e depois atualizadas pelo App a
+    cada inserção/edição/exclusão: cada linha contribui com (turma, curso,
+    media) se for ALUNO com turma, e uma alteração só retira a contribuição
+    antiga e soma a nova. O resumo e o filtro por curso da aba de turmas
+    leem daqui, sem groupby.
+
+    A contribuição das linhas da carga fica em arrays (códigos de turma e
+    curso, MEDIA) e só as linhas alteradas depois vão para um dicionário.
+    O curso de uma turma é o mais frequente entre os seus alunos (empate: o
+    que apareceu primeiro), que é o "first" de sempre quando a turma tem um
+    curso só.
+    """
+
+    def __init__(self):
+        self.reconstruir(None)
+
+    def reconstruir(self, df):
+        self.turmas = {}  # turma -> _Estatisticas
+        self.cursos = {}  # curso -> _Estatisticas
+        self._cursos_da_turma = {}  # turma -> {curso: alunos}
+        self._alteradas = {}  # rótulo -> (turma, curso, media) ou None
+        self._posicoes = pd.Index([])
+        self._tabela = None
+        if (
+            df is None
+            or df.empty
+            or not {"NIVEL", "ID_TURMAS", "MEDIA"} <= set(df.columns)
+        ):
+            return self
+
+        # Cópia: a tabela é alterada no lugar depois (df.loc/df.at)
+        medias = df["MEDIA"].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        alunos = (
+            (df["NIVEL"] == "ALUNO").to_numpy()
+            & df["ID_TURMAS"].notna().to_numpy()
+            & ~np.isnan(medias)
+        )
+        turmas = df["ID_TURMAS"].astype(object).to_numpy()
+        codigos_turma, self._nomes_turma = pd.factorize(
+            np.where(alunos, turmas.astype(str), None)
+        )
+        if "CURSO" in df.columns:
+            codigos_curso, self._nomes_curso = pd.factorize(df["CURSO"].astype(object))
+        else:
+            codigos_curso, self._nomes_curso = np.full(len(df), -1), pd.Index([])
+        self._posicoes = df.index
+        self._codigos_turma = codigos_turma.astype(np.int32)
+        self._codigos_curso = codigos_curso.astype(np.int32)
+        self._medias = medias
+
+        # Totais iniciais com bincount (uma passada por agrupamento)
+        t, c, m = codigos_turma[alunos], codigos_curso[alunos], medias[alunos]
+        com_curso = c >= 0
+        for chaves, pesos, nomes, destino in (
+            (t, m, self._nomes_turma, self.turmas),
+            (c[com_curso], m[com_curso], self._nomes_curso, self.cursos),
+        ):
+            for codigo, estatisticas in _estatisticas_por_grupo(
+                chaves, pesos, len(nomes)
+            ).items():
+                destino[nomes[codigo]] = estatisticas
+
+        # Alunos por par (turma, curso), na ordem em que o par aparece
+        codigos_par, pares = pd.factorize(
+            t.astype(np.int64) * (len(self._nomes_curso) + 1) + c + 1
+        )
+        for par, n in zip(pares, np.bincount(codigos_par)):
+            codigo_turma, codigo_curso = divmod(int(par), len(self._nomes_curso) + 1)
+            curso = self._nomes_curso[codigo_curso - 1] if codigo_curso else None
+            self._cursos_da_turma.setdefault(self._nomes_turma[codigo_turma], {})[
+                curso
+            ] = int(n)
+        return self
+
+    def _contribuicao(self, rotulo):
+        """(turma, curso, media) com que a linha entra nos totais, ou None."""
+        if rotulo in self._alteradas:
+            return self._alteradas[rotulo]
+        try:
+            pos = self._posicoes.get_loc(rotulo)
+        except KeyError:
+            return None
+        codigo_turma = self._codigos_turma[pos]
+        if codigo_turma < 0:
+            return None
+        codigo_curso = self._codigos_curso[pos]
+        curso = self._nomes_curso[codigo_curso] if codigo_curso >= 0 else None
+        return self._nomes_turma[codigo_turma], curso, float(self._medias[pos])
+
+    @staticmethod
+    def _ler_linha(df, rotulo):
+        if df.at[rotulo, "NIVEL"] != "ALUNO":
+            return None
+        turma, media = df.at[rotulo, "ID_TURMAS"], df.at[rotulo, "MEDIA"]
+        if pd.isna(turma) or pd.isna(media):
+            return None
+        curso = df.at[rotulo, "CURSO"] if "CURSO" in df.columns else None
+        return str(turma), (None if pd.isna(curso) else curso), float(media)
+
+    def _aplicar(self, contribuicao, sinal):
+        turma, curso, media = contribuicao
+        self.turmas.setdefault(turma, _Estatisticas()).somar(media, sinal)
+        if self.turmas[turma].n == 0:
+            del self.turmas[turma]
+        cursos = self._cursos_da_turma.setdefault(turma, {})
+        cursos[curso] = cursos.get(curso, 0) + sinal
+        if cursos[curso] == 0:
+            del cursos[curso]
+        if curso is not None:
+            self.cursos.setdefault(curso, _Estatisticas()).somar(media, sinal)
+            if self.cursos[curso].n == 0:
+                del self.cursos[curso]
+        self._tabela = None
+
+    def atualizar(self, df, rotulo):
+        """Linha inserida ou alterada (nota, NIVEL, turma, curso...)."""
+        if rotulo is None:
+            return
+        antiga = self._contribuicao(rotulo)
+        nova = self._ler_linha(df, rotulo)
+        if antiga == nova:
+            return
+        if antiga is not None:
+            self._aplicar(antiga, -1)
+        if nova is not None:
+            self._aplicar(nova, 1)
+        self._alteradas[rotulo] = nova
+
+    inserir = atualizar
+
+    def remover(self, rotulo):
+        if rotulo is None:
+            return
+        antiga = self._contribuicao(rotulo)
+        if antiga is not None:
+            self._aplicar(antiga, -1)
+        self._alteradas[rotulo] = None
+
+    def curso_da_turma(self, turma):
+        cursos = self._cursos_da_turma.get(turma)
+        return max(cursos, key=cursos.get) if cursos else None
+
+    def tabela(self, curso=None):
+        """Resumo no formato de ResumoTurmas.tabela(), opcionalmente de um curso."""
+        if self._tabela is None:
+            self._tabela = montar_tabela_turmas(
+                self.turmas, {t: self.curso_da_turma(t) for t in self.turmas}
+            )
+        if curso is None:
+            return self._tabela
+        return self._tabela[self._tabela["CURSO"] == curso].reset_index(drop=True)
+
+    def geral(self):
+        """Resumo da instituição: junção dos resumos de todas as turmas."""
+        return mesclar_estatisticas(self.turmas.values())
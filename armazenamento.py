@@ -0,0 +1,1711 @@
+"""
+Leitura e gravação dos dados do Sistema Acadêmico (seção [USUARIOS] do CSV).
+
+Este módulo não depende da interface gráfica: as funções levantam exceções
+e quem chama (SistemaGerenc.py) decide como avisar o usuário.
+"""
+
+import abc
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, suppress
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from notas import COLUNAS_PROVAS, motor_notas
+
+try:  # pyarrow é opcional: sem ele o snapshot usa o formato .npz do NumPy
+    import pyarrow as pa
+    from pyarrow import feather
+
+    TEM_PYARROW = True
+except ImportError:
+    TEM_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+SECAO_ALVO = "[USUARIOS]"
+HEADER_PADRAO = (
+    "id;nome;email;senha;nivel;curso;turma;idade;np1;np2;pim;media;atividade"
+)
+
+COLUNAS_CSV = HEADER_PADRAO.split(";")
+
+# Colunas do CSV (já em MAIÚSCULAS) que têm outro nome dentro do App
+COLUNAS_CSV_PARA_APP = {"TURMA": "ID_TURMAS", "ATIVIDADE": "STATUS DO ALUNO"}
+# Colunas internas do App -> cabeçalho gravado no CSV
+COLUNAS_APP_PARA_CSV = {
+    "ID": "id",
+    "NOME": "nome",
+    "EMAIL": "email",
+    "SENHA": "senha",
+    "IDADE": "idade",
+    "NIVEL": "nivel",
+    "CURSO": "curso",
+    "ID_TURMAS": "turma",
+    "NP1": "np1",
+    "NP2": "np2",
+    "PIM": "pim",
+    "MEDIA": "media",
+    "STATUS DO ALUNO": "atividade",
+}
+COLUNAS_NOTAS = ["NP1", "NP2", "PIM", "MEDIA"]
+COLUNAS_INTEIRAS = ["ID", "IDADE"]
+# Tipos declarados ao pd.read_csv no modo "tipado" (cabeçalho do CSV). ID e
+# IDADE são lidos como float para aceitar campos vazios (viram 0 depois).
+TIPOS_CSV = {
+    col: ("float64" if col.upper() in COLUNAS_NOTAS + COLUNAS_INTEIRAS else "str")
+    for col in COLUNAS_CSV
+}
+
+
+# Cabeçalho da seção e início da próxima seção, procurados direto nos bytes
+_RE_SECAO_ALVO = re.compile(
+    rb"(?im)^[ \t\f\v]*" + re.escape(SECAO_ALVO.encode()) + rb"[ \t\f\v]*\r?$"
+)
+_RE_PROXIMA_SECAO = re.compile(rb"(?m)^[ \t\f\v]*\[")
+
+
+class ErroFormatoCSV(Exception):
+    """O arquivo existe, mas não possui a seção [USUARIOS]."""
+
+
+# === PARSE DO CSV
+def normalizar_tabela(df):
+    """Padroniza nomes de colunas, tipos numéricos, maiúsculas/minúsculas e MEDIA."""
+    df.columns = df.columns.str.strip().str.upper()
+    df.rename(columns=COLUNAS_CSV_PARA_APP, inplace=True)
+
+    for col in COLUNAS_NOTAS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.replace(",", ".", regex=False)
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+
+    for col in COLUNAS_INTEIRAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
+
+    if "NOME" in df.columns:
+        df["NOME"] = df["NOME"].astype(str).str.upper()
+    if "EMAIL" in df.columns:
+        df["EMAIL"] = df["EMAIL"].astype(str).str.lower()
+    if "SENHA" in df.columns:
+        df["SENHA"] = df["SENHA"].astype(str)
+    if "NIVEL" in df.columns:
+        df["NIVEL"] = df["NIVEL"].astype(str).str.upper()
+
+    if all(col in df.columns for col in COLUNAS_PROVAS):
+        df["MEDIA"] = motor_notas.calcular(df)
+    return df
+
+
+def _erro_secao_ausente(caminho_arquivo):
+    return ErroFormatoCSV(
+        f"Não foi possível encontrar a seção {SECAO_ALVO} no arquivo {caminho_arquivo}."
+    )
+
+
+def _ler_por_linhas(caminho_arquivo):
+    """Modo "linhas": lê o arquivo inteiro com readlines() e procura a seção."""
+    with open(caminho_arquivo, "r", encoding="utf-8", errors="ignore") as f:
+        lines = f.readlines()
+
+    start_index = -1
+    end_index = -1
+    for i, line in enumerate(lines):
+        if line.strip().upper() == SECAO_ALVO:
+            start_index = i + 1
+            break
+    if start_index == -1:
+        raise _erro_secao_ausente(caminho_arquivo)
+
+    for i in range(start_index, len(lines)):
+        if lines[i].strip().startswith("["):
+            end_index = i
+            break
+    if end_index == -1:
+        end_index = len(lines)
+
+    usuarios_lines = lines[start_index:end_index]
+    usuarios_lines_clean = [line for line in usuarios_lines if line.strip()]
+
+    if len(usuarios_lines_clean) <= 1:
+        header_line = usuarios_lines_clean[0] if usuarios_lines_clean else HEADER_PADRAO
+        colunas = [col.strip() for col in header_line.split(";")]
+        return pd.DataFrame(columns=colunas)
+
+    header_line = usuarios_lines_clean[0]
+    colunas = [col.strip() for col in header_line.split(";")]
+    data_lines = "".join(usuarios_lines_clean[1:])
+    csv_file_like = io.StringIO(data_lines)
+    df = pd.read_csv(csv_file_like, sep=";", header=None, names=colunas)
+    return normalizar_tabela(df)
+
+
+class _LeitorIntervalo(io.RawIOBase):
+    """Arquivo somente-leitura sobre uma fatia de um buffer (ex.: mmap), sem copiá-la."""
+
+    def __init__(self, buffer, inicio, fim):
+        super().__init__()
+        self._dados = memoryview(buffer)[inicio:fim]
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        n = min(len(destino), len(self._dados) - self._pos)
+        destino[:n] = self._dados[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._dados.release()
+        super().close()
+
+
+def localizar_secao(buffer, caminho_arquivo=""):
+    """Devolve (inicio, fim) em bytes das linhas da seção [USUARIOS], sem o cabeçalho."""
+    achado = _RE_SECAO_ALVO.search(buffer)
+    if achado is None:
+        raise _erro_secao_ausente(caminho_arquivo)
+    inicio = achado.end()
+    if buffer[inicio : inicio + 1] == b"\n":
+        inicio += 1
+    proxima = _RE_PROXIMA_SECAO.search(buffer, inicio)
+    fim = proxima.start() if proxima else len(buffer)
+    return inicio, fim
+
+
+def _ler_por_mmap(caminho_arquivo):
+    """
+    Modo "mmap": mapeia o arquivo na memória, acha a seção por busca de bytes
+    e entrega só esse intervalo ao pd.read_csv, sem montar listas de linhas
+    nem strings intermediárias.
+    """
+    if os.path.getsize(caminho_arquivo) == 0:
+        raise _erro_secao_ausente(caminho_arquivo)
+
+    with open(caminho_arquivo, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        inicio, fim = localizar_secao(mm, caminho_arquivo)
+        with _LeitorIntervalo(mm, inicio, fim) as leitor:
+            try:
+                df = pd.read_csv(
+                    io.BufferedReader(leitor),
+                    sep=";",
+                    header=0,
+                    encoding="utf-8",
+                    encoding_errors="ignore",
+                )
+            except pd.errors.EmptyDataError:
+                colunas = [col.strip() for col in HEADER_PADRAO.split(";")]
+                return pd.DataFrame(columns=colunas)
+
+    if df.empty:
+        return pd.DataFrame(columns=[str(col).strip() for col in df.columns])
+    return normalizar_tabela(df)
+
+
+def _cabecalho_secao(buffer, inicio, fim):
+    """Nomes das colunas na primeira linha não vazia da seção."""
+    while inicio < fim:
+        quebra = buffer.find(b"\n", inicio, fim)
+        quebra = fim if quebra == -1 else quebra
+        linha = bytes(buffer[inicio:quebra]).decode("utf-8", errors="ignore")
+        if linha.strip():
+            return linha.rstrip("\r").split(";")
+        inicio = quebra + 1
+    return []
+
+
+def _finalizar_tipado(df, motor=None):
+    """O que o parser não faz: nomes internos, vazios numéricos, caixa e MEDIA."""
+    df.columns = df.columns.str.strip().str.upper()
+    df.rename(columns=COLUNAS_CSV_PARA_APP, inplace=True)
+    for col in COLUNAS_NOTAS:
+        if col in df.columns:
+            df[col] = df[col].fillna(0)
+    for col in COLUNAS_INTEIRAS:
+        if col in df.columns:
+            df[col] = df[col].fillna(0).astype(int)
+    for col, caixa in (("NOME", "upper"), ("EMAIL", "lower"), ("NIVEL", "upper")):
+        if col in df.columns:
+            df[col] = getattr(df[col].str, caixa)()
+    if all(col in df.columns for col in COLUNAS_PROVAS):
+        df["MEDIA"] = (motor or motor_notas).calcular(df)
+    return df
+
+
+def _ler_tipado(caminho_arquivo, engine="c"):
+    """
+    Modo "tipado": uma única passada do pd.read_csv com separador decimal
+    (","), tipos e colunas (usecols) declarados, em vez de ler tudo como
+    texto/inferido e converter coluna a coluna depois (normalizar_tabela).
+    Colunas fora do cabeçalho padrão são ignoradas, como já acontece ao
+    gravar.
+
+    Se algum valor não cabe no tipo declarado (ex.: nota escrita com ponto),
+    a leitura cai no modo "mmap", que converte de forma tolerante.
+    """
+    if os.path.getsize(caminho_arquivo) == 0:
+        raise _erro_secao_ausente(caminho_arquivo)
+
+    with open(caminho_arquivo, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        inicio, fim = localizar_secao(mm, caminho_arquivo)
+        colunas = _cabecalho_secao(mm, inicio, fim)
+        usecols = [col for col in colunas if col.strip().lower() in TIPOS_CSV]
+        tipos = {col: TIPOS_CSV[col.strip().lower()] for col in usecols}
+        opcoes = {} if engine == "pyarrow" else {"encoding_errors": "ignore"}
+        with _LeitorIntervalo(mm, inicio, fim) as leitor:
+            try:
+                df = pd.read_csv(
+                    io.BufferedReader(leitor),
+                    sep=";",
+                    header=0,
+                    decimal=",",
+                    usecols=usecols,
+                    dtype=tipos,
+                    encoding="utf-8",
+                    engine=engine,
+                    **opcoes,
+                )
+            except pd.errors.EmptyDataError:
+                colunas = [col.strip() for col in HEADER_PADRAO.split(";")]
+                return pd.DataFrame(columns=colunas)
+            except ValueError:
+                df = None
+    if df is None:
+        return _ler_por_mmap(caminho_arquivo)
+
+    if df.empty:
+        return pd.DataFrame(columns=[str(col).strip() for col in df.columns])
+    return _finalizar_tipado(df)
+
+
+# Abaixo disso a seção é lida num processo só: abrir processos e devolver os
+# pedaços custa mais do que o parse
+BYTES_MINIMOS_PARALELO = 8 * 1024 * 1024
+
+
+def _fatias_por_linha(buffer, inicio, fim, partes):
+    """Divide [inicio, fim) em até `partes` intervalos terminados em quebra de linha."""
+    limites = [inicio]
+    passo = max(1, (fim - inicio) // partes)
+    for _ in range(partes - 1):
+        corte = buffer.find(b"\n", limites[-1] + passo - 1, fim)
+        if corte == -1:
+            break
+        limites.append(corte + 1)
+    limites.append(fim)
+    return [(a, b) for a, b in zip(limites, limites[1:]) if a < b]
+
+
+def _ler_intervalo_tipado(caminho_arquivo, inicio, fim, colunas, motor):
+    """
+    Executado em outro processo: parse tipado de um trecho de linhas de dados
+    (sem cabeçalho). ValueError sobe para quem chamou decidir o que fazer.
+    O motor de notas vai junto porque o processo novo não vê as políticas
+    definidas no processo do App.
+    """
+    usecols = [col for col in colunas if col.strip().lower() in TIPOS_CSV]
+    with open(caminho_arquivo, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        with _LeitorIntervalo(mm, inicio, fim) as leitor:
+            try:
+                df = pd.read_csv(
+                    io.BufferedReader(leitor),
+                    sep=";",
+                    header=None,
+                    names=colunas,
+                    decimal=",",
+                    usecols=usecols,
+                    dtype={col: TIPOS_CSV[col.strip().lower()] for col in usecols},
+                    encoding="utf-8",
+                    encoding_errors="ignore",
+                )
+            except pd.errors.EmptyDataError:
+                df = pd.DataFrame(columns=usecols)
+    return _finalizar_tipado(df, motor)
+
+
+def ler_usuarios_paralelo(caminho_arquivo, processos=None):
+    """
+    Modo "paralelo": o modo "tipado" repartido entre processos. A seção é
+    dividida em intervalos de bytes alinhados em quebras de linha; cada
+    processo lê e normaliza o seu e os pedaços são juntados na ordem do
+    arquivo, então o resultado é o mesmo da leitura em série (veja
+    hash_tabela()).
+
+    Seções pequenas, ou um único processo, usam a leitura em série. Se algum
+    pedaço não cabe nos tipos declarados, a leitura inteira cai no modo
+    "mmap", como no "tipado".
+    """
+    processos = processos or os.cpu_count() or 1
+    if os.path.getsize(caminho_arquivo) == 0:
+        raise _erro_secao_ausente(caminho_arquivo)
+
+    with open(caminho_arquivo, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        inicio, fim = localizar_secao(mm, caminho_arquivo)
+        colunas = _cabecalho_secao(mm, inicio, fim)
+        # Os dados começam na linha seguinte ao cabeçalho
+        linha_cabecalho = mm.find(b";", inicio, fim)
+        quebra = mm.find(b"\n", max(linha_cabecalho, inicio), fim)
+        dados = fim if linha_cabecalho == -1 or quebra == -1 else quebra + 1
+        if processos < 2 or fim - dados < BYTES_MINIMOS_PARALELO:
+            fatias = None
+        else:
+            fatias = _fatias_por_linha(mm, dados, fim, processos)
+    if not fatias or len(fatias) < 2:
+        return _ler_tipado(caminho_arquivo)
+
+    colunas = [col.strip() for col in colunas]
+    try:
+        with ProcessPoolExecutor(max_workers=len(fatias)) as executor:
+            pedacos = list(
+                executor.map(
+                    _ler_intervalo_tipado,
+                    [caminho_arquivo] * len(fatias),
+                    [a for a, _ in fatias],
+                    [b for _, b in fatias],
+                    [colunas] * len(fatias),
+                    [motor_notas] * len(fatias),
+                )
+            )
+    except ValueError:
+        return _ler_por_mmap(caminho_arquivo)
+    return pd.concat(pedacos, ignore_index=True)
+
+
+def hash_tabela(df):
+    """SHA-256 do conteúdo, da ordem, dos nomes e dos tipos das colunas de um DataFrame."""
+    h = hashlib.sha256()
+    h.update(repr([(str(col), str(df[col].dtype)) for col in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _ler_tipado_pyarrow(caminho_arquivo):
+    """Modo "pyarrow": o modo "tipado" com o parser multithread do pyarrow."""
+    return _ler_tipado(caminho_arquivo, engine="pyarrow" if TEM_PYARROW else "c")
+
+
+# Linhas de dados normalizadas por vez em ler_usuarios_em_blocos()
+LINHAS_POR_BLOCO_LEITURA = 100_000
+
+
+def ler_usuarios_em_blocos(caminho_arquivo, linhas_por_bloco=LINHAS_POR_BLOCO_LEITURA):
+    """
+    Percorre a seção [USUARIOS] em blocos de até `linhas_por_bloco` linhas,
+    devolvendo cada bloco já normalizado (mesmas colunas e tipos do modo
+    "mmap"). Só um bloco fica em memória por vez: o arquivo é mapeado (as
+    páginas são do cache do sistema, não do processo), então dá para gerar
+    resumos de arquivos maiores que a RAM.
+
+    Notas e inteiros chegam como texto e são convertidos bloco a bloco por
+    normalizar_tabela: um valor fora do padrão no meio do arquivo não obriga
+    a recomeçar a leitura, como no modo "tipado".
+    """
+    if os.path.getsize(caminho_arquivo) == 0:
+        raise _erro_secao_ausente(caminho_arquivo)
+
+    with open(caminho_arquivo, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        inicio, fim = localizar_secao(mm, caminho_arquivo)
+        colunas = _cabecalho_secao(mm, inicio, fim)
+        if not colunas:
+            return
+        with _LeitorIntervalo(mm, inicio, fim) as leitor:
+            blocos = pd.read_csv(
+                io.BufferedReader(leitor),
+                sep=";",
+                header=0,
+                dtype="str",
+                encoding="utf-8",
+                encoding_errors="ignore",
+                chunksize=linhas_por_bloco,
+            )
+            with blocos:
+                for bloco in blocos:
+                    if not bloco.empty:
+                        yield normalizar_tabela(bloco)
+
+
+def _ler_em_blocos(caminho_arquivo):
+    """
+    Modo "blocos": junta os blocos de ler_usuarios_em_blocos(). O pico de
+    memória fica em torno da tabela final mais um bloco, em vez de várias
+    cópias da seção inteira durante o parse.
+    """
+    blocos = list(ler_usuarios_em_blocos(caminho_arquivo))
+    if not blocos:
+        with open(caminho_arquivo, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            inicio, fim = localizar_secao(mm, caminho_arquivo)
+            colunas = _cabecalho_secao(mm, inicio, fim) or HEADER_PADRAO.split(";")
+        return pd.DataFrame(columns=[col.strip() for col in colunas])
+    return pd.concat(blocos, ignore_index=True)
+
+
+# Modos de leitura disponíveis para ler_usuarios_csv()
+LEITORES = {
+    "linhas": _ler_por_linhas,
+    "mmap": _ler_por_mmap,
+    "tipado": _ler_tipado,
+    "pyarrow": _ler_tipado_pyarrow,
+    "blocos": _ler_em_blocos,
+    "paralelo": ler_usuarios_paralelo,
+}
+MODO_PADRAO = "tipado"
+
+
+def ler_usuarios_csv(caminho_arquivo, modo=MODO_PADRAO):
+    """Lê a seção [USUARIOS] do arquivo e devolve o DataFrame normalizado."""
+    try:
+        leitor = LEITORES[modo]
+    except KeyError:
+        raise ValueError(f"Modo de leitura desconhecido: {modo}") from None
+    return leitor(caminho_arquivo)
+
+
+# === TIPOS COMPACTOS
+# Colunas com poucos valores distintos: viram category (um código inteiro
+# por linha no lugar de um objeto str por linha)
+COLUNAS_CATEGORICAS = ["NIVEL", "CURSO", "ID_TURMAS", "STATUS DO ALUNO"]
+
+
+def compactar_tipos(df):
+    """
+    Cópia da tabela com tipos econômicos: category nas COLUNAS_CATEGORICAS,
+    float32 nas notas (duas casas cabem com folga nos ~7 dígitos) e int32
+    em ID/IDADE. Comparações como df["NIVEL"] == "ALUNO" passam a comparar
+    os códigos inteiros.
+
+    Valores novos numa coluna category precisam entrar como categoria antes
+    (ver indices.definir_valor e indices.anexar_linhas).
+    """
+    tipos = {}
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            tipos[col] = "category"
+    for col in COLUNAS_NOTAS:
+        if col in df.columns and pd.api.types.is_float_dtype(df[col]):
+            tipos[col] = np.float32
+    for col in COLUNAS_INTEIRAS:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            limites = np.iinfo(np.int32)
+            if df.empty or (
+                limites.min <= df[col].min() and df[col].max() <= limites.max
+            ):
+                tipos[col] = np.int32
+    return df.astype(tipos)
+
+
+def expandir_tipos(df):
+    """
+    Inverso de compactar_tipos: texto, float64 e int64. Usado onde as linhas
+    viram valores do Python (diário, SQLite, Treeview), para que uma nota
+    float32 saia como 7.35 e não 7.349999904632568.
+    """
+    tipos = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            tipos[col] = dtype.categories.dtype
+        elif dtype == np.float32:
+            tipos[col] = np.float64
+        elif dtype == np.int32:
+            tipos[col] = np.int64
+    if not tipos:
+        return df
+    df = df.astype(tipos)
+    for col in COLUNAS_NOTAS:
+        if tipos.get(col) is np.float64:
+            df[col] = df[col].round(2)
+    return df
+
+
+def memoria_por_coluna(df):
+    """Bytes ocupados por coluna (incluindo os objetos str) e o total por linha."""
+    bytes_colunas = df.memory_usage(deep=True, index=False)
+    return {
+        "colunas": bytes_colunas.to_dict(),
+        "total": int(bytes_colunas.sum()),
+        "por_linha": bytes_colunas.sum() / len(df) if len(df) else 0.0,
+    }
+
+
+# === GRAVAÇÃO ATÔMICA
+TENTATIVAS_SUBSTITUICAO = 5
+
+
+def _sincronizar_diretorio(pasta):
+    """fsync do diretório, para a troca de nomes também sobreviver a uma queda."""
+    if os.name != "posix":
+        return  # No Windows não dá para abrir um diretório com os.open
+    fd = os.open(pasta, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _substituir(origem, destino):
+    """os.replace com novas tentativas (no Windows o destino pode estar aberto)."""
+    for tentativa in range(TENTATIVAS_SUBSTITUICAO):
+        try:
+            os.replace(origem, destino)
+            return
+        except PermissionError:
+            if tentativa == TENTATIVAS_SUBSTITUICAO - 1:
+                raise
+            time.sleep(0.05 * (tentativa + 1))
+
+
+@contextmanager
+def arquivo_atomico(caminho_arquivo):
+    """
+    Abre um arquivo temporário (texto UTF-8) na mesma pasta do destino.
+
+    Ao sair sem erro: flush, fsync e os.replace sobre o arquivo original.
+    Se algo falhar no meio, o temporário é apagado e o original fica intacto.
+    """
+    pasta = os.path.dirname(os.path.abspath(caminho_arquivo))
+    Path(pasta).mkdir(parents=True, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(
+        prefix=f".{os.path.basename(caminho_arquivo)}.", suffix=".tmp", dir=pasta
+    )
+    try:
+        with open(fd, "w", encoding="utf-8", newline="") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp cria com permissão 0600; mantém a do arquivo original
+        if os.path.exists(caminho_arquivo):
+            shutil.copymode(caminho_arquivo, temporario)
+        else:
+            os.chmod(temporario, 0o644)
+        _substituir(temporario, caminho_arquivo)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except FileNotFoundError:
+            pass
+        raise
+    _sincronizar_diretorio(pasta)
+
+
+# === SEQUÊNCIA DE IDS
+# Arquivo .seq com o último ID já entregue (um número, em texto), o mesmo do
+# programa em C (reservarIDsUsuarios em sistemaAcademico_unificado.h): os
+# dois usam o caminho da variável de ambiente SISTEMA_ACADEMICO_SEQ ou, sem
+# ela, CAMINHO_SEQUENCIA_PADRAO (relativo à pasta em que são executados), e
+# a mesma trava "<seq>.lock", criada com O_EXCL.
+VARIAVEL_SEQUENCIA = "SISTEMA_ACADEMICO_SEQ"
+CAMINHO_SEQUENCIA_PADRAO = os.path.join("Output", "SistemaAcademico.csv.seq")
+ESPERA_MAXIMA_TRAVA = 5.0
+IDADE_TRAVA_ABANDONADA = 30.0
+
+
+def caminho_sequencia(caminho_arquivo=None):
+    """
+    "<caminho_arquivo>.seq" ou, sem arquivo, o .seq compartilhado com o
+    programa em C (SISTEMA_ACADEMICO_SEQ ou o caminho padrão).
+    """
+    if caminho_arquivo is not None:
+        return f"{caminho_arquivo}.seq"
+    return os.environ.get(VARIAVEL_SEQUENCIA) or CAMINHO_SEQUENCIA_PADRAO
+
+
+@contextmanager
+def _trava_arquivo(caminho_trava, espera_maxima=ESPERA_MAXIMA_TRAVA):
+    """Trava entre processos: só quem conseguiu criar o arquivo segue adiante."""
+    limite = time.monotonic() + espera_maxima
+    while True:
+        try:
+            fd = os.open(caminho_trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                # Trava esquecida por um processo que caiu
+                if (
+                    time.time() - os.path.getmtime(caminho_trava)
+                    > IDADE_TRAVA_ABANDONADA
+                ):
+                    os.remove(caminho_trava)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > limite:
+                raise TimeoutError(
+                    f"Arquivo travado por outro processo: {caminho_trava}"
+                )
+            time.sleep(0.01)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        os.remove(caminho_trava)
+
+
+class SequenciaIDs:
+    """
+    Gerador de IDs crescente e persistente, compartilhado com o programa em C.
+
+    Substitui o "maior ID + 1": reservar(n) devolve um bloco de n IDs novos
+    com uma leitura e uma gravação do arquivo .seq, qualquer que seja o
+    tamanho da tabela. IDs de usuários excluídos nunca são reaproveitados.
+    """
+
+    def __init__(self, caminho_arquivo=None):
+        """Sem caminho_arquivo, usa o .seq compartilhado com o programa em C."""
+        self.caminho = caminho_sequencia(caminho_arquivo)
+
+    def _ler(self):
+        """Último ID gravado, ou None se o arquivo não existe ou está corrompido."""
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                ultimo = int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            # Como no C: arquivo vazio ou ilegível recomeça do maior ID da tabela
+            return None
+        return ultimo if ultimo >= 0 else None
+
+    def _gravar(self, ultimo_id):
+        with arquivo_atomico(self.caminho) as f:
+            f.write(f"{ultimo_id}\n")
+
+    def _trava(self):
+        os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+        return _trava_arquivo(self.caminho + ".lock")
+
+    def ultimo(self):
+        """Último ID entregue (None se a sequência ainda não existe)."""
+        return self._ler()
+
+    def reservar(self, quantidade=1, obter_maximo=None):
+        """
+        Reserva "quantidade" IDs seguidos e devolve o range com eles.
+
+        Na primeira vez (sem arquivo .seq, ou com ele corrompido), a
+        sequência começa em obter_maximo() — o maior ID já existente na tabela.
+        """
+        if quantidade < 1:
+            raise ValueError("A quantidade de IDs reservados deve ser positiva.")
+        with self._trava():
+            ultimo = self._ler()
+            if ultimo is None:
+                ultimo = int(obter_maximo()) if obter_maximo is not None else 0
+            self._gravar(ultimo + quantidade)
+        return range(ultimo + 1, ultimo + quantidade + 1)
+
+    def ajustar(self, maior_id):
+        """Garante que a sequência não entregue IDs <= maior_id (ex.: após importar)."""
+        with self._trava():
+            ultimo = self._ler()
+            if ultimo is None or ultimo < int(maior_id):
+                self._gravar(int(maior_id))
+
+
+# === GRAVAÇÃO DO CSV
+def preparar_para_csv(df):
+    """Renomeia as colunas internas para o cabeçalho do CSV, na ordem padrão."""
+    return df.rename(columns=COLUNAS_APP_PARA_CSV).reindex(columns=COLUNAS_CSV)
+
+
+# Linhas por bloco ao escrever o CSV (o to_csv grava bloco a bloco no arquivo)
+LINHAS_POR_BLOCO = 50_000
+
+
+def formatar_decimal_virgula(serie):
+    """
+    Formata uma coluna numérica como texto com duas casas e vírgula ("7,50").
+
+    Em vez de formatar célula por célula, formata uma vez cada valor distinto
+    (as notas têm poucos valores diferentes) e espalha o resultado com
+    indexação do NumPy. O texto é o mesmo de f"{x:.2f}"; vazios viram "".
+    """
+    valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float)
+    validos = ~np.isnan(valores)
+    saida = np.full(len(valores), "", dtype=object)
+    if validos.any():
+        unicos, posicoes = np.unique(valores[validos], return_inverse=True)
+        textos = np.array(
+            [f"{v:.2f}".replace(".", ",") for v in unicos.tolist()], dtype=object
+        )
+        saida[validos] = textos[posicoes.ravel()]
+        # np.unique junta 0.0 e -0.0; o f-string escreveria "-0.00"
+        zeros_negativos = (valores == 0) & np.signbit(valores)
+        saida[zeros_negativos] = "-0,00"
+    return pd.Series(saida, index=serie.index)
+
+
+def _formatar_para_csv(df):
+    """Colunas no padrão do CSV, com as notas em texto ("7,50")."""
+    df_to_save = preparar_para_csv(df)
+    for col in ["np1", "np2", "pim", "media"]:
+        if col in df_to_save.columns:
+            df_to_save[col] = formatar_decimal_virgula(df_to_save[col])
+    return df_to_save
+
+
+def _gravar_linhas_csv(df_formatado, arquivo, header):
+    df_formatado.to_csv(
+        arquivo,
+        sep=";",
+        index=False,
+        header=header,
+        lineterminator="\r\n",
+        chunksize=LINHAS_POR_BLOCO,
+    )
+
+
+def escrever_csv_usuarios(df, caminho_arquivo):
+    """Grava o DataFrame como seção [USUARIOS] e devolve o tamanho do arquivo."""
+    df_to_save = _formatar_para_csv(df)
+    with arquivo_atomico(caminho_arquivo) as f:
+        f.write(f"{SECAO_ALVO}\n")
+        _gravar_linhas_csv(df_to_save, f, header=True)
+    return os.path.getsize(caminho_arquivo)
+
+
+_RE_NAO_ESPACO = re.compile(rb"\S")
+
+
+def anexar_csv_usuarios(df, caminho_arquivo):
+    """
+    Acrescenta linhas no fim da seção [USUARIOS], sem regravar o resto.
+
+    Só é possível quando a seção é a última do arquivo e já tem cabeçalho;
+    caso contrário devolve None e quem chamou deve regravar o arquivo todo.
+    """
+    if os.path.getsize(caminho_arquivo) == 0:
+        return None
+    with open(caminho_arquivo, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        try:
+            inicio, fim = localizar_secao(mm, caminho_arquivo)
+        except ErroFormatoCSV:
+            return None
+        if fim != len(mm) or _RE_NAO_ESPACO.search(mm, inicio, fim) is None:
+            return None
+        termina_com_quebra = mm[-1:] == b"\n"
+
+    # O conteúdo atual é copiado byte a byte (sem reformatar nada) para o
+    # temporário, e as linhas novas vão no fim: quem lê o arquivo vê a versão
+    # antiga ou a nova, nunca uma linha pela metade.
+    tamanho_antes = os.path.getsize(caminho_arquivo)
+    with arquivo_atomico(caminho_arquivo) as f:
+        with open(caminho_arquivo, "rb") as original:
+            shutil.copyfileobj(original, f.buffer)
+        if not termina_com_quebra:
+            f.write("\r\n")
+        _gravar_linhas_csv(_formatar_para_csv(df), f, header=False)
+    return os.path.getsize(caminho_arquivo) - tamanho_antes
+
+
+# === CACHE DA TABELA
+def calcular_hash_arquivo(caminho_arquivo, tamanho_bloco=1024 * 1024):
+    """Hash (BLAKE2b) do conteúdo do arquivo, lido em blocos."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho_arquivo, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+# === SNAPSHOT COLUNAR
+# Cópia binária do DataFrame já normalizado, gravada ao lado do CSV. Guarda a
+# assinatura (tamanho, mtime) e o hash do CSV de origem: se o CSV mudou, o
+# snapshot é ignorado e reconstruído em segundo plano.
+def caminho_snapshot(caminho_arquivo):
+    extensao = ".snapshot.feather" if TEM_PYARROW else ".snapshot.npz"
+    return caminho_arquivo + extensao
+
+
+def _colunas_serializaveis(df):
+    """O snapshot só aceita colunas numéricas ou de texto (com ou sem vazios)."""
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_numeric_dtype(serie.dtype):
+            continue
+        if pd.api.types.infer_dtype(serie, skipna=True) not in ("string", "empty"):
+            return False
+    return True
+
+
+def gravar_snapshot(caminho_arquivo, df, assinatura, hash_csv):
+    """
+    Grava o snapshot de forma atômica (arquivo temporário + os.replace).
+
+    Se a gravação falhar, o temporário é apagado, o snapshot anterior fica
+    intacto e a exceção é propagada para quem chamou.
+    """
+    if not _colunas_serializaveis(df):
+        return False
+    destino = caminho_snapshot(caminho_arquivo)
+    temporario = f"{destino}.{threading.get_ident()}.tmp"
+    meta = {
+        "assinatura": list(assinatura),
+        "hash": hash_csv,
+        "colunas": [str(col) for col in df.columns],
+        "dtypes": [str(df[col].dtype) for col in df.columns],
+    }
+    try:
+        if TEM_PYARROW:
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            tabela = tabela.replace_schema_metadata(
+                {b"sistema_academico": json.dumps(meta).encode()}
+            )
+            feather.write_feather(tabela, temporario, compression="uncompressed")
+        else:
+            arrays = {"__meta__": np.array(json.dumps(meta))}
+            for i, col in enumerate(df.columns):
+                serie = df[col]
+                if pd.api.types.is_numeric_dtype(serie.dtype):
+                    arrays[f"c{i}"] = serie.to_numpy()
+                else:
+                    nulos = serie.isna().to_numpy()
+                    arrays[f"c{i}"] = serie.fillna("").to_numpy(dtype=str)
+                    if nulos.any():
+                        arrays[f"n{i}"] = nulos
+            with open(temporario, "wb") as f:
+                np.savez(f, **arrays)
+        os.replace(temporario, destino)
+        return True
+    finally:
+        # Não deixa um arquivo parcial para trás (nem mascara o erro original)
+        with suppress(OSError):
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+
+def ler_snapshot(caminho_arquivo, assinatura):
+    """Devolve (df, hash_csv) do snapshot, ou None se ele não existe ou está velho."""
+    origem = caminho_snapshot(caminho_arquivo)
+    if not os.path.exists(origem):
+        return None
+    try:
+        if TEM_PYARROW:
+            tabela = feather.read_table(origem, memory_map=True)
+            meta = json.loads(tabela.schema.metadata[b"sistema_academico"])
+            if tuple(meta["assinatura"]) != tuple(assinatura):
+                return None
+            df = tabela.to_pandas()
+        else:
+            with np.load(origem, allow_pickle=False) as arquivo:
+                meta = json.loads(str(arquivo["__meta__"]))
+                if tuple(meta["assinatura"]) != tuple(assinatura):
+                    return None
+                colunas = {}
+                for i, (col, dtype) in enumerate(zip(meta["colunas"], meta["dtypes"])):
+                    serie = pd.Series(arquivo[f"c{i}"], dtype=dtype)
+                    if f"n{i}" in arquivo.files:
+                        serie = serie.where(~arquivo[f"n{i}"])
+                    colunas[col] = serie
+                df = pd.DataFrame(colunas, columns=meta["colunas"])
+    except (OSError, ValueError, KeyError, TypeError):
+        # Snapshot corrompido ou de outra versão: basta reler o CSV
+        return None
+    return df, meta["hash"]
+
+
+def _assinatura_arquivo(stat):
+    """
+    (tamanho, mtime, políticas de notas): a MEDIA guardada no cache e no
+    snapshot depende das políticas, então mudá-las também invalida a cópia.
+    """
+    return (stat.st_size, stat.st_mtime_ns, motor_notas.assinatura())
+
+
+class CacheTabela:
+    """
+    Guarda o último DataFrame lido de cada arquivo.
+
+    A entrada é validada pelo tamanho e mtime do arquivo; se eles mudaram,
+    o hash do conteúdo decide se é preciso ler o CSV de novo (ex.: o arquivo
+    foi apenas "tocado" pela sincronização do OneDrive).
+
+    Com usar_snapshot=True, a primeira leitura de cada execução tenta o
+    snapshot colunar antes do CSV, e toda leitura completa do CSV agenda a
+    reconstrução do snapshot numa thread em segundo plano.
+    """
+
+    def __init__(self, modo=MODO_PADRAO, usar_snapshot=False):
+        self.modo = modo
+        self.usar_snapshot = usar_snapshot
+        self._entradas = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.leituras_snapshot = 0
+        self._threads_snapshot = []
+        self.erros_snapshot = []
+
+    def carregar(self, caminho_arquivo):
+        """Devolve uma cópia do DataFrame, relendo o CSV só se o arquivo mudou."""
+        chave = os.path.abspath(caminho_arquivo)
+        stat = os.stat(caminho_arquivo)
+        assinatura = _assinatura_arquivo(stat)
+        entrada = self._entradas.get(chave)
+
+        if entrada is not None and entrada["assinatura"] == assinatura:
+            self.acertos += 1
+            return entrada["df"].copy()
+
+        if entrada is None and self.usar_snapshot:
+            snapshot = ler_snapshot(caminho_arquivo, assinatura)
+            if snapshot is not None:
+                df, hash_csv = snapshot
+                self.leituras_snapshot += 1
+                self._entradas[chave] = {
+                    "assinatura": assinatura,
+                    "hash": hash_csv,
+                    "df": df,
+                }
+                return df.copy()
+
+        hash_atual = calcular_hash_arquivo(caminho_arquivo)
+        # Conteúdo igual e mesmas políticas de notas (último item da assinatura)
+        if (
+            entrada is not None
+            and entrada["hash"] == hash_atual
+            and entrada["assinatura"][-1] == assinatura[-1]
+        ):
+            entrada["assinatura"] = assinatura
+            self.acertos += 1
+            return entrada["df"].copy()
+
+        self.falhas += 1
+        df = ler_usuarios_csv(caminho_arquivo, self.modo)
+        self._entradas[chave] = {"assinatura": assinatura, "hash": hash_atual, "df": df}
+        self._agendar_snapshot(caminho_arquivo, df, assinatura, hash_atual)
+        return df.copy()
+
+    def registrar(self, caminho_arquivo, df):
+        """
+        Associa ao arquivo recém-gravado o DataFrame que foi salvo nele.
+
+        As notas vão para o CSV com duas casas decimais, então são arredondadas
+        aqui para que a cópia em cache seja igual a uma releitura do arquivo.
+        """
+        df_cache = expandir_tipos(df).copy()
+        for col in COLUNAS_NOTAS:
+            if col in df_cache.columns:
+                df_cache[col] = pd.to_numeric(df_cache[col], errors="coerce").round(2)
+        df_cache = normalizar_tabela(df_cache)
+
+        stat = os.stat(caminho_arquivo)
+        assinatura = _assinatura_arquivo(stat)
+        hash_atual = calcular_hash_arquivo(caminho_arquivo)
+        self._entradas[os.path.abspath(caminho_arquivo)] = {
+            "assinatura": assinatura,
+            "hash": hash_atual,
+            "df": df_cache,
+        }
+        self._agendar_snapshot(caminho_arquivo, df_cache, assinatura, hash_atual)
+
+    def _agendar_snapshot(self, caminho_arquivo, df, assinatura, hash_csv):
+        """Reconstrói o snapshot numa thread daemon (o df em cache nunca é alterado)."""
+        if not self.usar_snapshot:
+            return
+        thread = threading.Thread(
+            target=self._gravar_snapshot,
+            args=(caminho_arquivo, df, assinatura, hash_csv),
+            daemon=True,
+        )
+        thread.start()
+        self._threads_snapshot = [t for t in self._threads_snapshot if t.is_alive()]
+        self._threads_snapshot.append(thread)
+
+    def _gravar_snapshot(self, caminho_arquivo, df, assinatura, hash_csv):
+        """Corpo da thread: uma falha é registrada em log e em erros_snapshot."""
+        try:
+            gravar_snapshot(caminho_arquivo, df, assinatura, hash_csv)
+        except Exception as e:
+            logger.exception("Falha ao gravar o snapshot de %s", caminho_arquivo)
+            self.erros_snapshot.append(e)
+
+    def aguardar_snapshots(self, timeout=None):
+        """
+        Espera as gravações de snapshot pendentes (útil ao fechar o App) e
+        devolve a lista das exceções que ocorreram desde a última chamada.
+        """
+        for thread in self._threads_snapshot:
+            thread.join(timeout)
+        self._threads_snapshot = []
+        erros, self.erros_snapshot = self.erros_snapshot, []
+        return erros
+
+    def esta_atualizado(self, caminho_arquivo):
+        """True se o arquivo não mudou desde a última leitura/registro no cache."""
+        entrada = self._entradas.get(os.path.abspath(caminho_arquivo))
+        if entrada is None:
+            return False
+        stat = os.stat(caminho_arquivo)
+        return entrada["assinatura"] == _assinatura_arquivo(stat)
+
+    def invalidar(self, caminho_arquivo=None):
+        """Descarta a entrada de um arquivo (ou todas, se nenhum for informado)."""
+        if caminho_arquivo is None:
+            self._entradas.clear()
+        else:
+            self._entradas.pop(os.path.abspath(caminho_arquivo), None)
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "leituras_snapshot": self.leituras_snapshot,
+            "erros_snapshot": len(self.erros_snapshot),
+            "taxa_acerto": (self.acertos / total) if total else 0.0,
+        }
+
+
+# === REGISTRO DE ALTERAÇÕES
+class RegistroAlteracoes:
+    """IDs inseridos, atualizados e excluídos desde o último salvamento."""
+
+    def __init__(self):
+        self.inseridos = set()
+        self.atualizados = set()
+        self.excluidos = set()
+
+    def marcar_inserido(self, user_id):
+        user_id = int(user_id)
+        if user_id in self.excluidos:
+            # ID reaproveitado: a linha ainda existe no arquivo/banco e só
+            # precisa ser regravada com o conteúdo novo
+            self.excluidos.discard(user_id)
+            self.atualizados.add(user_id)
+            return
+        self.inseridos.add(user_id)
+
+    def marcar_inseridos(self, user_ids):
+        """marcar_inserido() de vários IDs de uma vez (ex.: importação em lote)."""
+        for user_id in user_ids:
+            self.marcar_inserido(user_id)
+
+    def marcar_atualizado(self, user_id):
+        user_id = int(user_id)
+        # Uma linha nova ainda não salva continua sendo só uma inserção
+        if user_id not in self.inseridos:
+            self.atualizados.add(user_id)
+
+    def marcar_atualizados(self, user_ids):
+        """marcar_atualizado() de vários IDs de uma vez (ex.: MEDIA recalculada)."""
+        self.atualizados.update({int(user_id) for user_id in user_ids} - self.inseridos)
+
+    def marcar_excluido(self, user_id):
+        user_id = int(user_id)
+        if user_id in self.inseridos:
+            # Inserida e excluída antes de salvar: não há nada a gravar
+            self.inseridos.discard(user_id)
+            return
+        self.atualizados.discard(user_id)
+        self.excluidos.add(user_id)
+
+    @property
+    def vazio(self):
+        return not (self.inseridos or self.atualizados or self.excluidos)
+
+    @property
+    def somente_insercoes(self):
+        return bool(self.inseridos) and not (self.atualizados or self.excluidos)
+
+    def mesclar(self, outro):
+        """Acrescenta as alterações de outro registro, na ordem em que ocorreram."""
+        for user_id in outro.inseridos:
+            self.marcar_inserido(user_id)
+        for user_id in outro.atualizados:
+            self.marcar_atualizado(user_id)
+        for user_id in outro.excluidos:
+            self.marcar_excluido(user_id)
+
+    def copia(self):
+        nova = RegistroAlteracoes()
+        nova.inseridos = set(self.inseridos)
+        nova.atualizados = set(self.atualizados)
+        nova.excluidos = set(self.excluidos)
+        return nova
+
+    def limpar(self):
+        self.inseridos.clear()
+        self.atualizados.clear()
+        self.excluidos.clear()
+
+    def __len__(self):
+        return len(self.inseridos) + len(self.atualizados) + len(self.excluidos)
+
+
+# === DIÁRIO DE ALTERAÇÕES
+LIMITE_DIARIO = 1000
+
+
+def caminho_diario(caminho_arquivo):
+    return f"{caminho_arquivo}.diario"
+
+
+def aplicar_diario(df, registros):
+    """
+    Aplica os registros do diário (na ordem em que foram gravados) ao DataFrame.
+
+    Só o último registro de cada ID importa: linhas gravadas substituem a do
+    mesmo ID no lugar (ou entram no fim, se o ID é novo) e exclusões removem.
+    """
+    finais = {}
+    for registro in registros:
+        finais[int(registro["id"])] = registro.get("linha")
+    if not finais:
+        return df
+
+    gravar = [linha for linha in finais.values() if linha is not None]
+    excluir = [user_id for user_id, linha in finais.items() if linha is None]
+    if gravar:
+        novos = normalizar_tabela(pd.DataFrame(gravar)).reindex(columns=df.columns)
+        existentes = novos["ID"].isin(df["ID"]).to_numpy()
+        if existentes.any():
+            atualizar = novos[existentes]
+            posicoes = pd.Index(df["ID"]).get_indexer(atualizar["ID"])
+            df = df.copy()
+            for col in df.columns:
+                df.iloc[posicoes, df.columns.get_loc(col)] = atualizar[col].to_numpy()
+        if not existentes.all():
+            df = pd.concat([df, novos[~existentes]], ignore_index=True)
+    if excluir:
+        df = df[~df["ID"].isin(excluir)].reset_index(drop=True)
+    return df
+
+
+class DiarioAlteracoes:
+    """
+    Diário (write-ahead log) ao lado do CSV: um registro JSON por linha.
+
+    Cada salvamento só acrescenta as linhas alteradas no fim do diário (com
+    um fsync), em vez de regravar o CSV inteiro. A leitura aplica o diário
+    por cima do CSV; compactar = regravar o CSV e esvaziar o diário.
+    """
+
+    def __init__(self, caminho_arquivo):
+        self.caminho = caminho_diario(caminho_arquivo)
+
+    def anexar(self, df, alteracoes):
+        """Grava as linhas afetadas por "alteracoes" e devolve os bytes escritos."""
+        ids_gravar = alteracoes.inseridos | alteracoes.atualizados
+        registros = []
+        if ids_gravar:
+            linhas = expandir_tipos(df[df["ID"].isin(list(ids_gravar))]).to_dict(
+                "records"
+            )
+            registros.extend(
+                {"op": "gravar", "id": int(linha["ID"]), "linha": linha}
+                for linha in linhas
+            )
+        registros.extend(
+            {"op": "excluir", "id": user_id} for user_id in sorted(alteracoes.excluidos)
+        )
+        dados = "".join(
+            json.dumps(registro, ensure_ascii=False, default=_json_nativo) + "\n"
+            for registro in registros
+        ).encode("utf-8")
+
+        with open(self.caminho, "a+b") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                # Uma queda no meio de uma gravação anterior pode ter deixado
+                # uma linha pela metade; o registro novo começa numa linha nova
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    dados = b"\n" + dados
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(registros), len(dados)
+
+    def ler(self):
+        """Registros do diário; uma última linha incompleta é ignorada."""
+        if not os.path.exists(self.caminho):
+            return []
+        registros = []
+        with open(self.caminho, "rb") as f:
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    continue
+        return registros
+
+    def __len__(self):
+        if not os.path.exists(self.caminho):
+            return 0
+        with open(self.caminho, "rb") as f:
+            return sum(1 for _ in f)
+
+    def limpar(self):
+        """Esvazia o diário (chamar só depois de o CSV ter sido regravado)."""
+        if os.path.exists(self.caminho):
+            with arquivo_atomico(self.caminho):
+                pass
+
+
+def _json_nativo(valor):
+    """Converte escalares do NumPy para tipos que o json sabe gravar."""
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if valor is pd.NA or valor is pd.NaT:
+        return None
+    raise TypeError(f"Valor não serializável no diário: {valor!r}")
+
+
+# === BACKENDS DE ARMAZENAMENTO
+# Todos expõem a mesma interface usada pelo App:
+#   carregar() -> DataFrame com as colunas internas
+#   salvar(df, alteracoes=None) -> grava e devolve {"linhas": n, "bytes": b};
+#       com um RegistroAlteracoes, o backend pode gravar só as linhas
+#       afetadas (None = gravar a tabela inteira)
+#   importar_csv(caminho) / exportar_csv(caminho) -> troca de dados no
+#       formato do CSV (o mesmo lido pelo programa em C)
+#   lote() -> agrupa vários salvar() numa única gravação (um só fsync)
+#   compactar() -> consolida gravações parciais (ex.: diário) no arquivo
+def _linhas_alteradas(df, alteracoes):
+    """Só as linhas de df com IDs inseridos/atualizados em "alteracoes"."""
+    return df[df["ID"].isin(list(alteracoes.inseridos | alteracoes.atualizados))]
+
+
+def _sobrepor_linhas(df, novas, excluidos):
+    """
+    df com as linhas de "novas" no lugar das de mesmo ID, as demais no fim
+    e sem os IDs em "excluidos".
+    """
+    # Posição de cada linha nova em df (-1: ID que não estava lá, vai no fim)
+    posicoes = pd.Index(df["ID"]).get_indexer(novas["ID"])
+    fica = np.ones(len(df), dtype=bool)
+    fica[posicoes[posicoes >= 0]] = False
+    ordem = np.concatenate(
+        [
+            np.flatnonzero(fica),
+            np.where(posicoes >= 0, posicoes, len(df) + np.arange(len(novas))),
+        ]
+    )
+    tabela = pd.concat([df[fica], novas]).iloc[np.argsort(ordem, kind="stable")]
+    return tabela[~tabela["ID"].isin(list(excluidos))].reset_index(drop=True)
+
+
+class ArmazenamentoBase(abc.ABC):
+    """
+    Parte comum dos backends: o salvar() com suporte a gravação em lote.
+
+    Cada backend implementa _gravar(df, alteracoes), que faz a gravação de
+    fato e devolve {"linhas": n, "bytes": b}; um backend sem ele não pode
+    ser criado (TypeError já no construtor).
+    """
+
+    # True quando salvar(df, alteracoes) só lê de df as linhas alteradas
+    suporta_alteracao_por_linha = False
+
+    def __init__(self):
+        # Serializa o acesso ao arquivo/banco (o GravadorEmSegundoPlano grava
+        # de outra thread)
+        self._trava = threading.RLock()
+        self._nivel_lote = 0
+        self._dono_lote = None  # Thread que abriu o lote
+        self._descartar_lote()
+        self.ultimo_lote = None
+
+    def precisa_tabela_completa(self, alteracoes):
+        """
+        Se salvar(df, alteracoes) precisa da tabela inteira em df. Quando não
+        precisa, df pode ter só as linhas dos IDs inseridos/atualizados.
+        """
+        return alteracoes is None or not self.suporta_alteracao_por_linha
+
+    def salvar(self, df, alteracoes=None):
+        if alteracoes is not None and alteracoes.vazio:
+            return {"linhas": 0, "bytes": 0}
+        if not self._nivel_lote or self._dono_lote != threading.get_ident():
+            with self._trava:
+                return self._gravar(df, alteracoes)
+
+        # Dentro de um lote só anota o que seria gravado (a tabela inteira
+        # ou, se o backend grava por linha, as linhas alteradas); a gravação
+        # acontece uma vez, no fim do lote.
+        if not self.precisa_tabela_completa(alteracoes):
+            df = _linhas_alteradas(df, alteracoes)
+        self._adiados_lote.append((df, alteracoes))
+        return {"linhas": 0, "bytes": 0}
+
+    def _juntar_lote(self, adiados):
+        """
+        (df, alteracoes) que gravam de uma vez os salvar() adiados: a última
+        tabela inteira com as linhas salvas depois dela por cima. alteracoes
+        None (regravar a tabela inteira) se algum salvar() foi completo.
+        """
+        tabela, linhas, excluidos = None, [], set()
+        alteracoes = RegistroAlteracoes()
+        for df, alteracoes_df in adiados:
+            if self.precisa_tabela_completa(alteracoes_df):
+                tabela, linhas, excluidos = df, [], set()
+            else:
+                linhas.append(df)
+                excluidos |= alteracoes_df.excluidos
+            if alteracoes_df is None:
+                alteracoes = None
+            elif alteracoes is not None:
+                alteracoes.mesclar(alteracoes_df)
+        if linhas:
+            novas = pd.concat(linhas)
+            novas = novas[~novas["ID"].duplicated(keep="last").to_numpy()]
+            tabela = _sobrepor_linhas(
+                novas.iloc[:0] if tabela is None else tabela, novas, excluidos
+            )
+        return tabela, alteracoes
+
+    @contextmanager
+    def lote(self):
+        """
+        Agrupa os salvar() feitos dentro do bloco numa única gravação.
+
+        Útil para rajadas de edições (ex.: lançar as notas de uma turma): em
+        vez de um fsync por edição, há um só no fim. O resultado da gravação
+        fica em self.ultimo_lote. Se o bloco levantar exceção, nada é gravado.
+        """
+        if not self._nivel_lote:
+            self._dono_lote = threading.get_ident()
+        self._nivel_lote += 1
+        try:
+            yield self
+        except BaseException:
+            self._nivel_lote -= 1
+            if not self._nivel_lote:
+                self._descartar_lote()
+            raise
+        self._nivel_lote -= 1
+        if self._nivel_lote:
+            return
+
+        adiados = self._adiados_lote
+        self._descartar_lote()
+        self.ultimo_lote = {"linhas": 0, "bytes": 0}
+        if not adiados:
+            return
+        df, alteracoes = self._juntar_lote(adiados)
+        if alteracoes is not None and alteracoes.vazio:
+            return
+        with self._trava:
+            self.ultimo_lote = self._gravar(df, alteracoes)
+
+    def _descartar_lote(self):
+        # Único estado do lote: os salvar() adiados, (df, alteracoes) na ordem
+        self._adiados_lote = []
+
+    @abc.abstractmethod
+    def _gravar(self, df, alteracoes):
+        """Grava df de fato (alteracoes None: a tabela inteira)."""
+
+    def compactar(self):
+        """Nada a fazer por padrão (o backend grava sempre o estado completo)."""
+
+
+class ArmazenamentoCSV(ArmazenamentoBase):
+    """
+    Backend padrão: o arquivo CSV é regravado a cada salvamento.
+
+    Se as alterações pendentes forem só inserções e o arquivo não mudou desde
+    a última leitura, as linhas novas são apenas anexadas no fim.
+
+    Com usar_diario=True, salvamentos com um RegistroAlteracoes só acrescentam
+    as linhas alteradas ao DiarioAlteracoes, e o CSV é regravado (compactado)
+    quando o diário passa de limite_diario registros ou em compactar().
+    O programa em C só enxerga o que já foi compactado no CSV.
+    """
+
+    suporta_alteracao_por_linha = False
+
+    def __init__(
+        self,
+        caminho_arquivo,
+        cache=None,
+        usar_diario=False,
+        limite_diario=LIMITE_DIARIO,
+    ):
+        super().__init__()
+        self.caminho_arquivo = caminho_arquivo
+        self.cache = cache if cache is not None else CacheTabela()
+        self.diario = DiarioAlteracoes(caminho_arquivo) if usar_diario else None
+        self.limite_diario = limite_diario
+        self._registros_diario = len(self.diario) if self.diario else 0
+
+    def carregar(self):
+        if not os.path.exists(self.caminho_arquivo):
+            raise FileNotFoundError(
+                f"Arquivo CSV não encontrado no caminho: {self.caminho_arquivo}"
+            )
+        with self._trava:
+            df = self.cache.carregar(self.caminho_arquivo)
+            if self._registros_diario:
+                # Reaplica o que foi salvo depois da última compactação
+                df = aplicar_diario(df, self.diario.ler())
+            return df
+
+    def precisa_tabela_completa(self, alteracoes):
+        # Só o diário grava a partir das linhas alteradas; regravar ou anexar
+        # ao CSV também registra a tabela inteira no cache
+        return alteracoes is None or self.diario is None
+
+    def _gravar(self, df, alteracoes):
+        if self.diario is not None and alteracoes is not None:
+            registros, gravados = self.diario.anexar(df, alteracoes)
+            self._registros_diario += registros
+            if self._registros_diario >= self.limite_diario:
+                # df pode ter só as linhas alteradas: a tabela completa é a
+                # do arquivo com o diário aplicado
+                self._gravar_completo(self.carregar())
+            return {"linhas": registros, "bytes": gravados}
+
+        gravados = None
+        if (
+            alteracoes is not None
+            and alteracoes.somente_insercoes
+            and self.cache.esta_atualizado(self.caminho_arquivo)
+        ):
+            novos = df[df["ID"].isin(list(alteracoes.inseridos))]
+            gravados = anexar_csv_usuarios(novos, self.caminho_arquivo)
+            linhas = len(novos)
+        if gravados is None:
+            return self._gravar_completo(df)
+
+        # O arquivo acabou de ser gravado a partir do DataFrame em memória,
+        # então a próxima recarga pode vir direto do cache.
+        self.cache.registrar(self.caminho_arquivo, df)
+        return {"linhas": linhas, "bytes": gravados}
+
+    def _gravar_completo(self, df):
+        gravados = escrever_csv_usuarios(df, self.caminho_arquivo)
+        self.cache.registrar(self.caminho_arquivo, df)
+        # Só depois do CSV novo estar no disco o diário pode ser esvaziado (se
+        # cair antes disso, reaplicar o diário sobre o CSV novo não muda nada)
+        if self._registros_diario:
+            self.diario.limpar()
+            self._registros_diario = 0
+        return {"linhas": len(df), "bytes": gravados}
+
+    def compactar(self):
+        """Regrava o CSV com o diário aplicado e esvazia o diário."""
+        with self._trava:
+            if not self._registros_diario:
+                return None
+            return self._gravar_completo(self.carregar())
+
+    def importar_csv(self, caminho_csv):
+        df = ler_usuarios_csv(caminho_csv, self.cache.modo)
+        return self.salvar(df)["linhas"]
+
+    def exportar_csv(self, caminho_csv):
+        df = self.carregar()
+        escrever_csv_usuarios(df, caminho_csv)
+        return len(df)
+
+
+# === GRAVAÇÃO EM SEGUNDO PLANO
+class GravadorEmSegundoPlano:
+    """
+    Thread que executa os salvar() de um backend fora da thread da interface.
+
+    enviar() guarda uma cópia das alterações e das linhas a gravar numa
+    fila limitada (se ela encher, enviar() espera). Se o backend grava só
+    as linhas alteradas (diário, SQLite), só elas são copiadas; a tabela
+    inteira só é copiada quando o backend vai regravá-la. Quando a thread
+    pega um pedido, junta a ele os que estiverem na fila e os grava dentro
+    de um armazenamento.lote(): uma gravação (um fsync) para todos.
+
+    O resultado de cada gravação vai para uma segunda fila, lida com
+    coletar_concluidos() (no App, por um self.after() periódico, já que os
+    widgets do Tk só podem ser mexidos na thread principal). O "aviso" de
+    cada enviar() volta na lista "avisos" do resultado que o gravou.
+
+    Com compactar_ocioso (segundos), depois de uma gravação a thread chama
+    armazenamento.compactar() assim que a fila fica esse tempo sem pedidos
+    (ex.: o diário é consolidado no CSV lido pelo programa em C). Só uma
+    compactação que falhou gera um resultado (com "compactacao" True).
+    """
+
+    def __init__(self, armazenamento, capacidade=8, compactar_ocioso=None):
+        self.armazenamento = armazenamento
+        self.compactar_ocioso = compactar_ocioso
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._concluidos = queue.Queue()
+        self._trava = threading.Lock()
+        self._pendentes = 0
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    @property
+    def pendentes(self):
+        """Pedidos enviados que ainda não foram gravados."""
+        with self._trava:
+            return self._pendentes
+
+    def enviar(self, df, alteracoes=None, aviso=None):
+        """Agenda a gravação de df (copiado aqui; o chamador pode continuar editando)."""
+        parcial = not self.armazenamento.precisa_tabela_completa(alteracoes)
+        if parcial:
+            ids = alteracoes.inseridos | alteracoes.atualizados
+            df = df[df["ID"].isin(list(ids))]  # a seleção já é uma cópia
+        else:
+            df = df.copy()
+        pedido = {
+            "df": df,
+            "alteracoes": None if alteracoes is None else alteracoes.copia(),
+            "aviso": aviso,
+            "enviado_em": time.perf_counter(),
+        }
+        with self._trava:
+            self._pendentes += 1
+        self._fila.put(pedido)
+
+    def _juntar_pendentes(self, pedido):
+        """Junta ao pedido todos os que já estão na fila."""
+        pedidos = [pedido]
+        while True:
+            try:
+                pedidos.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+            if pedidos[-1] is None:  # parar() foi chamado: não junta mais nada
+                break
+
+        alteracoes = RegistroAlteracoes()
+        for p in pedidos:
+            if p is None:
+                continue
+            if p["alteracoes"] is None:
+                alteracoes = None
+            elif alteracoes is not None:
+                alteracoes.mesclar(p["alteracoes"])
+        return pedidos, alteracoes
+
+    def _compactar(self):
+        try:
+            self.armazenamento.compactar()
+        except Exception as e:
+            self._concluidos.put(
+                {
+                    "pedidos": 0,
+                    "linhas": 0,
+                    "bytes": 0,
+                    "erro": e,
+                    "alteracoes": None,
+                    "avisos": [],
+                    "compactacao": True,
+                }
+            )
+
+    def _executar(self):
+        # Houve gravação desde a última compactação (só com compactar_ocioso)
+        compactar = False
+        while True:
+            try:
+                pedido = self._fila.get(
+                    timeout=self.compactar_ocioso if compactar else None
+                )
+            except queue.Empty:
+                compactar = False
+                self._compactar()
+                continue
+            if pedido is None:
+                self._fila.task_done()
+                return
+            pedidos, alteracoes = self._juntar_pendentes(pedido)
+            parar = pedidos[-1] is None
+            if parar:
+                pedidos.pop()
+            resultado = {
+                "pedidos": len(pedidos),
+                "linhas": 0,
+                "bytes": 0,
+                "erro": None,
+                "alteracoes": alteracoes,
+                "avisos": [p["aviso"] for p in pedidos if p["aviso"] is not None],
+                "compactacao": False,
+            }
+            inicio = time.perf_counter()
+            try:
+                # O lote junta as tabelas inteiras e as linhas dos pedidos
+                # (na ordem em que foram enviados) numa única gravação
+                with self.armazenamento.lote():
+                    for p in pedidos:
+                        self.armazenamento.salvar(p["df"], p["alteracoes"])
+                resultado.update(self.armazenamento.ultimo_lote)
+            except Exception as e:
+                resultado["erro"] = e
+            fim = time.perf_counter()
+            resultado["duracao"] = fim - inicio
+            # Latência vista pelo usuário: do primeiro enviar() até o disco
+            resultado["latencia"] = fim - pedidos[0]["enviado_em"]
+
+            with self._trava:
+                self._pendentes -= len(pedidos)
+            self._concluidos.put(resultado)
+            for _ in range(len(pedidos) + parar):
+                self._fila.task_done()
+            if parar:
+                return
+            compactar = self.compactar_ocioso is not None
+
+    def coletar_concluidos(self):
+        """Resultados das gravações terminadas desde a última chamada (não bloqueia)."""
+        resultados = []
+        while True:
+            try:
+                resultados.append(self._concluidos.get_nowait())
+            except queue.Empty:
+                return resultados
+
+    def aguardar(self):
+        """Bloqueia até todos os pedidos enviados terem sido gravados."""
+        self._fila.join()
+
+    def parar(self):
+        """Grava o que estiver pendente e encerra a thread."""
+        if self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join()
+
+
+BACKENDS = ("csv", "sqlite")
+
+
+def criar_armazenamento(backend, caminho_arquivo, cache=None, usar_diario=False):
+    """Cria o backend pelo nome ("csv" ou "sqlite") a partir do caminho do CSV."""
+    if backend == "csv":
+        return ArmazenamentoCSV(caminho_arquivo, cache, usar_diario=usar_diario)
+    if backend == "sqlite":
+        from armazenamento_sqlite import ArmazenamentoSQLite
+
+        caminho_db = os.path.splitext(caminho_arquivo)[0] + ".db"
+        return ArmazenamentoSQLite(caminho_db, caminho_csv=caminho_arquivo)
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
@@ -0,0 +1,162 @@
+"""
+Backend SQLite para a tabela de usuários.
+
+Tem a mesma interface do ArmazenamentoCSV (carregar/salvar/importar_csv/
+exportar_csv), mas cada alteração vira um INSERT/UPDATE/DELETE pelo ID,
+em vez de regravar o arquivo inteiro. O CSV continua sendo o formato de
+troca com o programa em C (sistemaAcademico_unificado.h).
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import (
+    COLUNAS_CSV,
+    ArmazenamentoBase,
+    escrever_csv_usuarios,
+    expandir_tipos,
+    ler_usuarios_csv,
+    normalizar_tabela,
+    preparar_para_csv,
+)
+
+# As colunas da tabela têm os mesmos nomes do cabeçalho do CSV
+_SQL_CRIAR = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY,
+    nome TEXT,
+    email TEXT,
+    senha TEXT,
+    nivel TEXT,
+    curso TEXT,
+    turma TEXT,
+    idade INTEGER,
+    np1 REAL,
+    np2 REAL,
+    pim REAL,
+    media REAL,
+    atividade TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios (email);
+CREATE INDEX IF NOT EXISTS idx_usuarios_nome ON usuarios (nome);
+CREATE INDEX IF NOT EXISTS idx_usuarios_turma ON usuarios (turma);
+"""
+
+_COLUNAS_SQL = ", ".join(COLUNAS_CSV)
+_SQL_SELECIONAR = f"SELECT {_COLUNAS_SQL} FROM usuarios ORDER BY id"
+# Insere ou atualiza a linha do ID (um único comando parametrizado, que o
+# módulo sqlite3 prepara uma vez e reaproveita a cada execução)
+_SQL_GRAVAR_LINHA = (
+    f"INSERT INTO usuarios ({_COLUNAS_SQL}) "
+    f"VALUES ({', '.join('?' for _ in COLUNAS_CSV)}) "
+    "ON CONFLICT(id) DO UPDATE SET "
+    + ", ".join(f"{col} = excluded.{col}" for col in COLUNAS_CSV[1:])
+)
+_SQL_EXCLUIR_LINHA = "DELETE FROM usuarios WHERE id = ?"
+
+
+def _registros(df):
+    """Converte o DataFrame (colunas internas) em tuplas com tipos nativos do Python."""
+    df_csv = preparar_para_csv(expandir_tipos(df)).astype(object)
+    df_csv = df_csv.where(pd.notna(df_csv), None)
+    return list(df_csv.itertuples(index=False, name=None))
+
+
+def _tamanho_registros(registros):
+    """Bytes de dados enviados ao banco (texto em UTF-8, números com 8 bytes)."""
+    total = 0
+    for registro in registros:
+        for valor in registro:
+            if isinstance(valor, str):
+                total += len(valor.encode("utf-8"))
+            elif valor is not None:
+                total += 8
+    return total
+
+
+class ArmazenamentoSQLite(ArmazenamentoBase):
+    """Tabela de usuários num banco SQLite com índices em ID, EMAIL, NOME e turma."""
+
+    suporta_alteracao_por_linha = True
+
+    def __init__(self, caminho_db, caminho_csv=None):
+        super().__init__()
+        self.caminho_db = caminho_db
+        self.caminho_csv = caminho_csv
+        Path(caminho_db).parent.mkdir(parents=True, exist_ok=True)
+        # A conexão pode ser usada pela thread do GravadorEmSegundoPlano; o
+        # acesso é serializado pela self._trava do ArmazenamentoBase
+        self._conexao = sqlite3.connect(caminho_db, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.executescript(_SQL_CRIAR)
+
+        # Primeira execução: o banco nasce a partir do CSV existente
+        if (
+            caminho_csv
+            and os.path.exists(caminho_csv)
+            and self._conexao.execute("SELECT COUNT(*) FROM usuarios").fetchone()[0]
+            == 0
+        ):
+            self.importar_csv(caminho_csv)
+
+    def carregar(self):
+        with self._trava:
+            df = pd.read_sql_query(_SQL_SELECIONAR, self._conexao)
+        # NULL do banco vira NaN, como um campo vazio lido do CSV
+        df = df.fillna(np.nan)
+        if df.empty:
+            return pd.DataFrame(columns=COLUNAS_CSV)
+        return normalizar_tabela(df)
+
+    def _gravar(self, df, alteracoes):
+        """
+        Sem "alteracoes", substitui a tabela inteira numa transação.
+        Com um RegistroAlteracoes, grava só as linhas desses IDs.
+        """
+        with self._conexao:
+            if alteracoes is None:
+                registros = _registros(df)
+                self._conexao.execute("DELETE FROM usuarios")
+                self._conexao.executemany(_SQL_GRAVAR_LINHA, registros)
+                return {
+                    "linhas": len(registros),
+                    "bytes": _tamanho_registros(registros),
+                }
+
+            linhas = 0
+            gravados = 0
+            ids_gravar = alteracoes.inseridos | alteracoes.atualizados
+            if ids_gravar:
+                registros = _registros(df[df["ID"].isin(list(ids_gravar))])
+                self._conexao.executemany(_SQL_GRAVAR_LINHA, registros)
+                linhas += len(registros)
+                gravados += _tamanho_registros(registros)
+            if alteracoes.excluidos:
+                cursor = self._conexao.executemany(
+                    _SQL_EXCLUIR_LINHA,
+                    [(user_id,) for user_id in alteracoes.excluidos],
+                )
+                linhas += cursor.rowcount
+                gravados += 8 * len(alteracoes.excluidos)
+            return {"linhas": linhas, "bytes": gravados}
+
+    def importar_csv(self, caminho_csv=None):
+        """Substitui o conteúdo do banco pela seção [USUARIOS] do CSV."""
+        df = ler_usuarios_csv(caminho_csv or self.caminho_csv)
+        if df.empty:
+            return 0
+        return self.salvar(df)["linhas"]
+
+    def exportar_csv(self, caminho_csv=None):
+        """Grava o banco no formato CSV (para o programa em C)."""
+        df = self.carregar()
+        escrever_csv_usuarios(df, caminho_csv or self.caminho_csv)
+        return len(df)
+
+    def fechar(self):
+        with self._trava:
+            self._conexao.close()
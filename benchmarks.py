@@ -0,0 +1,707 @@
+"""
+Medições de desempenho da camada de armazenamento (armazenamento.py).
+
+Uso:
+    python benchmarks.py serializacao [--linhas 10000 100000 ...]
+    python benchmarks.py rajada [--linhas 1000 10000 ...]
+    python benchmarks.py diario [--linhas 10000 100000 ...]
+    python benchmarks.py consultas [--linhas 100000 1000000 ...]
+    python benchmarks.py memoria [--linhas 100000 1000000 ...]
+    python benchmarks.py leitura [--linhas 10000 100000 1000000]
+    python benchmarks.py blocos [--linhas 100000 1000000 ...]
+    python benchmarks.py paralelo [--linhas 1000000 2000000 ...]
+    python benchmarks.py turmas [--linhas 100000 1000000 ...]
+    python benchmarks.py notas [--linhas 100000 1000000 ...]
+    python benchmarks.py importacao [--linhas 10000 100000 ...]
+    python benchmarks.py usuarios [--linhas 10000 100000 ...]
+
+Os dados são gerados em memória/num diretório temporário; nada é gravado
+em Output/.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from agregados import AgregadosTurmas, ResumoTurmas, resumir_turmas_csv
+from armazenamento import (
+    SECAO_ALVO,
+    TEM_PYARROW,
+    ArmazenamentoCSV,
+    RegistroAlteracoes,
+    SequenciaIDs,
+    compactar_tipos,
+    escrever_csv_usuarios,
+    hash_tabela,
+    ler_usuarios_csv,
+    ler_usuarios_paralelo,
+    memoria_por_coluna,
+    normalizar_tabela,
+    preparar_para_csv,
+)
+from armazenamento_sqlite import ArmazenamentoSQLite
+from consultas import MotorConsultas, analisar_consulta, avaliar_consulta
+from importacao import exportar_usuarios, importar_notas, importar_usuarios
+from indices import IndiceUsuarios, anexar_linhas
+from notas import COLUNAS_PROVAS, MotorNotas, PoliticaNotas, motor_notas
+
+LINHAS_PADRAO = [1_000, 10_000, 100_000]
+CURSOS = ["PYTHON", "JAVA", "REDES DE COMPUTADORES", "BANCO DE DADOS", "C / C++"]
+
+
+def gerar_tabela_sintetica(linhas, semente=42):
+    """DataFrame com as colunas internas do App e valores parecidos com os reais."""
+    rng = np.random.default_rng(semente)
+    ids = np.arange(1, linhas + 1)
+    notas = np.round(rng.uniform(0, 10, size=(linhas, 3)), 2)
+    cursos = rng.choice(CURSOS, size=linhas)
+    df = pd.DataFrame(
+        {
+            "ID": ids,
+            "NOME": [f"ALUNO {i}" for i in ids],
+            "EMAIL": [f"aluno{i}@unip.br" for i in ids],
+            "SENHA": [f"senha{i}" for i in ids],
+            "NIVEL": rng.choice(
+                ["ALUNO", "ALUNO", "ALUNO", "PROFESSOR", "COORDENADOR"], size=linhas
+            ),
+            "CURSO": cursos,
+            "ID_TURMAS": [
+                f"{c[:3]}{t}" for c, t in zip(cursos, rng.integers(1, 9, linhas))
+            ],
+            "IDADE": rng.integers(17, 60, size=linhas),
+            "NP1": notas[:, 0],
+            "NP2": notas[:, 1],
+            "PIM": notas[:, 2],
+            "STATUS DO ALUNO": rng.choice(["ATIVO", "INATIVO"], size=linhas),
+        }
+    )
+    df["MEDIA"] = MotorNotas().calcular(df)
+    return df[
+        [
+            "ID",
+            "NOME",
+            "EMAIL",
+            "SENHA",
+            "NIVEL",
+            "CURSO",
+            "ID_TURMAS",
+            "IDADE",
+            "NP1",
+            "NP2",
+            "PIM",
+            "MEDIA",
+            "STATUS DO ALUNO",
+        ]
+    ]
+
+
+def _cronometrar(funcao, repeticoes=3):
+    """Melhor tempo (s) entre algumas execuções."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+# === SERIALIZAÇÃO DO CSV
+def _escrever_csv_legado(df, caminho_arquivo):
+    """Gravação antiga do salvar_dados (lambda por célula), usada como referência."""
+    df_to_save = preparar_para_csv(df)
+    for col in ["np1", "np2", "pim", "media"]:
+        if col in df_to_save.columns:
+            df_to_save[col] = df_to_save[col].apply(
+                lambda x: (
+                    f"{x:.2f}".replace(".", ",")
+                    if pd.notna(x) and pd.notnull(x)
+                    else ""
+                )
+            )
+    with open(caminho_arquivo, "w", encoding="utf-8", newline="") as f:
+        f.write(f"{SECAO_ALVO}\n")
+        df_to_save.to_csv(f, sep=";", index=False, header=True, lineterminator="\r\n")
+
+
+def benchmark_serializacao(lista_linhas):
+    print(
+        f"{'linhas':>10} | {'legado (s)':>11} | {'novo (s)':>9} | {'ganho':>6} | idêntico"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        legado = os.path.join(pasta, "legado.csv")
+        novo = os.path.join(pasta, "novo.csv")
+        for linhas in lista_linhas:
+            df = gerar_tabela_sintetica(linhas)
+            # Alguns vazios para conferir o tratamento de NaN
+            df.loc[df.index[::97], "PIM"] = np.nan
+            t_legado = _cronometrar(lambda: _escrever_csv_legado(df, legado))
+            t_novo = _cronometrar(lambda: escrever_csv_usuarios(df, novo))
+            with open(legado, "rb") as a, open(novo, "rb") as b:
+                identico = a.read() == b.read()
+            print(
+                f"{linhas:>10} | {t_legado:>11.3f} | {t_novo:>9.3f} | "
+                f"{t_legado / t_novo:>5.1f}x | {'sim' if identico else 'NÃO'}"
+            )
+
+
+# === LEITURA DO CSV
+def benchmark_leitura(lista_linhas):
+    modos = ["mmap", "tipado"] + (["pyarrow"] if TEM_PYARROW else [])
+    print("mmap = leitura atual (read_csv + normalizar_tabela coluna a coluna)")
+    if not TEM_PYARROW:
+        print('pyarrow não instalado: modo "pyarrow" fora da medição')
+    print(
+        f"{'linhas':>10} | "
+        + " | ".join(f"{modo + ' (s)':>12}" for modo in modos)
+        + " | ganho | idêntico"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in lista_linhas:
+            caminho = os.path.join(pasta, f"leitura_{linhas}.csv")
+            df = gerar_tabela_sintetica(linhas)
+            df.loc[df.index[::97], "PIM"] = np.nan
+            escrever_csv_usuarios(df, caminho)
+            tempos = {}
+            resultados = {}
+            for modo in modos:
+                tempos[modo] = _cronometrar(
+                    lambda: resultados.__setitem__(
+                        modo, ler_usuarios_csv(caminho, modo)
+                    )
+                )
+            identico = all(
+                resultados[modo].equals(resultados["mmap"]) for modo in modos
+            )
+            melhor = min(tempos[modo] for modo in modos[1:])
+            print(
+                f"{linhas:>10} | "
+                + " | ".join(f"{tempos[modo]:>12.3f}" for modo in modos)
+                + f" | {tempos['mmap'] / melhor:>4.1f}x | "
+                + ("sim" if identico else "NÃO")
+            )
+
+
+# === LEITURA EM BLOCOS
+def _pico_memoria(funcao):
+    """(resultado, pico de memória alocada em MB) de uma execução."""
+    tracemalloc.start()
+    try:
+        resultado = funcao()
+        return resultado, tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_blocos(lista_linhas, linhas_por_bloco=50_000):
+    print(f"Resumo por turma; blocos de {linhas_por_bloco} linhas")
+    print(
+        f"{'linhas':>10} | {'CSV (MB)':>8} | {'tabela (s)':>10} | "
+        f"{'pico (MB)':>9} | {'blocos (s)':>10} | {'pico (MB)':>9} | igual"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in lista_linhas:
+            caminho = os.path.join(pasta, f"blocos_{linhas}.csv")
+            escrever_csv_usuarios(gerar_tabela_sintetica(linhas), caminho)
+            tamanho = os.path.getsize(caminho) / 2**20
+
+            def tabela_inteira():
+                df = ler_usuarios_csv(caminho, "tipado")
+                return ResumoTurmas().adicionar(df).tabela()
+
+            def em_blocos():
+                return resumir_turmas_csv(caminho, linhas_por_bloco)
+
+            # Tempo e pico medidos separados: o tracemalloc deixa tudo mais lento
+            t_inteira = _cronometrar(tabela_inteira, repeticoes=1)
+            t_blocos = _cronometrar(em_blocos, repeticoes=1)
+            resumo_inteira, pico_inteira = _pico_memoria(tabela_inteira)
+            resumo_blocos, pico_blocos = _pico_memoria(em_blocos)
+            print(
+                f"{linhas:>10} | {tamanho:>8.1f} | {t_inteira:>10.3f} | "
+                f"{pico_inteira:>9.1f} | {t_blocos:>10.3f} | {pico_blocos:>9.1f} | "
+                + ("sim" if resumo_inteira.equals(resumo_blocos) else "NÃO")
+            )
+
+
+# === LEITURA PARALELA
+def benchmark_paralelo(lista_linhas):
+    nucleos = os.cpu_count() or 1
+    lista_processos = sorted({2, 4, nucleos} - {1})
+    print(f'{nucleos} núcleo(s); série = modo "tipado"')
+    print(
+        f"{'linhas':>10} | {'série (s)':>9} | {'processos':>9} | "
+        f"{'paralelo (s)':>12} | {'ganho':>5} | hash igual"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in lista_linhas:
+            caminho = os.path.join(pasta, f"paralelo_{linhas}.csv")
+            escrever_csv_usuarios(gerar_tabela_sintetica(linhas), caminho)
+            t_serie = _cronometrar(lambda: ler_usuarios_csv(caminho, "tipado"), 1)
+            referencia = hash_tabela(ler_usuarios_csv(caminho, "tipado"))
+            for processos in lista_processos:
+                resultado = {}
+                t_paralelo = _cronometrar(
+                    lambda: resultado.__setitem__(
+                        "df", ler_usuarios_paralelo(caminho, processos)
+                    ),
+                    1,
+                )
+                igual = hash_tabela(resultado["df"]) == referencia
+                print(
+                    f"{linhas:>10} | {t_serie:>9.3f} | {processos:>9} | "
+                    f"{t_paralelo:>12.3f} | {t_serie / t_paralelo:>4.1f}x | "
+                    + ("sim" if igual else "NÃO")
+                )
+
+
+# === AGREGADOS POR TURMA
+def _resumo_turmas_groupby(df, curso=None):
+    """Como a aba de turmas fazia: copia os alunos e agrupa a cada filtro."""
+    df_alunos = df[df["NIVEL"] == "ALUNO"].copy()
+    df_resumo = (
+        df_alunos.groupby("ID_TURMAS", observed=True)
+        .agg({"ID": "count", "MEDIA": "mean", "CURSO": "first"})
+        .reset_index()
+    )
+    if curso is not None:
+        df_resumo = df_resumo[df_resumo["CURSO"] == curso]
+    return df_resumo
+
+
+def _analise_turmas_groupby(df):
+    """Mediana, P10/P90 e aprovação por turma recalculadas do zero."""
+    notas = df.loc[df["NIVEL"] == "ALUNO", ["ID_TURMAS", "MEDIA"]]
+    grupos = notas.groupby("ID_TURMAS", observed=True)["MEDIA"]
+    return pd.DataFrame(
+        {
+            "MEDIANA": grupos.median(),
+            "P10": grupos.quantile(0.1),
+            "P90": grupos.quantile(0.9),
+            "APROVAÇÃO (%)": (notas["MEDIA"] >= 7)
+            .groupby(notas["ID_TURMAS"], observed=True)
+            .mean()
+            * 100,
+        }
+    )
+
+
+def benchmark_turmas(lista_linhas, edicoes=1000):
+    print(
+        f"{'linhas':>10} | {'groupby (ms)':>12} | {'c/ quantis (ms)':>15} | "
+        f"{'montar (ms)':>11} | {'edição (µs)':>11} | {'filtro (ms)':>11} | igual"
+    )
+    for linhas in lista_linhas:
+        df = gerar_tabela_sintetica(linhas)
+        rng = np.random.default_rng(0)
+        t_groupby = _cronometrar(lambda: _resumo_turmas_groupby(df, "PYTHON"))
+        t_quantis = _cronometrar(lambda: _analise_turmas_groupby(df))
+        t_montar = _cronometrar(lambda: AgregadosTurmas().reconstruir(df))
+        agregados = AgregadosTurmas().reconstruir(df)
+
+        rotulos = rng.choice(df.index.to_numpy(), edicoes)
+        notas = rng.uniform(0, 10, edicoes).round(2)
+        coluna_media = df.columns.get_loc("MEDIA")
+        inicio = time.perf_counter()
+        for rotulo, nota in zip(rotulos, notas):
+            df.iat[rotulo, coluna_media] = nota
+            agregados.atualizar(df, rotulo)
+        t_edicao = (time.perf_counter() - inicio) / edicoes
+
+        def filtro_depois_de_editar():
+            nota = df.iat[rotulos[0], coluna_media]
+            df.iat[rotulos[0], coluna_media] = round((nota + 1) % 10, 2)
+            agregados.atualizar(df, rotulos[0])
+            return agregados.tabela("PYTHON")
+
+        t_filtro = _cronometrar(filtro_depois_de_editar)
+        referencia = ResumoTurmas().adicionar(df).tabela()
+        atual = agregados.tabela()
+        analise = _analise_turmas_groupby(df).loc[atual["TURMA"]]
+        igual = (
+            np.array_equal(referencia["TOTAL ALUNOS"], atual["TOTAL ALUNOS"])
+            and np.allclose(referencia["MÉDIA GERAL"], atual["MÉDIA GERAL"])
+            and all(
+                np.allclose(analise[col], atual[col], atol=0.051)
+                for col in analise.columns
+            )
+        )
+        print(
+            f"{linhas:>10} | {t_groupby * 1000:>12.1f} | {t_quantis * 1000:>15.1f} | "
+            f"{t_montar * 1000:>11.1f} | "
+            f"{t_edicao * 1e6:>11.1f} | {t_filtro * 1000:>11.2f} | "
+            + ("sim" if igual else "NÃO")
+        )
+
+
+# === MOTOR DE NOTAS
+def _media_linha_a_linha(df):
+    """Como as telas de edição faziam: a fórmula aplicada a uma linha por vez."""
+    return df.apply(
+        lambda row: round((row["NP1"] * 4 + row["NP2"] * 4 + row["PIM"] * 2) / 10, 2),
+        axis=1,
+    )
+
+
+def benchmark_notas(lista_linhas):
+    print("Troca de política: PYTHON passa a NP1*3 + NP2*3 + PIM*4, uma casa")
+    print(
+        f"{'linhas':>10} | {'linha a linha (s)':>17} | {'recalcular (ms)':>15} | "
+        f"{'compacta (ms)':>13} | {'alteradas':>9} | {'1 linha (µs)':>12}"
+    )
+    for linhas in lista_linhas:
+        df = gerar_tabela_sintetica(linhas)
+        amostra = df.head(min(linhas, 20_000))
+        t_linha = _cronometrar(lambda: _media_linha_a_linha(amostra), 1) * (
+            linhas / len(amostra)
+        )
+
+        def trocar_politica(tabela):
+            motor = MotorNotas()
+            motor.definir_politica(
+                "PYTHON", PoliticaNotas(pesos={"NP1": 3, "NP2": 3, "PIM": 4}, casas=1)
+            )
+            registro = RegistroAlteracoes()
+            inicio = time.perf_counter()
+            alteradas = motor.recalcular_todos(tabela, registro)
+            return time.perf_counter() - inicio, alteradas, registro
+
+        # Cada medição numa cópia nova (a cópia fica fora do tempo)
+        t_motor = min(trocar_politica(df.copy())[0] for _ in range(3))
+        t_compacta = min(trocar_politica(compactar_tipos(df))[0] for _ in range(3))
+        _, alteradas, registro = trocar_politica(df.copy())
+        assert len(registro.atualizados) == len(alteradas)
+
+        motor = MotorNotas()
+        rotulo = [df.index[len(df) // 2]]
+        t_linha_unica = _cronometrar(lambda: motor.recalcular(df, rotulo))
+        print(
+            f"{linhas:>10} | {t_linha:>17.2f} | {t_motor * 1000:>15.1f} | "
+            f"{t_compacta * 1000:>13.1f} | {len(alteradas):>9} | "
+            f"{t_linha_unica * 1e6:>12.1f}"
+        )
+    print("(linha a linha estimado a partir de 20 mil linhas)")
+
+
+# === IMPORTAÇÃO DE NOTAS
+ALUNOS_IMPORTACAO = 3_000
+
+
+def _lancar_notas_uma_a_uma(armazenamento, df, indice, planilha):
+    """Como a tela de notas: edita um aluno, recalcula a MEDIA e salva."""
+    for registro in planilha.itertuples(index=False):
+        rotulo = indice.rotulo(df, registro.ID)
+        for col in COLUNAS_PROVAS:
+            df.at[rotulo, col] = getattr(registro, col)
+        motor_notas.recalcular(df, [rotulo])
+        alteracoes = RegistroAlteracoes()
+        alteracoes.marcar_atualizado(registro.ID)
+        armazenamento.salvar(df, alteracoes)
+
+
+def benchmark_importacao(lista_linhas, alunos=ALUNOS_IMPORTACAO):
+    print(f"Lançamento das notas de {alunos} alunos (backend CSV)")
+    print(
+        f"{'linhas':>10} | {'uma a uma (s)':>13} | {'gravações':>9} | "
+        f"{'importar (ms)':>13} | {'salvar (ms)':>11} | {'gravações':>9} | ganho"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in lista_linhas:
+            base = gerar_tabela_sintetica(linhas)
+            rng = np.random.default_rng(7)
+            ids = base.loc[base["NIVEL"] == "ALUNO", "ID"].to_numpy()
+            ids = rng.choice(ids, size=min(alunos, len(ids)), replace=False)
+            planilha = pd.DataFrame({"ID": ids})
+            for col in COLUNAS_PROVAS:
+                planilha[col] = rng.integers(0, 1001, size=len(ids)) / 100
+            caminho_planilha = os.path.join(pasta, f"notas_{linhas}.csv")
+            planilha.to_csv(caminho_planilha, sep=";", index=False)
+
+            armazenamento = ArmazenamentoCSV(os.path.join(pasta, f"imp_{linhas}.csv"))
+            armazenamento.salvar(base)
+
+            # Uma gravação por aluno: mede uma amostra e projeta para todos
+            amostra = planilha.head(min(len(planilha), 100))
+            df = base.copy()
+            indice = IndiceUsuarios(df)
+            inicio = time.perf_counter()
+            _lancar_notas_uma_a_uma(armazenamento, df, indice, amostra)
+            t_individual = (time.perf_counter() - inicio) * len(planilha) / len(amostra)
+
+            df = base.copy()
+            indice = IndiceUsuarios(df)
+            alteracoes = RegistroAlteracoes()
+            inicio = time.perf_counter()
+            resultado = importar_notas(df, caminho_planilha, indice, alteracoes)
+            t_importar = time.perf_counter() - inicio
+            assert resultado["relatorio"].empty
+            inicio = time.perf_counter()
+            armazenamento.salvar(df, alteracoes)
+            t_salvar = time.perf_counter() - inicio
+            t_lote = t_importar + t_salvar
+            print(
+                f"{linhas:>10} | {t_individual:>13.2f} | {len(planilha):>9} | "
+                f"{t_importar * 1000:>13.1f} | {t_salvar * 1000:>11.1f} | "
+                f"{1:>9} | {t_individual / t_lote:,.0f}x"
+            )
+    print("(uma a uma estimado a partir de 100 alunos)")
+
+
+# === USUÁRIOS EM LOTE
+LINHAS_BASE_USUARIOS = 10_000
+
+
+def _cadastrar_um_a_um(armazenamento, df, novos, proximo_id):
+    """Como a tela "Adicionar Usuário": anexa uma linha e salva, por usuário."""
+    for posicao in range(len(novos)):
+        linha = novos.iloc[[posicao]].assign(ID=proximo_id + posicao)
+        motor_notas.recalcular(linha)
+        df = anexar_linhas(df, linha)
+        alteracoes = RegistroAlteracoes()
+        alteracoes.marcar_inserido(proximo_id + posicao)
+        armazenamento.salvar(df, alteracoes)
+    return df
+
+
+def benchmark_usuarios(lista_linhas, linhas_base=LINHAS_BASE_USUARIOS):
+    print(f"Cadastro em lote numa tabela de {linhas_base} usuários (backend CSV)")
+    print(
+        f"{'linhas':>10} | {'um a um (s)':>11} | {'exportar (s)':>12} | "
+        f"{'importar (s)':>12} | {'salvar (s)':>10} | {'linhas/s':>9} | ganho"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in lista_linhas:
+            base = gerar_tabela_sintetica(linhas_base)
+            novos = gerar_tabela_sintetica(linhas, semente=7)
+            novos["EMAIL"] = "lote." + novos["EMAIL"]
+            caminho_base = os.path.join(pasta, f"base_{linhas}.csv")
+            armazenamento = ArmazenamentoCSV(caminho_base)
+
+            # Um salvamento por usuário: mede uma amostra e projeta para todos
+            armazenamento.salvar(base)
+            amostra = novos.head(min(linhas, 50))
+            inicio = time.perf_counter()
+            _cadastrar_um_a_um(armazenamento, base, amostra, linhas_base + 1)
+            t_individual = (time.perf_counter() - inicio) * linhas / len(amostra)
+
+            caminho_lote = os.path.join(pasta, f"novos_{linhas}.csv")
+            inicio = time.perf_counter()
+            exportar_usuarios(novos, caminho_lote)
+            t_exportar = time.perf_counter() - inicio
+
+            armazenamento.salvar(base)
+            alteracoes = RegistroAlteracoes()
+            sequencia = SequenciaIDs(os.path.join(pasta, f"seq_{linhas}.csv"))
+            inicio = time.perf_counter()
+            df, resultado = importar_usuarios(
+                base, caminho_lote, IndiceUsuarios(base), sequencia, alteracoes
+            )
+            t_importar = time.perf_counter() - inicio
+            assert resultado["relatorio"].empty and len(resultado["ids"]) == linhas
+            inicio = time.perf_counter()
+            armazenamento.salvar(df, alteracoes)
+            t_salvar = time.perf_counter() - inicio
+            t_lote = t_importar + t_salvar
+            print(
+                f"{linhas:>10} | {t_individual:>11.1f} | {t_exportar:>12.2f} | "
+                f"{t_importar:>12.2f} | {t_salvar:>10.2f} | "
+                f"{linhas / t_lote:>9,.0f} | {t_individual / t_lote:,.0f}x"
+            )
+    print("(um a um estimado a partir de 50 usuários)")
+
+
+# === RAJADA DE EDIÇÕES
+EDICOES_RAJADA = 200
+
+
+def _rajada_de_notas(armazenamento, df, edicoes, rng):
+    """Lança uma nota por vez e salva após cada edição, como faz a tela de notas."""
+    for posicao in rng.integers(0, len(df), size=edicoes):
+        df.iloc[posicao, df.columns.get_loc("NP1")] = round(rng.uniform(0, 10), 2)
+        alteracoes = RegistroAlteracoes()
+        alteracoes.marcar_atualizado(df.iloc[posicao]["ID"])
+        armazenamento.salvar(df, alteracoes)
+
+
+def benchmark_rajada(lista_linhas, edicoes=EDICOES_RAJADA):
+    print(f"{edicoes} edições de nota, cada uma seguida de salvar()")
+    print(
+        f"{'linhas':>10} | {'backend':>7} | {'uma a uma (s)':>13} | "
+        f"{'em lote (s)':>11} | {'ganho':>6} | edições/s (lote)"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in lista_linhas:
+            base = gerar_tabela_sintetica(linhas)
+            caminho_csv = os.path.join(pasta, f"rajada_{linhas}.csv")
+            backends = {
+                "csv": ArmazenamentoCSV(caminho_csv),
+                "sqlite": ArmazenamentoSQLite(
+                    os.path.join(pasta, f"rajada_{linhas}.db")
+                ),
+            }
+            for nome, armazenamento in backends.items():
+                armazenamento.salvar(base)
+                df = base.copy()
+                inicio = time.perf_counter()
+                _rajada_de_notas(armazenamento, df, edicoes, np.random.default_rng(1))
+                t_individual = time.perf_counter() - inicio
+
+                df = base.copy()
+                inicio = time.perf_counter()
+                with armazenamento.lote():
+                    _rajada_de_notas(
+                        armazenamento, df, edicoes, np.random.default_rng(1)
+                    )
+                t_lote = time.perf_counter() - inicio
+                print(
+                    f"{linhas:>10} | {nome:>7} | {t_individual:>13.3f} | "
+                    f"{t_lote:>11.3f} | {t_individual / t_lote:>5.1f}x | "
+                    f"{edicoes / t_lote:,.0f}"
+                )
+            backends["sqlite"].fechar()
+
+
+# === DIÁRIO DE ALTERAÇÕES
+def benchmark_diario(lista_linhas, edicoes=50):
+    print(f"Tempo médio por salvamento de uma edição ({edicoes} edições)")
+    print(
+        f"{'linhas':>10} | {'CSV inteiro (ms)':>16} | {'diário (ms)':>11} | "
+        f"{'recarga (ms)':>12} | {'compactar (ms)':>14} | igual"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in lista_linhas:
+            base = gerar_tabela_sintetica(linhas)
+            tempos = {}
+            backends = {}
+            for usar_diario in (False, True):
+                caminho = os.path.join(pasta, f"diario_{linhas}_{usar_diario}.csv")
+                armazenamento = ArmazenamentoCSV(
+                    caminho, usar_diario=usar_diario, limite_diario=edicoes + 1
+                )
+                armazenamento.salvar(base)
+                backends[usar_diario] = armazenamento
+                df = base.copy()
+                inicio = time.perf_counter()
+                _rajada_de_notas(armazenamento, df, edicoes, np.random.default_rng(1))
+                tempos[usar_diario] = (time.perf_counter() - inicio) / edicoes
+
+            inicio = time.perf_counter()
+            recarregado = armazenamento.carregar()
+            t_recarga = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            armazenamento.compactar()
+            t_compactar = time.perf_counter() - inicio
+            # Referência: o mesmo estado gravado regravando o CSV a cada edição
+            referencia = backends[False].carregar()
+            igual = recarregado.equals(referencia) and armazenamento.carregar().equals(
+                referencia
+            )
+            print(
+                f"{linhas:>10} | {tempos[False] * 1000:>16.1f} | "
+                f"{tempos[True] * 1000:>11.2f} | {t_recarga * 1000:>12.1f} | "
+                f"{t_compactar * 1000:>14.1f} | {'sim' if igual else 'NÃO'}"
+            )
+
+
+# === CONSULTAS COMPOSTAS
+CONSULTAS_EXEMPLO = [
+    "CURSO = PYTHON E MEDIA < 5 E STATUS = ATIVO",
+    "NIVEL = ALUNO E IDADE >= 55 E MEDIA < 1",
+    'EMAIL = "aluno777@unip.br"',
+    "NAO (CURSO = JAVA OU CURSO = PYTHON) E IDADE = 17",
+    'TURMA = PYT3 E NOME CONTEM "99"',
+]
+
+
+def benchmark_consultas(lista_linhas):
+    print(
+        f"{'linhas':>10} | {'varredura (ms)':>14} | {'1ª (ms)':>8} | "
+        f"{'índices (ms)':>12} | {'cache (ms)':>10} | igual | consulta"
+    )
+    for linhas in lista_linhas:
+        df = gerar_tabela_sintetica(linhas)
+        motor = MotorConsultas(IndiceUsuarios(df))
+        motor.reconstruir(df)
+        for expressao in CONSULTAS_EXEMPLO:
+            arvore = analisar_consulta(expressao, df)
+            inicio = time.perf_counter()
+            referencia = df.index[avaliar_consulta(df, arvore)].to_numpy()
+            t_varredura = time.perf_counter() - inicio
+            # 1ª execução inclui montar os índices das colunas usadas
+            inicio = time.perf_counter()
+            motor.consultar(df, expressao)
+            t_primeira = time.perf_counter() - inicio
+
+            def sem_cache():
+                motor.limpar_cache()
+                return motor.consultar(df, expressao)
+
+            t_indices = _cronometrar(sem_cache)
+            t_cache = _cronometrar(lambda: motor.consultar(df, expressao))
+            igual = np.array_equal(motor.consultar(df, expressao), referencia)
+            print(
+                f"{linhas:>10} | {t_varredura * 1000:>14.1f} | "
+                f"{t_primeira * 1000:>8.1f} | {t_indices * 1000:>12.2f} | "
+                f"{t_cache * 1000:>10.3f} | {'sim' if igual else 'NÃO':>5} | "
+                f"{expressao}"
+            )
+
+
+# === TIPOS COMPACTOS
+def benchmark_memoria(lista_linhas):
+    print(
+        f"{'linhas':>10} | {'bytes/linha':>11} | {'compacta':>8} | {'redução':>7} | "
+        f"{'NIVEL == ALUNO (ms)':>19} | {'compacta (ms)':>13}"
+    )
+    for linhas in lista_linhas:
+        # Mesmos tipos de uma tabela lida do CSV (texto como str)
+        df = normalizar_tabela(preparar_para_csv(gerar_tabela_sintetica(linhas)))
+        compacta = compactar_tipos(df)
+        antes = memoria_por_coluna(df)
+        depois = memoria_por_coluna(compacta)
+        t_antes = _cronometrar(lambda: df["NIVEL"] == "ALUNO")
+        t_depois = _cronometrar(lambda: compacta["NIVEL"] == "ALUNO")
+        print(
+            f"{linhas:>10} | {antes['por_linha']:>11.1f} | "
+            f"{depois['por_linha']:>8.1f} | "
+            f"{antes['por_linha'] / depois['por_linha']:>6.1f}x | "
+            f"{t_antes * 1000:>19.2f} | {t_depois * 1000:>13.2f}"
+        )
+    print(f"\nBytes por linha em cada coluna ({linhas} linhas)")
+    for col, bytes_antes in antes["colunas"].items():
+        print(
+            f"{col:>16} | {bytes_antes / linhas:>7.1f} -> "
+            f"{depois['colunas'][col] / linhas:>6.1f}  ({compacta[col].dtype.name})"
+        )
+
+
+BENCHMARKS = {
+    "serializacao": benchmark_serializacao,
+    "rajada": benchmark_rajada,
+    "diario": benchmark_diario,
+    "consultas": benchmark_consultas,
+    "memoria": benchmark_memoria,
+    "leitura": benchmark_leitura,
+    "blocos": benchmark_blocos,
+    "paralelo": benchmark_paralelo,
+    "turmas": benchmark_turmas,
+    "notas": benchmark_notas,
+    "importacao": benchmark_importacao,
+    "usuarios": benchmark_usuarios,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--linhas", type=int, nargs="+", default=LINHAS_PADRAO)
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args.linhas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,584 @@
+"""
+Consultas compostas sobre a tabela de usuários (data_frame_full do App).
+
+Uma expressão como
+
+    CURSO = "PYTHON" E MEDIA < 5 E STATUS = ATIVO
+
+combina comparações com E/AND, OU/OR, NAO/NOT e parênteses. Operadores:
+=, !=, <, <=, >, >= e CONTEM (ou ~, trecho do texto). Texto é comparado
+sem diferenciar maiúsculas; números aceitam vírgula decimal. Valores com
+espaços (ou nomes de coluna com espaços) vão entre aspas. STATUS e TURMA
+são apelidos de "STATUS DO ALUNO" e ID_TURMAS.
+
+O MotorConsultas escolhe, para cada E, a comparação mais seletiva e parte
+dela: ID/EMAIL pelo IndiceUsuarios, texto por listas de rótulos por valor,
+números por arrays ordenados (faixas com busca binária) e CONTEM pelo
+índice de trigramas. As demais comparações ou cruzam listas de rótulos
+ou são conferidas só nas linhas que sobraram. Resultados ficam em cache
+até a próxima alteração da tabela.
+"""
+
+import operator
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from indices import IndiceTrigramas, texto_minusculo
+
+APELIDOS_COLUNAS = {"STATUS": "STATUS DO ALUNO", "TURMA": "ID_TURMAS"}
+TAMANHO_CACHE_CONSULTAS = 64
+# Com mais linhas alteradas que isso desde a montagem, os índices são refeitos
+LIMITE_LINHAS_ALTERADAS = 1000
+# Numa conjunção, a próxima comparação vira lista de rótulos (e interseção)
+# se o índice estimar até FATOR_INTERSECAO vezes as linhas que já sobraram;
+# acima disso é mais barato conferir essas linhas direto no DataFrame
+FATOR_INTERSECAO = 4
+
+
+class ErroConsulta(ValueError):
+    """Expressão de consulta inválida (sintaxe, coluna ou valor)."""
+
+
+# === ANÁLISE DA EXPRESSÃO
+_RE_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<texto>"[^"]*"|'[^']*')
+      | (?P<op><=|>=|!=|<>|==|=|<|>|~|\(|\))
+      | (?P<palavra>[^\s"'()<>=!~]+)
+    )""",
+    re.VERBOSE,
+)
+_OPERADORES = {
+    "=": "=",
+    "==": "=",
+    "!=": "!=",
+    "<>": "!=",
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+    "~": "CONTEM",
+    "CONTEM": "CONTEM",
+    "CONTÉM": "CONTEM",
+}
+_E = {"E", "AND"}
+_OU = {"OU", "OR"}
+_NAO = {"NAO", "NÃO", "NOT"}
+_COMPARAR = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _tokens(expressao):
+    tokens = []
+    posicao = 0
+    expressao = expressao.rstrip()
+    while posicao < len(expressao):
+        achado = _RE_TOKEN.match(expressao, posicao)
+        if achado is None:
+            raise ErroConsulta(f"Caractere inesperado na posição {posicao + 1}.")
+        tipo = achado.lastgroup
+        valor = achado.group(tipo)
+        if tipo == "texto":
+            valor = valor[1:-1]
+        tokens.append((tipo, valor))
+        posicao = achado.end()
+    return tokens
+
+
+def _texto_normalizado(serie):
+    """Texto sem espaços nas pontas e em maiúsculas; vazio continua NA."""
+    return serie.astype("string").str.strip().str.upper()
+
+
+def _fatorar_texto(serie):
+    """
+    (códigos, valores) do texto normalizado, com NA = -1. Numa coluna
+    category (tabela compacta) só as categorias são normalizadas e os
+    códigos da coluna são reaproveitados.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        mapa, valores = pd.factorize(
+            _texto_normalizado(pd.Series(serie.cat.categories))
+        )
+        if not len(mapa):
+            return np.full(len(codigos), -1, dtype=np.intp), pd.Index(valores)
+        return np.where(codigos >= 0, mapa[codigos], -1), pd.Index(valores)
+    codigos, valores = pd.factorize(_texto_normalizado(serie))
+    return codigos, pd.Index(valores)
+
+
+class _Analisador:
+    """Descida recursiva: ou -> e -> nao -> (expressão) | comparação."""
+
+    def __init__(self, expressao, df, colunas_permitidas):
+        self.tokens = _tokens(expressao)
+        self.posicao = 0
+        self.df = df
+        self.colunas = {
+            str(coluna).upper(): coluna
+            for coluna in (
+                df.columns if colunas_permitidas is None else colunas_permitidas
+            )
+        }
+
+    def _atual(self):
+        if self.posicao < len(self.tokens):
+            return self.tokens[self.posicao]
+        return (None, None)
+
+    def _palavra_chave(self, palavras):
+        tipo, valor = self._atual()
+        if tipo == "palavra" and valor.upper() in palavras:
+            self.posicao += 1
+            return True
+        return False
+
+    def analisar(self):
+        if not self.tokens:
+            raise ErroConsulta("Digite uma expressão de consulta.")
+        arvore = self._ou()
+        if self.posicao < len(self.tokens):
+            raise ErroConsulta(f"Trecho inesperado: {self._atual()[1]!r}.")
+        return arvore
+
+    def _ou(self):
+        filhos = [self._e()]
+        while self._palavra_chave(_OU):
+            filhos.append(self._e())
+        return filhos[0] if len(filhos) == 1 else ("ou", tuple(filhos))
+
+    def _e(self):
+        filhos = [self._nao()]
+        while self._palavra_chave(_E):
+            filhos.append(self._nao())
+        return filhos[0] if len(filhos) == 1 else ("e", tuple(filhos))
+
+    def _nao(self):
+        if self._palavra_chave(_NAO):
+            return ("nao", self._nao())
+        if self._atual() == ("op", "("):
+            self.posicao += 1
+            arvore = self._ou()
+            if self._atual() != ("op", ")"):
+                raise ErroConsulta("Parêntese não fechado.")
+            self.posicao += 1
+            return arvore
+        return self._comparacao()
+
+    def _comparacao(self):
+        tipo, nome = self._atual()
+        if tipo not in ("palavra", "texto"):
+            raise ErroConsulta("Esperava o nome de uma coluna.")
+        self.posicao += 1
+        nome = nome.strip().upper()
+        coluna = self.colunas.get(APELIDOS_COLUNAS.get(nome, nome))
+        if coluna is None:
+            raise ErroConsulta(f"Coluna desconhecida: {nome}.")
+
+        tipo, simbolo = self._atual()
+        op = (
+            _OPERADORES.get(str(simbolo).upper()) if tipo in ("op", "palavra") else None
+        )
+        if op is None:
+            raise ErroConsulta(f"Esperava um operador depois de {coluna}.")
+        self.posicao += 1
+
+        tipo, valor = self._atual()
+        if tipo not in ("palavra", "texto"):
+            raise ErroConsulta(f"Esperava um valor depois de {coluna} {op}.")
+        self.posicao += 1
+        return ("cmp", coluna, op, self._valor(coluna, op, valor))
+
+    def _valor(self, coluna, op, valor):
+        if op == "CONTEM":
+            return valor.lower()
+        if pd.api.types.is_numeric_dtype(self.df[coluna]):
+            try:
+                return float(valor.replace(",", "."))
+            except ValueError:
+                raise ErroConsulta(f"{coluna} só aceita números: {valor!r}.") from None
+        if op not in ("=", "!="):
+            raise ErroConsulta(f"{coluna} é texto: use =, != ou CONTEM.")
+        return valor.strip().upper()
+
+
+def analisar_consulta(expressao, df, colunas_permitidas=None):
+    """
+    Árvore da expressão, com colunas resolvidas e valores já convertidos:
+    ("cmp", coluna, op, valor), ("e", filhos), ("ou", filhos), ("nao", filho).
+    Levanta ErroConsulta se a expressão for inválida.
+    """
+    return _Analisador(expressao, df, colunas_permitidas).analisar()
+
+
+def avaliar_consulta(df, arvore):
+    """Máscara booleana da expressão sobre as linhas do df (sem índices)."""
+    tipo = arvore[0]
+    if tipo == "e":
+        mascara = np.ones(len(df), dtype=bool)
+        for filho in arvore[1]:
+            mascara &= avaliar_consulta(df, filho)
+        return mascara
+    if tipo == "ou":
+        mascara = np.zeros(len(df), dtype=bool)
+        for filho in arvore[1]:
+            mascara |= avaliar_consulta(df, filho)
+        return mascara
+    if tipo == "nao":
+        return ~avaliar_consulta(df, arvore[1])
+
+    _, coluna, op, valor = arvore
+    serie = df[coluna]
+    if op == "CONTEM":
+        return (
+            texto_minusculo(serie)
+            .str.contains(valor, regex=False, na=False)
+            .to_numpy(dtype=bool)
+        )
+    if not isinstance(valor, float):
+        # Texto: compara os códigos inteiros do valor normalizado
+        codigos, valores = _fatorar_texto(serie)
+        codigo = valores.get_indexer([valor])[0]
+        return (codigos >= 0) & _COMPARAR[op](codigos, codigo)
+    valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float)
+    validos = ~np.isnan(valores)
+    mascara = np.zeros(len(df), dtype=bool)
+    mascara[validos] = _COMPARAR[op](valores[validos], valor)
+    return mascara
+
+
+def descrever_consulta(arvore):
+    """Texto canônico da árvore (mostrado no plano)."""
+    tipo = arvore[0]
+    if tipo in ("e", "ou"):
+        juncao = " E " if tipo == "e" else " OU "
+        return "(" + juncao.join(descrever_consulta(f) for f in arvore[1]) + ")"
+    if tipo == "nao":
+        return "NAO " + descrever_consulta(arvore[1])
+    _, coluna, op, valor = arvore
+    return f"{coluna} {op} {valor!r}"
+
+
+# === ÍNDICES DAS COLUNAS
+class _IndiceCategorico:
+    """Valor normalizado -> rótulos das linhas (uma fatia de um array)."""
+
+    def __init__(self, serie):
+        codigos, categorias = _fatorar_texto(serie)
+        self._codigos = codigos
+        self._linhas = pd.Index(serie.index)
+        ordem = np.argsort(codigos, kind="stable")
+        self._rotulos = serie.index.to_numpy()[ordem]
+        # NA (código -1) fica no começo; depois um bloco por categoria
+        contagens = np.bincount(codigos + 1, minlength=len(categorias) + 1)
+        self._limites = np.r_[0, np.cumsum(contagens)]
+        self._posicao = {categoria: i + 1 for i, categoria in enumerate(categorias)}
+        self._ordenado = serie.index.is_monotonic_increasing
+        self._nao_nulos = np.sort(self._rotulos[self._limites[1] :])
+
+    def contar(self, op, valor):
+        i = self._posicao.get(valor)
+        iguais = 0 if i is None else self._limites[i + 1] - self._limites[i]
+        return iguais if op == "=" else len(self._nao_nulos) - iguais
+
+    def rotulos(self, op, valor):
+        i = self._posicao.get(valor)
+        if i is None:
+            iguais = self._rotulos[:0]
+        else:
+            iguais = self._rotulos[self._limites[i] : self._limites[i + 1]]
+            if not self._ordenado:
+                iguais = np.sort(iguais)
+        if op == "=":
+            return iguais
+        return np.setdiff1d(self._nao_nulos, iguais, assume_unique=True)
+
+    def conferir(self, rotulos, op, valor):
+        """Dos rótulos dados, os que satisfazem a comparação (pelos códigos)."""
+        posicoes = self._linhas.get_indexer(rotulos)
+        codigos = np.where(posicoes >= 0, self._codigos[posicoes], -1)
+        codigo = self._posicao.get(valor, 0) - 1
+        if op == "=":
+            return rotulos[(codigos == codigo) & (codigos >= 0)]
+        return rotulos[(codigos != codigo) & (codigos >= 0)]
+
+
+class _IndiceOrdenado:
+    """Valores numéricos ordenados e os rótulos na mesma ordem."""
+
+    def __init__(self, serie):
+        valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float)
+        self._originais = valores
+        self._linhas = pd.Index(serie.index)
+        validos = ~np.isnan(valores)
+        ordem = np.argsort(valores[validos], kind="stable")
+        self._valores = valores[validos][ordem]
+        self._rotulos = serie.index.to_numpy()[validos][ordem]
+        # Rótulos inteiros >= 0 (os do App): uma faixa volta à ordem dos
+        # rótulos por máscara, sem ordenar
+        self._maior = (
+            int(self._rotulos.max())
+            if len(self._rotulos)
+            and self._rotulos.dtype.kind in "iu"
+            and self._rotulos.min() >= 0
+            else None
+        )
+
+    def _faixa(self, op, valor):
+        if op in ("<", "<="):
+            return 0, np.searchsorted(
+                self._valores, valor, side="left" if op == "<" else "right"
+            )
+        if op in (">", ">="):
+            lado = "right" if op == ">" else "left"
+            return np.searchsorted(self._valores, valor, side=lado), len(self._valores)
+        return (
+            np.searchsorted(self._valores, valor, side="left"),
+            np.searchsorted(self._valores, valor, side="right"),
+        )
+
+    def contar(self, op, valor):
+        inicio, fim = self._faixa(op, valor)
+        return len(self._valores) - (fim - inicio) if op == "!=" else fim - inicio
+
+    def rotulos(self, op, valor):
+        inicio, fim = self._faixa(op, valor)
+        if op == "!=":
+            faixa = np.r_[self._rotulos[:inicio], self._rotulos[fim:]]
+        else:
+            faixa = self._rotulos[inicio:fim]
+        if self._maior is None or len(faixa) < 1000:
+            return np.sort(faixa)
+        mascara = np.zeros(self._maior + 1, dtype=bool)
+        mascara[faixa] = True
+        return np.flatnonzero(mascara).astype(self._rotulos.dtype, copy=False)
+
+    def conferir(self, rotulos, op, valor):
+        """Dos rótulos dados, os que satisfazem a comparação."""
+        posicoes = self._linhas.get_indexer(rotulos)
+        valores = np.where(posicoes >= 0, self._originais[posicoes], np.nan)
+        validos = ~np.isnan(valores)
+        mascara = np.zeros(len(rotulos), dtype=bool)
+        mascara[validos] = _COMPARAR[op](valores[validos], valor)
+        return rotulos[mascara]
+
+
+# === MOTOR DE CONSULTAS
+class MotorConsultas:
+    """
+    Executa expressões com índices montados sob demanda, por coluna.
+
+    O App chama reconstruir(df) a cada carga e marcar_alterada(rotulo) a
+    cada inserção/edição/exclusão. Linhas alteradas desde a montagem não são
+    confiadas aos índices: saem do resultado dos índices e a expressão é
+    conferida direto nelas. Cada alteração muda a versão e esvazia o cache
+    de resultados.
+
+    indice_usuarios (IndiceUsuarios) atende ID = n e EMAIL = x;
+    indice_trecho(coluna), se informado, devolve o IndiceTrigramas da coluna
+    (para reaproveitar o do filtro geral) em vez de o motor montar o seu.
+    """
+
+    def __init__(self, indice_usuarios=None, indice_trecho=None):
+        self.indice_usuarios = indice_usuarios
+        self.indice_trecho = indice_trecho
+        self.versao = 0
+        self.ultimo_plano = []
+        self.acertos_cache = 0
+        self._cache = OrderedDict()
+        self._indices = {}
+        self._universo = np.empty(0, dtype=np.int64)
+        self._alteradas = set()
+        self._precisa_reconstruir = True
+
+    def reconstruir(self, df):
+        """Descarta índices e cache; os índices são remontados no próximo uso."""
+        self._indices = {}
+        self._universo = np.sort(df.index.to_numpy())
+        self._alteradas = set()
+        self._precisa_reconstruir = False
+        self._mudar_versao()
+
+    def marcar_alterada(self, rotulo):
+        if rotulo is None:
+            return
+        self._alteradas.add(rotulo)
+        if len(self._alteradas) > LIMITE_LINHAS_ALTERADAS:
+            self._precisa_reconstruir = True
+        self._mudar_versao()
+
+    def _mudar_versao(self):
+        self.versao += 1
+        self._cache.clear()
+
+    def limpar_cache(self):
+        self._cache.clear()
+
+    def consultar(self, df, expressao, colunas_permitidas=None):
+        """
+        Rótulos (array ordenado) das linhas do df que satisfazem a expressão.
+        Só as colunas_permitidas (todas, se None) podem ser usadas.
+        """
+        arvore = analisar_consulta(expressao, df, colunas_permitidas)
+        if self._precisa_reconstruir:
+            self.reconstruir(df)
+        chave = descrever_consulta(arvore)
+        if chave in self._cache:
+            self._cache.move_to_end(chave)
+            self.acertos_cache += 1
+            self.ultimo_plano = [f"cache (versão {self.versao}): {chave}"]
+            return self._cache[chave]
+
+        self.ultimo_plano = []
+        rotulos = self._executar(df, arvore)
+        if self._alteradas:
+            # Linhas alteradas: tira o que os índices disseram e confere direto
+            alteradas = np.array(sorted(self._alteradas), dtype=self._universo.dtype)
+            rotulos = np.setdiff1d(rotulos, alteradas, assume_unique=True)
+            existentes = alteradas[np.isin(alteradas, df.index.to_numpy())]
+            if len(existentes):
+                mascara = avaliar_consulta(df.loc[existentes], arvore)
+                rotulos = np.union1d(rotulos, existentes[mascara])
+            self.ultimo_plano.append(f"conferidas direto: {len(existentes)} alteradas")
+
+        self._cache[chave] = rotulos
+        if len(self._cache) > TAMANHO_CACHE_CONSULTAS:
+            self._cache.popitem(last=False)
+        return rotulos
+
+    # --- Índices ---
+    def _indice(self, df, tipo, coluna):
+        chave = (tipo, coluna)
+        indice = self._indices.get(chave)
+        if indice is None:
+            if tipo == "trecho":
+                indice = IndiceTrigramas(df[coluna])
+            elif tipo == "ordenado":
+                indice = _IndiceOrdenado(df[coluna])
+            else:
+                indice = _IndiceCategorico(df[coluna])
+            self._indices[chave] = indice
+        return indice
+
+    def _trecho(self, df, coluna):
+        if self.indice_trecho is not None:
+            return self.indice_trecho(coluna)
+        return self._indice(df, "trecho", coluna)
+
+    def _rotulos_por_ids(self, df, ids):
+        rotulos = (self.indice_usuarios.rotulo(df, user_id) for user_id in ids)
+        return np.sort(
+            np.array([r for r in rotulos if r is not None], dtype=self._universo.dtype)
+        )
+
+    def _acesso(self, df, comparacao):
+        """
+        (descrição, estimativa, rotulos(), conferir(rotulos)) da comparação:
+        rotulos() devolve todas as linhas que a satisfazem; conferir filtra
+        só as linhas dadas.
+        """
+        _, coluna, op, valor = comparacao
+        if self.indice_usuarios is not None and op == "=":
+            ids = None
+            if coluna == "ID" and float(valor).is_integer():
+                ids, descricao = [int(valor)], "ID"
+            elif coluna == "EMAIL":
+                ids, descricao = self.indice_usuarios.ids_por_email(valor), "e-mail"
+            if ids is not None:
+
+                def rotulos():
+                    return self._rotulos_por_ids(df, ids)
+
+                return (
+                    descricao,
+                    len(ids),
+                    rotulos,
+                    lambda dados: dados[np.isin(dados, rotulos())],
+                )
+        if op == "CONTEM":
+            indice = self._trecho(df, coluna)
+            return (
+                "trigramas",
+                indice.estimar(valor),
+                lambda: np.sort(indice.buscar(valor)),
+                lambda dados: indice.refinar(dados, valor),
+            )
+        tipo = "ordenado" if isinstance(valor, float) else "categorico"
+        indice = self._indice(df, tipo, coluna)
+        return (
+            tipo,
+            indice.contar(op, valor),
+            lambda: indice.rotulos(op, valor),
+            lambda dados: indice.conferir(dados, op, valor),
+        )
+
+    # --- Execução ---
+    def _estimar(self, df, arvore):
+        tipo = arvore[0]
+        if tipo == "cmp":
+            return self._acesso(df, arvore)[1]
+        if tipo == "e":
+            return min(self._estimar(df, filho) for filho in arvore[1])
+        if tipo == "ou":
+            return min(
+                len(self._universo), sum(self._estimar(df, f) for f in arvore[1])
+            )
+        return len(self._universo)
+
+    def _executar(self, df, arvore):
+        tipo = arvore[0]
+        if tipo == "cmp":
+            descricao, _, rotulos, _ = self._acesso(df, arvore)
+            resultado = rotulos()
+            self.ultimo_plano.append(
+                f"{descrever_consulta(arvore)}: índice {descricao}, "
+                f"{len(resultado)} linhas"
+            )
+            return resultado
+        if tipo == "ou":
+            resultado = self._executar(df, arvore[1][0])
+            for filho in arvore[1][1:]:
+                resultado = np.union1d(resultado, self._executar(df, filho))
+            return resultado
+        if tipo == "nao":
+            filho = self._executar(df, arvore[1])
+            return np.setdiff1d(self._universo, filho, assume_unique=True)
+        return self._executar_e(df, arvore[1])
+
+    def _executar_e(self, df, filhos):
+        # Parte da comparação mais seletiva
+        estimados = sorted((self._estimar(df, f), i) for i, f in enumerate(filhos))
+        ordem = [filhos[i] for _, i in estimados]
+        resultado = self._executar(df, ordem[0])
+        for (estimativa, _), filho in zip(estimados[1:], ordem[1:]):
+            if not len(resultado):
+                break
+            if estimativa <= FATOR_INTERSECAO * len(resultado):
+                resultado = np.intersect1d(
+                    resultado, self._executar(df, filho), assume_unique=True
+                )
+                continue
+            # Poucas linhas restantes: confere a comparação só nelas. Linhas
+            # alteradas (talvez já excluídas) são tratadas no fim, à parte.
+            if self._alteradas:
+                resultado = resultado[
+                    np.isin(resultado, list(self._alteradas), invert=True)
+                ]
+            if filho[0] == "cmp":
+                resultado = self._acesso(df, filho)[3](resultado)
+            else:
+                resultado = resultado[avaliar_consulta(df.loc[resultado], filho)]
+            self.ultimo_plano.append(
+                f"{descrever_consulta(filho)}: conferida em {len(resultado)} linhas"
+            )
+        return resultado
@@ -0,0 +1,479 @@
+"""
+Importação e exportação em lote do Sistema Acadêmico.
+
+importar_notas() lança as notas de uma turma inteira a partir de uma
+planilha (CSV ou XLSX) com as colunas ID ou EMAIL e NP1, NP2 e/ou PIM.
+importar_usuarios() cadastra muitos usuários de um CSV ou JSONL lido em
+blocos, e exportar_usuarios() grava a tabela nesses mesmos formatos.
+
+A validação é feita coluna a coluna (sem laço por linha), as linhas válidas
+entram no DataFrame de uma vez, a MEDIA é recalculada pelo motor_notas
+numa passada e as linhas com problema voltam num relatório (LINHA,
+IDENTIFICAÇÃO, ERRO). Quem chama salva uma única vez no fim.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import (
+    COLUNAS_CSV,
+    COLUNAS_CSV_PARA_APP,
+    arquivo_atomico,
+    expandir_tipos,
+    formatar_decimal_virgula,
+    preparar_para_csv,
+)
+from indices import NOTA_MAXIMA, NOTA_MINIMA, anexar_linhas
+from notas import COLUNAS_PROVAS, motor_notas
+
+COLUNAS_RELATORIO = ["LINHA", "IDENTIFICAÇÃO", "ERRO"]
+EXTENSOES_EXCEL = (".xlsx", ".xlsm", ".xls")
+EXTENSOES_JSONL = (".jsonl", ".json", ".ndjson")
+
+# Mesmos campos obrigatórios do adicionarUsuario() do programa em C
+CAMPOS_OBRIGATORIOS = ["NOME", "EMAIL", "SENHA", "NIVEL"]
+NIVEIS = ["ALUNO", "PROFESSOR", "COORDENADOR", "ADMINISTRADOR"]
+# Colunas internas do App, na ordem do CSV (tabela vazia)
+COLUNAS_USUARIOS = [COLUNAS_CSV_PARA_APP.get(c.upper(), c.upper()) for c in COLUNAS_CSV]
+LINHAS_POR_BLOCO_IMPORTACAO = 20_000
+# Mesma regra do validarEmail() do C: algo antes do "@" e, depois dele, um
+# "." que não vem logo após o "@" nem termina o texto
+_RE_EMAIL = r"[^@]+@[^.]+\..+"
+
+
+class ErroImportacao(ValueError):
+    """A planilha inteira não pode ser importada (arquivo ou colunas)."""
+
+
+def ler_planilha_notas(caminho):
+    """
+    Lê a planilha como texto, com os nomes das colunas em maiúsculas.
+
+    CSV aceita ";" ou "," como separador (o da primeira linha) e vírgula
+    decimal; XLSX precisa do openpyxl.
+    """
+    if os.path.splitext(caminho)[1].lower() in EXTENSOES_EXCEL:
+        try:
+            planilha = pd.read_excel(caminho, dtype=str)
+        except ImportError as e:
+            raise ErroImportacao(
+                "Para ler planilhas do Excel instale o openpyxl "
+                "(pip install openpyxl) ou salve a planilha como CSV."
+            ) from e
+    else:
+        with open(caminho, "r", encoding="utf-8-sig") as arquivo:
+            cabecalho = arquivo.readline()
+        separador = ";" if ";" in cabecalho else ","
+        planilha = pd.read_csv(caminho, sep=separador, dtype=str, encoding="utf-8-sig")
+    planilha.columns = [str(col).strip().upper() for col in planilha.columns]
+    return planilha
+
+
+def _texto(serie):
+    """Coluna como texto sem espaços nas pontas; célula vazia vira NA."""
+    texto = serie.astype("string").str.strip()
+    return texto.mask(texto == "")
+
+
+def _converter_notas(planilha, colunas):
+    """
+    Converte as notas de uma vez. Devolve o DataFrame de notas (NaN = célula
+    vazia) e a lista de (máscara, mensagem) dos erros.
+    """
+    notas = pd.DataFrame(index=planilha.index)
+    erros = []
+    for col in colunas:
+        texto = _texto(planilha[col])
+        valores = pd.to_numeric(
+            texto.str.replace(",", ".", regex=False), errors="coerce"
+        ).astype(np.float64)
+        erros.append((texto.notna() & valores.isna(), f"{col} não é um número"))
+        erros.append(
+            (
+                valores.notna() & ~valores.between(NOTA_MINIMA, NOTA_MAXIMA),
+                f"{col} fora do intervalo de {NOTA_MINIMA:g} a {NOTA_MAXIMA:g}",
+            )
+        )
+        notas[col] = valores
+    return notas, erros
+
+
+def _relatorio(linhas, identificacao, erros):
+    """
+    Junta os (máscara, mensagem) num relatório com uma linha por erro.
+    Devolve (relatorio, máscara das linhas com algum erro).
+    """
+    partes = []
+    com_erro = np.zeros(len(linhas), dtype=bool)
+    identificacao = np.asarray(identificacao, dtype=object)
+    for mascara, mensagem in erros:
+        mascara = np.asarray(mascara, dtype=bool)
+        if mascara.any():
+            com_erro |= mascara
+            partes.append(
+                pd.DataFrame(
+                    {
+                        "LINHA": linhas[mascara],
+                        "IDENTIFICAÇÃO": identificacao[mascara],
+                        "ERRO": mensagem,
+                    }
+                )
+            )
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS_RELATORIO), com_erro
+    relatorio = (
+        pd.concat(partes, ignore_index=True)
+        .sort_values("LINHA", kind="stable")
+        .reset_index(drop=True)
+    )
+    return relatorio, com_erro
+
+
+def _resolver_linhas(df, planilha, indice):
+    """
+    Rótulo de df de cada linha da planilha (None se não identificada), o
+    texto usado para identificá-la e a lista de (máscara, mensagem) dos erros.
+    """
+    n = len(planilha)
+    vazio = pd.Series([pd.NA] * n, index=planilha.index, dtype="string")
+    ids_texto = _texto(planilha["ID"]) if "ID" in planilha.columns else vazio
+    emails = _texto(planilha["EMAIL"]) if "EMAIL" in planilha.columns else vazio
+    identificacao = ids_texto.fillna(emails).fillna("")
+
+    ids = pd.to_numeric(ids_texto, errors="coerce")
+    id_invalido = ids_texto.notna() & (ids.isna() | (ids % 1 != 0))
+    sem_identificacao = ids_texto.isna() & emails.isna()
+
+    rotulos = [None] * n
+    nao_encontrado = np.zeros(n, dtype=bool)
+    email_repetido = np.zeros(n, dtype=bool)
+
+    # Por ID: consulta direta ao índice ID -> rótulo
+    por_id = (ids_texto.notna() & ~id_invalido).to_numpy()
+    posicoes = np.flatnonzero(por_id)
+    for posicao, rotulo in zip(
+        posicoes, indice.rotulos(df, ids.iloc[posicoes].astype(np.int64).tolist())
+    ):
+        rotulos[posicao] = rotulo
+        nao_encontrado[posicao] = rotulo is None
+
+    # Por e-mail (só quando não há ID): uma busca por e-mail distinto
+    por_email = (ids_texto.isna() & emails.notna()).to_numpy()
+    posicoes = np.flatnonzero(por_email)
+    encontrados = {
+        email: indice.ids_por_email(email)
+        for email in emails.iloc[posicoes].unique().tolist()
+    }
+    for posicao in posicoes:
+        encontrado = encontrados[emails.iat[posicao]]
+        if len(encontrado) == 1:
+            rotulos[posicao] = indice.rotulo(df, encontrado[0])
+        email_repetido[posicao] = len(encontrado) > 1
+        nao_encontrado[posicao] = not encontrado
+
+    erros = [
+        (sem_identificacao, "Sem ID nem EMAIL"),
+        (id_invalido, "ID inválido"),
+        (nao_encontrado, "Usuário não encontrado"),
+        (email_repetido, "E-mail de mais de um usuário (use o ID)"),
+    ]
+    return rotulos, identificacao, erros
+
+
+def validar_notas(df, planilha, indice, turma=None):
+    """
+    Valida a planilha contra df sem alterar nada.
+
+    Devolve (lancamentos, relatorio): lancamentos tem as notas válidas (NaN =
+    manter a atual) indexadas pelo rótulo da linha em df; relatorio tem uma
+    linha por erro encontrado (LINHA é a linha na planilha, contando o
+    cabeçalho). Com turma, alunos de outras turmas são recusados.
+    """
+    if "ID" not in planilha.columns and "EMAIL" not in planilha.columns:
+        raise ErroImportacao("A planilha precisa de uma coluna ID ou EMAIL.")
+    colunas = [col for col in COLUNAS_PROVAS if col in planilha.columns]
+    if not colunas:
+        raise ErroImportacao(
+            f"A planilha precisa de ao menos uma das colunas {', '.join(COLUNAS_PROVAS)}."
+        )
+
+    notas, erros_notas = _converter_notas(planilha, colunas)
+    erros_notas.append((notas.isna().all(axis=1), "Nenhuma nota informada"))
+    rotulos, identificacao, erros = _resolver_linhas(df, planilha, indice)
+    erros += erros_notas
+
+    encontrados = np.array([r is not None for r in rotulos])
+    if encontrados.any():
+        alvo = df.loc[[r for r in rotulos if r is not None]]
+        nao_aluno = np.zeros(len(planilha), dtype=bool)
+        nao_aluno[encontrados] = (alvo["NIVEL"] != "ALUNO").to_numpy()
+        erros.append((nao_aluno, "Usuário não é ALUNO"))
+        if turma is not None:
+            outra_turma = np.zeros(len(planilha), dtype=bool)
+            outra_turma[encontrados] = (
+                alvo["ID_TURMAS"].astype(str).str.strip() != str(turma).strip()
+            ).to_numpy()
+            erros.append((outra_turma, f"Aluno fora da turma {turma}"))
+        repetido = np.zeros(len(planilha), dtype=bool)
+        repetido[encontrados] = (
+            pd.Series([r for r in rotulos if r is not None])
+            .duplicated(keep=False)
+            .to_numpy()
+        )
+        erros.append((repetido, "Aluno repetido na planilha"))
+
+    linhas = np.arange(len(planilha)) + 2  # 1 = cabeçalho
+    relatorio, com_erro = _relatorio(linhas, identificacao, erros)
+
+    validas = ~com_erro
+    lancamentos = notas[validas]
+    lancamentos.index = pd.Index([r for r, ok in zip(rotulos, validas) if ok])
+    return lancamentos, relatorio
+
+
+def aplicar_notas(df, lancamentos, alteracoes=None):
+    """
+    Grava as notas válidas em df (uma atribuição por coluna), recalcula a
+    MEDIA só das linhas que mudaram e marca essas linhas em alteracoes.
+    Devolve o pd.Index dos rótulos alterados.
+    """
+    mudaram = pd.Index([])
+    for col in lancamentos.columns:
+        informadas = lancamentos[col].dropna()
+        if informadas.empty:
+            continue
+        # Mesmo critério da MEDIA no motor_notas: mantém float32, o resto
+        # vira float64
+        if df[col].dtype not in (np.float32, np.float64):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+        novas = informadas.to_numpy(dtype=df[col].dtype)
+        atuais = df.loc[informadas.index, col].to_numpy()
+        diferentes = (novas != atuais) & ~(np.isnan(novas) & np.isnan(atuais))
+        if diferentes.any():
+            rotulos = informadas.index[diferentes]
+            df.loc[rotulos, col] = novas[diferentes]
+            mudaram = mudaram.union(rotulos)
+
+    if len(mudaram):
+        motor_notas.recalcular(df, mudaram)
+        if alteracoes is not None:
+            alteracoes.marcar_atualizados(df.loc[mudaram, "ID"].tolist())
+    return mudaram
+
+
+def importar_notas(df, caminho, indice, alteracoes=None, turma=None):
+    """
+    Lê, valida e aplica a planilha de notas em df.
+
+    Devolve {"linhas": linhas lidas, "validas": linhas aplicadas,
+    "alteradas": rótulos cujas notas mudaram, "relatorio": erros por linha}.
+    """
+    planilha = ler_planilha_notas(caminho)
+    lancamentos, relatorio = validar_notas(df, planilha, indice, turma)
+    alteradas = aplicar_notas(df, lancamentos, alteracoes)
+    return {
+        "linhas": len(planilha),
+        "validas": len(lancamentos),
+        "alteradas": alteradas,
+        "relatorio": relatorio,
+    }
+
+
+# === USUÁRIOS EM LOTE
+def _formato(caminho):
+    return "jsonl" if caminho.lower().endswith(EXTENSOES_JSONL) else "csv"
+
+
+def ler_usuarios_em_lote(caminho, linhas_por_bloco=LINHAS_POR_BLOCO_IMPORTACAO):
+    """
+    Gera (primeira_linha, bloco) com os usuários de um CSV ou JSONL, lidos
+    linhas_por_bloco por vez. Os blocos vêm como texto ("" = vazio), com as
+    colunas em maiúsculas e nos nomes internos do App (TURMA -> ID_TURMAS).
+    """
+    jsonl = _formato(caminho) == "jsonl"
+    if jsonl:
+        leitor = pd.read_json(
+            caminho,
+            lines=True,
+            chunksize=linhas_por_bloco,
+            dtype=False,
+            precise_float=True,
+        )
+        primeira = 1
+    else:
+        with open(caminho, "r", encoding="utf-8-sig") as arquivo:
+            cabecalho = arquivo.readline()
+        leitor = pd.read_csv(
+            caminho,
+            sep=";" if ";" in cabecalho else ",",
+            dtype=str,
+            keep_default_na=False,
+            chunksize=linhas_por_bloco,
+            encoding="utf-8-sig",
+        )
+        primeira = 2  # 1 = cabeçalho
+    with leitor:
+        for bloco in leitor:
+            bloco.columns = [str(col).strip().upper() for col in bloco.columns]
+            bloco = bloco.rename(columns=COLUNAS_CSV_PARA_APP)
+            if jsonl:
+                bloco = bloco.astype(object).where(bloco.notna(), "").astype(str)
+            yield primeira, bloco.reset_index(drop=True)
+            primeira += len(bloco)
+
+
+def validar_usuarios(bloco, primeira_linha, indice, emails_vistos):
+    """
+    Valida um bloco de usuários (texto) e devolve (validos, relatorio).
+
+    validos já vem normalizado, nas colunas COLUNAS_USUARIOS, sem ID e sem
+    MEDIA. emails_vistos (set) guarda os e-mails aceitos nos blocos
+    anteriores, para recusar repetidos dentro do mesmo arquivo.
+    """
+    faltando = [col for col in CAMPOS_OBRIGATORIOS if col not in bloco.columns]
+    if faltando:
+        raise ErroImportacao(f"Colunas obrigatórias ausentes: {', '.join(faltando)}.")
+
+    n = len(bloco)
+    texto = {col: bloco[col].str.strip() for col in bloco.columns}
+    vazio = pd.Series([""] * n, dtype=object)
+    # Já na forma de indices.normalizar_email (sem espaços, minúsculas)
+    emails = texto["EMAIL"].str.lower()
+    niveis = texto["NIVEL"].str.upper()
+    erros = [(texto[col] == "", f"{col} vazio") for col in CAMPOS_OBRIGATORIOS]
+    erros.append(
+        (
+            (emails != "") & ~emails.str.fullmatch(_RE_EMAIL),
+            "E-mail inválido",
+        )
+    )
+    erros.append(((niveis != "") & ~niveis.isin(NIVEIS), "NIVEL desconhecido"))
+
+    idades = pd.to_numeric(texto.get("IDADE", vazio).replace("", "0"), errors="coerce")
+    erros.append((idades.isna() | (idades % 1 != 0) | (idades < 0), "IDADE inválida"))
+    colunas_notas = [col for col in COLUNAS_PROVAS if col in bloco.columns]
+    notas, erros_notas = _converter_notas(bloco, colunas_notas)
+    erros += erros_notas
+
+    # E-mail repetido (já cadastrado ou em outra linha do arquivo) deixaria o
+    # login ambíguo; só é procurado nas linhas sem outros erros
+    linhas = np.arange(n) + primeira_linha
+    identificacao = emails.where(emails != "", texto["NOME"])
+    _, com_erro = _relatorio(linhas, identificacao, erros)
+    candidatas = emails[~com_erro]
+    cadastrado = np.zeros(n, dtype=bool)
+    cadastrado[~com_erro] = [bool(indice.ids_por_email(e)) for e in candidatas]
+    repetido = np.zeros(n, dtype=bool)
+    repetido[~com_erro] = (
+        candidatas.duplicated() | candidatas.isin(emails_vistos)
+    ).to_numpy()
+    erros.append((cadastrado, "E-mail já cadastrado"))
+    erros.append((repetido & ~cadastrado, "E-mail repetido no arquivo"))
+
+    relatorio, com_erro = _relatorio(linhas, identificacao, erros)
+    validas = ~com_erro
+    emails_vistos.update(emails[validas].tolist())
+
+    validos = pd.DataFrame(index=range(int(validas.sum())))
+    for col in COLUNAS_USUARIOS:
+        if col in ("ID", "MEDIA"):
+            continue
+        if col in COLUNAS_PROVAS:
+            valores = (
+                notas[col]
+                if col in notas.columns
+                else pd.Series(0.0, index=bloco.index)
+            )
+            validos[col] = valores[validas].fillna(0.0).to_numpy(dtype=np.float64)
+        elif col == "IDADE":
+            validos[col] = idades[validas].to_numpy(dtype=np.int64)
+        else:
+            valores = texto.get(col, vazio)[validas]
+            if col in ("NOME", "NIVEL", "CURSO"):
+                valores = valores.str.upper()
+            elif col == "EMAIL":
+                valores = valores.str.lower()
+            elif col == "STATUS DO ALUNO":
+                valores = valores.str.upper().replace("", "ATIVO")
+            validos[col] = valores.to_numpy(dtype=object)
+    return validos, relatorio
+
+
+def importar_usuarios(
+    df,
+    caminho,
+    indice,
+    sequencia,
+    alteracoes=None,
+    linhas_por_bloco=LINHAS_POR_BLOCO_IMPORTACAO,
+):
+    """
+    Cadastra os usuários válidos do arquivo (CSV ou JSONL) no fim de df.
+
+    O arquivo é lido e validado em blocos; os IDs dos aceitos saem de um
+    único sequencia.reservar(n) e a MEDIA é calculada numa passada. Os IDs
+    do arquivo são ignorados. Devolve (df, resultado), com resultado =
+    {"linhas": linhas lidas, "ids": range dos IDs criados, "relatorio":
+    erros por linha}; quem chama salva uma vez (só inserções).
+    """
+    emails_vistos = set()
+    aceitos = []
+    relatorios = []
+    lidas = 0
+    for primeira, bloco in ler_usuarios_em_lote(caminho, linhas_por_bloco):
+        validos, relatorio = validar_usuarios(bloco, primeira, indice, emails_vistos)
+        lidas += len(bloco)
+        if len(validos):
+            aceitos.append(validos)
+        if not relatorio.empty:
+            relatorios.append(relatorio)
+    relatorio = (
+        pd.concat(relatorios, ignore_index=True)
+        if relatorios
+        else pd.DataFrame(columns=COLUNAS_RELATORIO)
+    )
+    if not aceitos:
+        return df, {"linhas": lidas, "ids": range(0), "relatorio": relatorio}
+
+    novos = pd.concat(aceitos, ignore_index=True)
+    ids = sequencia.reservar(
+        len(novos),
+        obter_maximo=lambda: 0 if df is None or df.empty else int(df["ID"].max()),
+    )
+    novos["ID"] = np.arange(ids.start, ids.stop, dtype=np.int64)
+    motor_notas.recalcular(novos)
+    colunas = COLUNAS_USUARIOS if df is None or df.empty else list(df.columns)
+    novos = novos.reindex(columns=colunas, fill_value="")
+    df = anexar_linhas(df, novos)
+    if alteracoes is not None:
+        alteracoes.marcar_inseridos(ids)
+    return df, {"linhas": lidas, "ids": ids, "relatorio": relatorio}
+
+
+def exportar_usuarios(df, caminho, linhas_por_bloco=LINHAS_POR_BLOCO_IMPORTACAO):
+    """
+    Grava df em CSV (";" e vírgula decimal, cabeçalho do programa em C) ou
+    JSONL, bloco a bloco, num arquivo atômico. Devolve o número de linhas.
+    O arquivo gerado é aceito por importar_usuarios().
+    """
+    jsonl = _formato(caminho) == "jsonl"
+    with arquivo_atomico(caminho) as arquivo:
+        if not jsonl:
+            arquivo.write(";".join(COLUNAS_CSV) + "\r\n")
+        for inicio in range(0, len(df), linhas_por_bloco):
+            # Tipos compactos de volta a float64 com duas casas (7.35 e não
+            # 7.3499999046 no JSON)
+            bloco = preparar_para_csv(
+                expandir_tipos(df.iloc[inicio : inicio + linhas_por_bloco])
+            )
+            if jsonl:
+                bloco.to_json(arquivo, orient="records", lines=True, force_ascii=False)
+                continue
+            for col in ["np1", "np2", "pim", "media"]:
+                bloco[col] = formatar_decimal_virgula(bloco[col])
+            bloco.to_csv(
+                arquivo, sep=";", index=False, header=False, lineterminator="\r\n"
+            )
+    return len(df)
@@ -0,0 +1,561 @@
+"""
+Índices em memória sobre a tabela de usuários (data_frame_full do App).
+
+Evitam varrer o DataFrame inteiro para achar um usuário: o login procura
+pelo e-mail/nome normalizado num dicionário, e edição, status e exclusão
+vão do ID direto ao rótulo da linha (df.loc).
+
+Os rótulos do índice do DataFrame precisam ser estáveis: linhas novas
+entram com anexar_linhas() (rótulo = maior rótulo + 1) em vez de
+pd.concat(..., ignore_index=True), que renumeraria as linhas existentes.
+"""
+
+import numpy as np
+import pandas as pd
+
+from notas import COLUNAS_PROVAS
+
+# Intervalo aceito nas notas (edição na tela e importação de planilhas)
+NOTA_MINIMA = 0.0
+NOTA_MAXIMA = 10.0
+
+
+def normalizar_email(valor):
+    return str(valor).strip().lower()
+
+
+def normalizar_nome(valor):
+    return str(valor).strip().upper()
+
+
+# Nos mapas chave -> ID, a chave de um único usuário guarda o próprio ID
+# (caso comum, mais barato de montar); chaves repetidas guardam um set.
+def _mapa_de_chaves(chaves, ids):
+    mapa = dict(zip(chaves, ids))
+    if len(mapa) == len(chaves):
+        return mapa
+    repetidas = pd.Series(chaves).duplicated(keep=False).to_numpy().nonzero()[0]
+    for posicao in repetidas:
+        mapa[chaves[posicao]] = set()
+    for posicao in repetidas:
+        mapa[chaves[posicao]].add(ids[posicao])
+    return mapa
+
+
+def _adicionar(mapa, chave, user_id):
+    atual = mapa.get(chave)
+    if atual is None:
+        mapa[chave] = user_id
+    elif isinstance(atual, set):
+        atual.add(user_id)
+    elif atual != user_id:
+        mapa[chave] = {atual, user_id}
+
+
+def _remover(mapa, chave, user_id):
+    atual = mapa.get(chave)
+    if isinstance(atual, set):
+        atual.discard(user_id)
+        if len(atual) == 1:
+            mapa[chave] = atual.pop()
+    elif atual == user_id:
+        del mapa[chave]
+
+
+def _ids(mapa, chave):
+    atual = mapa.get(chave)
+    if atual is None:
+        return []
+    if isinstance(atual, set):
+        return sorted(atual)
+    return [atual]
+
+
+def _alinhar_tipos(df, novas):
+    """
+    Converte as colunas de "novas" para os tipos de df (category, int32,
+    float32 da tabela compacta), para o concat não voltar a object/int64.
+    Categorias novas são acrescentadas às colunas de df; numa coluna inteira,
+    números com vírgula são truncados e vazios viram 0, como ao carregar o CSV.
+    """
+    ajustes = {}
+    novas = novas.copy()
+    for col in novas.columns.intersection(df.columns):
+        tipo = df[col].dtype
+        if isinstance(tipo, pd.CategoricalDtype):
+            faltando = pd.Index(novas[col].dropna().unique()).difference(
+                tipo.categories
+            )
+            if len(faltando):
+                ajustes[col] = df[col].cat.add_categories(faltando)
+                tipo = ajustes[col].dtype
+            novas[col] = novas[col].astype(tipo)
+        elif tipo.kind in "iu" and novas[col].dtype.kind in "iufb":
+            novas[col] = novas[col].fillna(0).astype(tipo)
+        elif tipo.kind == "f" and novas[col].dtype.kind in "iufb":
+            novas[col] = novas[col].astype(tipo)
+    if ajustes:
+        df = df.assign(**ajustes)
+    return df, novas
+
+
+def anexar_linhas(df, novas):
+    """pd.concat que dá rótulos novos às linhas anexadas sem mexer nos existentes."""
+    if df is None or df.empty:
+        return novas.reset_index(drop=True)
+    df, novas = _alinhar_tipos(df, novas)
+    inicio = int(df.index.max()) + 1
+    novas = novas.set_axis(range(inicio, inicio + len(novas)))
+    return pd.concat([df, novas])
+
+
+def _preparar_valor(df, coluna, valor):
+    """
+    Valor pronto para entrar na coluna sem mudar o tipo dela: acrescenta a
+    categoria que falta, converte números para o tipo numérico da coluna
+    (int32/float32 na tabela compacta) e, numa coluna inteira, trunca a
+    parte decimal e troca vazio por 0, como ao carregar o CSV.
+    """
+    tipo = df[coluna].dtype
+    if isinstance(tipo, pd.CategoricalDtype):
+        if pd.notna(valor) and valor not in tipo.categories:
+            df[coluna] = df[coluna].cat.add_categories([valor])
+    elif tipo.kind in "iu":
+        return tipo.type(0 if pd.isna(valor) else int(float(valor)))
+    elif tipo.kind == "f":
+        return tipo.type(valor)
+    return valor
+
+
+def definir_valor(df, rotulo, coluna, valor):
+    """df.loc[rotulo, coluna] = valor, mantendo o tipo da coluna."""
+    df.loc[rotulo, coluna] = _preparar_valor(df, coluna, valor)
+
+
+def definir_valores(df, rotulo, valores):
+    """
+    Grava várias colunas de uma linha numa única atribuição (valores é um
+    dict coluna -> valor), com as mesmas regras de definir_valor.
+    """
+    df.loc[rotulo, list(valores)] = [
+        _preparar_valor(df, coluna, valor) for coluna, valor in valores.items()
+    ]
+
+
+def converter_campos_usuario(textos):
+    """
+    Converte o texto digitado nos campos de um usuário (dict coluna -> texto)
+    para os valores da tabela. Levanta ValueError, com a mensagem para o
+    usuário, no primeiro campo inválido; nada é gravado aqui, então uma
+    edição recusada não deixa a linha pela metade.
+    """
+    valores = {}
+    for col, texto in textos.items():
+        texto = str(texto).strip()
+        if col in COLUNAS_PROVAS or col == "IDADE":
+            try:
+                numero = float(texto.replace(",", ".")) if texto else 0.0
+            except ValueError:
+                raise ValueError(f"O campo '{col}' deve ser um número.") from None
+            if col == "IDADE":
+                if numero < 0 or numero % 1:
+                    raise ValueError("A IDADE deve ser um número inteiro positivo.")
+                numero = int(numero)
+            elif not NOTA_MINIMA <= numero <= NOTA_MAXIMA:
+                raise ValueError(
+                    f"A nota {col} deve estar entre {NOTA_MINIMA:g} e {NOTA_MAXIMA:g}."
+                )
+            valores[col] = numero
+        elif col in ("NOME", "NIVEL", "CURSO"):
+            valores[col] = texto.upper()
+        elif col == "EMAIL":
+            valores[col] = texto.lower()
+        else:
+            valores[col] = texto
+    return valores
+
+
+class UsuarioAmbiguo(Exception):
+    """O texto informado corresponde a mais de um usuário."""
+
+    def __init__(self, texto, ids):
+        super().__init__(
+            f"'{texto}' corresponde a {len(ids)} usuários (IDs: "
+            f"{', '.join(str(i) for i in ids)})."
+        )
+        self.ids = ids
+
+
+class IndiceUsuarios:
+    """
+    E-mail e nome normalizados -> IDs, e ID -> rótulo da linha no DataFrame.
+
+    É montado uma vez na carga (reconstruir) e mantido pelo App a cada
+    inserção, edição e exclusão (inserir/atualizar/remover), sem varrer a
+    tabela. Se um rótulo não bater mais com o ID (DataFrame renumerado por
+    fora), o mapa ID -> rótulo é refeito na hora.
+    """
+
+    def __init__(self, df=None):
+        self.reconstruir(df)
+
+    def reconstruir(self, df):
+        self._por_email = {}
+        self._por_nome = {}
+        self._chaves = {}
+        self._rotulos = {}
+        if df is None or df.empty:
+            return
+        ids = df["ID"].tolist()
+        emails = [normalizar_email(v) for v in df["EMAIL"].tolist()]
+        nomes = [normalizar_nome(v) for v in df["NOME"].tolist()]
+        self._por_email = _mapa_de_chaves(emails, ids)
+        self._por_nome = _mapa_de_chaves(nomes, ids)
+        self._chaves = dict(zip(ids, zip(emails, nomes)))
+        self._rotulos = dict(zip(ids, df.index.tolist()))
+
+    def _adicionar_chaves(self, user_id, email, nome):
+        _adicionar(self._por_email, email, user_id)
+        _adicionar(self._por_nome, nome, user_id)
+        self._chaves[user_id] = (email, nome)
+
+    def _remover_chaves(self, user_id):
+        chaves = self._chaves.pop(user_id, None)
+        if chaves is None:
+            return
+        email, nome = chaves
+        _remover(self._por_email, email, user_id)
+        _remover(self._por_nome, nome, user_id)
+
+    def _chaves_da_linha(self, df, user_id):
+        rotulo = self.rotulo(df, user_id)
+        return (
+            normalizar_email(df.at[rotulo, "EMAIL"]),
+            normalizar_nome(df.at[rotulo, "NOME"]),
+        )
+
+    # --- Manutenção (chamada pelo App depois de alterar o DataFrame) ---
+    def inserir(self, df, user_id):
+        user_id = int(user_id)
+        # A linha nova é a última (anexar_linhas)
+        if int(df["ID"].iat[-1]) == user_id:
+            self._rotulos[user_id] = df.index[-1]
+        else:
+            self._rotulos.pop(user_id, None)
+        self._adicionar_chaves(user_id, *self._chaves_da_linha(df, user_id))
+
+    def atualizar(self, df, user_id):
+        user_id = int(user_id)
+        self._remover_chaves(user_id)
+        self._adicionar_chaves(user_id, *self._chaves_da_linha(df, user_id))
+
+    def remover(self, user_id):
+        """Tira o ID dos índices e devolve o rótulo que a linha tinha (ou None)."""
+        user_id = int(user_id)
+        self._remover_chaves(user_id)
+        return self._rotulos.pop(user_id, None)
+
+    # --- Consultas ---
+    def rotulo(self, df, user_id):
+        """Rótulo (para df.loc/df.at) da linha do ID, ou None se ele não existe."""
+        user_id = int(user_id)
+        rotulo = self._rotulos.get(user_id)
+        if rotulo is not None:
+            if rotulo in df.index and df.at[rotulo, "ID"] == user_id:
+                return rotulo
+        elif len(self._rotulos) == len(df):
+            return None  # O mapa está completo: o ID não existe
+        # Rótulo ausente ou desatualizado: refaz o mapa a partir do DataFrame
+        self._rotulos = dict(zip(df["ID"].tolist(), df.index.tolist()))
+        return self._rotulos.get(user_id)
+
+    def linha(self, df, user_id):
+        """Linha (Series) do ID, ou None se ele não existe."""
+        rotulo = self.rotulo(df, user_id)
+        return None if rotulo is None else df.loc[rotulo]
+
+    def rotulos(self, df, ids):
+        """Rótulos dos IDs (na ordem pedida); None para IDs inexistentes."""
+        return [self.rotulo(df, user_id) for user_id in ids]
+
+    def get_many(self, df, ids):
+        """Linhas dos IDs (na ordem pedida); IDs inexistentes são ignorados."""
+        rotulos = self.rotulos(df, ids)
+        return df.loc[[r for r in rotulos if r is not None]]
+
+    def ids_por_email(self, email):
+        return _ids(self._por_email, normalizar_email(email))
+
+    def buscar_ids(self, texto):
+        """IDs cujo e-mail ou nome (normalizados) são iguais ao texto."""
+        if not str(texto).strip():
+            return []
+        ids = set(_ids(self._por_email, normalizar_email(texto)))
+        ids.update(_ids(self._por_nome, normalizar_nome(texto)))
+        return sorted(ids)
+
+    def buscar_usuario(self, df, texto):
+        """
+        Linha (Series) do usuário pelo e-mail ou nome, ou None se não existe.
+
+        Levanta UsuarioAmbiguo se mais de um usuário tiver esse e-mail/nome.
+        """
+        ids = self.buscar_ids(texto)
+        if not ids:
+            return None
+        if len(ids) > 1:
+            raise UsuarioAmbiguo(texto, ids)
+        return self.linha(df, ids[0])
+
+
+# === PROJEÇÕES POR NÍVEL
+# Colunas que cada nível não vê na tabela principal
+COLUNAS_OCULTAS_POR_NIVEL = {
+    "ALUNO": ["STATUS DO ALUNO", "SENHA", "ID_TURMAS", "EMAIL", "IDADE", "NIVEL"],
+    "PROFESSOR": ["SENHA", "ID_TURMAS"],
+    "COORDENADOR": ["SENHA", "NP1", "NP2", "PIM", "ID_TURMAS"],
+    "ADMINISTRADOR": ["SENHA"],
+}
+# Linhas que cada nível vê, pelo NIVEL do usuário da linha (None = todas).
+# O ALUNO vê só a própria linha.
+NIVEIS_VISIVEIS = {
+    "PROFESSOR": ("ALUNO",),
+    "COORDENADOR": ("ALUNO", "PROFESSOR", "COORDENADOR"),
+}
+
+
+class ProjecaoNivel:
+    """
+    Linhas (rótulos) e colunas de data_frame_full que um nível enxerga.
+
+    Guarda só os rótulos, sem copiar dados: é montada uma vez por carga e
+    atualizada linha a linha pelo App (inserir/atualizar/remover). Quem
+    exibe faz um único df.loc[rotulos, colunas] com o resultado final.
+    """
+
+    def __init__(self, nivel, user_id=None):
+        self.nivel = nivel
+        self.user_id = user_id
+        self._ocultas = set(COLUNAS_OCULTAS_POR_NIVEL.get(nivel, []))
+        self._rotulos = {}  # dict como conjunto ordenado (ordem da tabela)
+        self._indice = None
+
+    def _visivel(self, df, rotulo):
+        if self.nivel == "ALUNO":
+            return df.at[rotulo, "ID"] == self.user_id
+        niveis = NIVEIS_VISIVEIS.get(self.nivel)
+        return niveis is None or df.at[rotulo, "NIVEL"] in niveis
+
+    def reconstruir(self, df):
+        if self.nivel == "ALUNO":
+            visiveis = df["ID"] == self.user_id
+        elif NIVEIS_VISIVEIS.get(self.nivel) is None:
+            visiveis = None
+        else:
+            visiveis = df["NIVEL"].isin(NIVEIS_VISIVEIS[self.nivel])
+        rotulos = df.index if visiveis is None else df.index[visiveis.to_numpy()]
+        self._rotulos = dict.fromkeys(rotulos.tolist())
+        self._indice = None
+        return self
+
+    def inserir(self, df, rotulo):
+        if rotulo is not None and self._visivel(df, rotulo):
+            self._rotulos[rotulo] = None
+            self._indice = None
+
+    def atualizar(self, df, rotulo):
+        if rotulo is None:
+            return
+        # O NIVEL pode ter mudado: a linha entra ou sai da projeção
+        visivel = self._visivel(df, rotulo)
+        if visivel != (rotulo in self._rotulos):
+            if visivel:
+                # Volta para a posição certa (rótulos crescem com a tabela)
+                self._rotulos = dict.fromkeys(sorted([*self._rotulos, rotulo]))
+            else:
+                del self._rotulos[rotulo]
+            self._indice = None
+
+    def remover(self, rotulo):
+        if rotulo in self._rotulos:
+            del self._rotulos[rotulo]
+            self._indice = None
+
+    def rotulos(self):
+        """pd.Index com os rótulos visíveis (montado só depois de alterações)."""
+        if self._indice is None:
+            self._indice = pd.Index(list(self._rotulos))
+        return self._indice
+
+    def colunas(self, df):
+        return [col for col in df.columns if col not in self._ocultas]
+
+
+# === BUSCA POR TRECHO (TRIGRAMAS)
+# Cada trigrama vira um inteiro de 63 bits: 21 bits por caractere Unicode
+LARGURA_VETORIZADA = 64
+
+
+def texto_minusculo(serie):
+    """Coluna como texto em minúsculas; vazios (NaN/None) viram ""."""
+    return serie.astype(object).where(serie.notna(), "").astype(str).str.lower()
+
+
+def _codigo_trigrama(trecho):
+    return (ord(trecho[0]) << 42) | (ord(trecho[1]) << 21) | ord(trecho[2])
+
+
+def _codigos_texto(texto):
+    return {_codigo_trigrama(texto[i : i + 3]) for i in range(len(texto) - 2)}
+
+
+def _pares_trigrama_linha(valores):
+    """(códigos, posições) de todos os trigramas de todos os valores."""
+    comprimentos = np.fromiter(map(len, valores), dtype=np.int64, count=len(valores))
+    curtos = np.flatnonzero(comprimentos <= LARGURA_VETORIZADA)
+    codigos, posicoes = [], []
+    if len(curtos):
+        # Valores até 64 caracteres: matriz de code points (UCS-4) e os
+        # trigramas de todas as linhas de uma vez
+        matriz = np.array([valores[i] for i in curtos])
+        largura = matriz.dtype.itemsize // 4
+        pontos = matriz.view(np.int32).reshape(len(curtos), largura).astype(np.int64)
+        if largura >= 3:
+            trigramas = (pontos[:, :-2] << 42) | (pontos[:, 1:-1] << 21) | pontos[:, 2:]
+            validos = pontos[:, 2:] != 0
+            linhas = np.broadcast_to(curtos[:, None], trigramas.shape)
+            codigos.append(trigramas[validos])
+            posicoes.append(linhas[validos])
+    for i in np.flatnonzero(comprimentos > LARGURA_VETORIZADA):
+        codigos_longos = list(_codigos_texto(valores[i]))
+        codigos.append(np.array(codigos_longos, dtype=np.int64))
+        posicoes.append(np.full(len(codigos_longos), i, dtype=np.int64))
+    if not codigos:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(codigos), np.concatenate(posicoes)
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas de uma coluna (texto em minúsculas).
+
+    buscar(termo) pega as listas de linhas de cada trigrama do termo, faz a
+    interseção e só confere o texto das candidatas. Termos com menos de três
+    caracteres varrem os valores já convertidos (sem refazer o lower()).
+
+    A base é montada uma vez (arrays ordenados por trigrama); edições ficam
+    num pequeno registro à parte (pendentes/invalidados) até o índice ser
+    remontado, quando precisa_reconstruir fica True.
+    """
+
+    def __init__(self, serie):
+        self._valores = texto_minusculo(serie).tolist()
+        self._rotulos_base = serie.index.to_numpy()
+        self._posicao_base = pd.Index(self._rotulos_base)
+        codigos, posicoes = _pares_trigrama_linha(self._valores)
+        # Ordena por trigrama e, dentro de cada um, pela linha (a interseção
+        # usa busca binária nas listas)
+        ordem = np.lexsort((posicoes, codigos))
+        codigos = codigos[ordem]
+        posicoes = posicoes[ordem]
+        # Um trigrama repetido no mesmo texto conta uma vez só
+        unicos = np.r_[
+            True, (codigos[1:] != codigos[:-1]) | (posicoes[1:] != posicoes[:-1])
+        ]
+        codigos = codigos[unicos]
+        self._posicoes = posicoes[unicos]
+        inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+        self._codigos = codigos[inicios]
+        self._limites = np.r_[inicios, len(codigos)]
+        # Edições desde a montagem: rótulo -> texto atual, e linhas da base
+        # cujo texto não vale mais
+        self._pendentes = {}
+        self._invalidadas = set()
+
+    @property
+    def precisa_reconstruir(self):
+        alteradas = len(self._pendentes) + len(self._invalidadas)
+        return alteradas > max(1000, len(self._valores) // 100)
+
+    def _invalidar(self, rotulo):
+        if rotulo in self._posicao_base:
+            self._invalidadas.add(self._posicao_base.get_loc(rotulo))
+
+    def atualizar(self, rotulo, valor):
+        """Registra o valor novo da linha (inserção ou edição)."""
+        self._invalidar(rotulo)
+        # Vazio (NaN) não casa com nenhum termo, como no str.contains(na=False)
+        self._pendentes[rotulo] = "" if pd.isna(valor) else str(valor).lower()
+
+    def remover(self, rotulo):
+        self._invalidar(rotulo)
+        self._pendentes.pop(rotulo, None)
+
+    def _linhas_do_trigrama(self, codigo):
+        i = np.searchsorted(self._codigos, codigo)
+        if i == len(self._codigos) or self._codigos[i] != codigo:
+            return None
+        return self._posicoes[self._limites[i] : self._limites[i + 1]]
+
+    def _candidatas(self, termo):
+        listas = []
+        for codigo in _codigos_texto(termo):
+            linhas = self._linhas_do_trigrama(codigo)
+            if linhas is None:
+                return np.empty(0, dtype=np.int64)
+            listas.append(linhas)
+        # Parte da lista mais curta e procura cada candidata nas outras
+        listas.sort(key=len)
+        candidatas = listas[0]
+        for linhas in listas[1:]:
+            if not len(candidatas):
+                break
+            i = np.minimum(np.searchsorted(linhas, candidatas), len(linhas) - 1)
+            candidatas = candidatas[linhas[i] == candidatas]
+        return candidatas
+
+    def estimar(self, termo):
+        """Limite superior barato do número de linhas que contêm o termo."""
+        termo = str(termo).lower()
+        if len(termo) < 3:
+            return len(self._valores) + len(self._pendentes)
+        menor = len(self._valores)
+        for codigo in _codigos_texto(termo):
+            linhas = self._linhas_do_trigrama(codigo)
+            menor = min(menor, 0 if linhas is None else len(linhas))
+        return menor + len(self._pendentes)
+
+    def refinar(self, rotulos, termo):
+        """
+        Dos rótulos de uma busca anterior, os que contêm o termo. Serve para
+        quando o termo novo só estende o anterior: confere apenas o texto
+        dessas linhas, sem consultar as listas de trigramas.
+        """
+        termo = str(termo).lower()
+        valores = self._valores
+        pendentes = self._pendentes
+        posicoes = self._posicao_base.get_indexer(rotulos).tolist()
+        manter = np.zeros(len(posicoes), dtype=bool)
+        for k, (rotulo, i) in enumerate(zip(rotulos.tolist(), posicoes)):
+            if rotulo in pendentes:
+                manter[k] = termo in pendentes[rotulo]
+            elif i >= 0 and i not in self._invalidadas:
+                manter[k] = termo in valores[i]
+        return rotulos[manter]
+
+    def buscar(self, termo):
+        """Rótulos das linhas cujo texto contém o termo (sem diferenciar caixa)."""
+        termo = str(termo).lower()
+        valores = self._valores
+        if len(termo) < 3:
+            posicoes = [i for i, valor in enumerate(valores) if termo in valor]
+        else:
+            candidatas = self._candidatas(termo).tolist()
+            posicoes = [i for i in candidatas if termo in valores[i]]
+        if self._invalidadas:
+            posicoes = [i for i in posicoes if i not in self._invalidadas]
+        rotulos = self._rotulos_base[np.asarray(posicoes, dtype=np.int64)]
+        extras = [r for r, valor in self._pendentes.items() if termo in valor]
+        if extras:
+            rotulos = np.concatenate([rotulos, np.asarray(extras, dtype=rotulos.dtype)])
+        return rotulos
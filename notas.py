@@ -0,0 +1,171 @@
+"""
+Cálculo da MEDIA do Sistema Acadêmico.
+
+Toda MEDIA (leitura do CSV, cadastro e edição de notas) sai de um único
+MotorNotas, com pesos e arredondamento configuráveis por curso. O cálculo é
+vetorizado: qualquer conjunto de linhas é recalculado numa passada do NumPy.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_PROVAS = ["NP1", "NP2", "PIM"]
+PESOS_PADRAO = {"NP1": 4, "NP2": 4, "PIM": 2}
+CASAS_PADRAO = 2
+# "proximo": como o .round() de sempre (empate vai para o par)
+# "meio_acima": empate sobe (6,995 -> 7,00)
+ARREDONDAMENTOS = ("proximo", "meio_acima")
+
+
+class PoliticaNotas:
+    """Pesos de NP1/NP2/PIM e arredondamento da MEDIA de um curso."""
+
+    def __init__(self, pesos=None, casas=CASAS_PADRAO, arredondamento="proximo"):
+        pesos = dict(PESOS_PADRAO if pesos is None else pesos)
+        desconhecidas = set(pesos) - set(COLUNAS_PROVAS)
+        if desconhecidas:
+            raise ValueError(f"Notas desconhecidas: {sorted(desconhecidas)}")
+        if any(peso < 0 for peso in pesos.values()) or not sum(pesos.values()):
+            raise ValueError("Os pesos devem ser positivos e não podem somar zero.")
+        if arredondamento not in ARREDONDAMENTOS:
+            raise ValueError(f"Arredondamento desconhecido: {arredondamento}")
+        self.pesos = [float(pesos.get(col, 0)) for col in COLUNAS_PROVAS]
+        self.casas = int(casas)
+        self.arredondamento = arredondamento
+
+    def descricao(self):
+        return {
+            "pesos": dict(zip(COLUNAS_PROVAS, self.pesos)),
+            "casas": self.casas,
+            "arredondamento": self.arredondamento,
+        }
+
+
+class MotorNotas:
+    """
+    Calcula a MEDIA com a política do curso de cada linha (ou a padrão).
+
+    recalcular() grava a MEDIA no próprio DataFrame e devolve os rótulos cuja
+    MEDIA mudou, marcando-os em um RegistroAlteracoes quando informado, para
+    que só essas linhas sejam salvas.
+    """
+
+    def __init__(self, padrao=None):
+        self.padrao = padrao or PoliticaNotas()
+        self.por_curso = {}
+        self._assinatura = None
+
+    def definir_politica(self, curso, politica):
+        """Política de um curso (curso=None troca a padrão; politica=None remove)."""
+        if curso is None:
+            self.padrao = politica or PoliticaNotas()
+        elif politica is None:
+            self.por_curso.pop(curso, None)
+        else:
+            self.por_curso[curso] = politica
+        self._assinatura = None
+
+    def assinatura(self):
+        """Texto que muda sempre que alguma política muda (chave de cache)."""
+        if self._assinatura is None:
+            self._assinatura = json.dumps(
+                {
+                    "padrao": self.padrao.descricao(),
+                    "cursos": {
+                        curso: politica.descricao()
+                        for curso, politica in sorted(self.por_curso.items())
+                    },
+                },
+                sort_keys=True,
+            )
+        return self._assinatura
+
+    def _politica_por_linha(self, df):
+        """Índice da política de cada linha: 0 = padrão, 1.. = por_curso."""
+        if not self.por_curso or "CURSO" not in df.columns:
+            return None
+        cursos = pd.Index(list(self.por_curso))
+        serie = df["CURSO"]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Uma busca por categoria em vez de uma por linha
+            por_categoria = np.append(cursos.get_indexer(serie.cat.categories), -1)
+            return por_categoria[serie.cat.codes.to_numpy()] + 1
+        return cursos.get_indexer(serie.astype(object)) + 1
+
+    def calcular(self, df):
+        """Array com a MEDIA de cada linha de df (NP1, NP2 e PIM obrigatórias)."""
+        notas = [
+            df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            for col in COLUNAS_PROVAS
+        ]
+        politicas = [self.padrao, *self.por_curso.values()]
+        linha_politica = self._politica_por_linha(df)
+
+        if linha_politica is None:
+            p = self.padrao
+            soma = notas[0] * p.pesos[0] + notas[1] * p.pesos[1] + notas[2] * p.pesos[2]
+            media = soma / sum(p.pesos)
+            fator = 10.0**p.casas
+            meio_acima = p.arredondamento == "meio_acima"
+        else:
+            pesos = np.array([p.pesos for p in politicas])[linha_politica]
+            soma = (
+                notas[0] * pesos[:, 0] + notas[1] * pesos[:, 1] + notas[2] * pesos[:, 2]
+            )
+            media = soma / pesos.sum(axis=1)
+            fator = (10.0 ** np.array([p.casas for p in politicas]))[linha_politica]
+            meio_acima = np.array(
+                [p.arredondamento == "meio_acima" for p in politicas]
+            )[linha_politica]
+
+        # Mesmo cálculo do np.round(); o ajuste mínimo evita que 6,995 * 100
+        # (= 699,4999...) desça no "meio_acima"
+        proximo = np.rint(media * fator) / fator
+        if not np.any(meio_acima):
+            return proximo
+        acima = np.floor(media * fator + 0.5 + 1e-9) / fator
+        return np.where(meio_acima, acima, proximo)
+
+    def recalcular(self, df, rotulos=None, alteracoes=None):
+        """
+        Recalcula a MEDIA das linhas `rotulos` (todas, se None) no próprio df.
+        Devolve o pd.Index dos rótulos cuja MEDIA mudou.
+        """
+        if not all(col in df.columns for col in COLUNAS_PROVAS):
+            return pd.Index([])
+        # Mantém float32 (tipos compactos); qualquer outro tipo vira float64
+        # (ex.: a MEDIA 0 de uma linha recém-montada)
+        tipo = np.dtype(np.float64)
+        if "MEDIA" in df.columns:
+            if df["MEDIA"].dtype == np.float32:
+                tipo = df["MEDIA"].dtype
+            elif df["MEDIA"].dtype != tipo:
+                df["MEDIA"] = pd.to_numeric(df["MEDIA"], errors="coerce").astype(tipo)
+
+        linhas = df if rotulos is None else df.loc[rotulos]
+        novas = self.calcular(linhas).astype(tipo)
+        if "MEDIA" in df.columns:
+            antigas = linhas["MEDIA"].to_numpy()
+            mudaram = (novas != antigas) & ~(np.isnan(novas) & np.isnan(antigas))
+        else:
+            mudaram = np.ones(len(linhas), dtype=bool)
+
+        if rotulos is None:
+            df["MEDIA"] = novas
+        elif mudaram.any():
+            df.loc[linhas.index[mudaram], "MEDIA"] = novas[mudaram]
+        alteradas = linhas.index[mudaram]
+        if alteracoes is not None and "ID" in df.columns and len(alteradas):
+            alteracoes.marcar_atualizados(df.loc[alteradas, "ID"].tolist())
+        return alteradas
+
+    def recalcular_todos(self, df, alteracoes=None):
+        """Recalcula a tabela inteira (ex.: depois de mudar uma política)."""
+        return self.recalcular(df, None, alteracoes)
+
+
+# Motor usado pela leitura do CSV e pelo App; as políticas por curso são
+# definidas por quem usa (SistemaGerenc.POLITICAS_NOTAS)
+motor_notas = MotorNotas()
@@ -24,9 +24,11 @@
     #include <windows.h>
     #include <direct.h>
     #include <conio.h>
+    #include <sys/stat.h>
     #define MKDIR(p) _mkdir(p)
     #define PATH_SEP "\\"
     #define STRCASECMP _stricmp
+    #define ESPERAR_MS(ms) Sleep(ms)
 #else
     #include <unistd.h>
     #include <sys/stat.h>
@@ -34,9 +36,17 @@
     #define MKDIR(p) mkdir((p), 0700)
     #define PATH_SEP "/"
     #define STRCASECMP strcasecmp
+    #define ESPERAR_MS(ms) usleep((ms) * 1000)
 #endif
 
 #define ARQ_SISTEMA "sistemaAcademico.csv"
+/* Ultimo ID entregue, compartilhado com o App em Python (SequenciaIDs em
+   armazenamento.py): os dois usam o caminho da variavel de ambiente
+   SISTEMA_ACADEMICO_SEQ ou, sem ela, o mesmo padrao, relativo a pasta em que
+   sao executados. A trava e o mesmo caminho com ".lock". */
+#define VAR_SEQUENCIA "SISTEMA_ACADEMICO_SEQ"
+#define DIR_SEQUENCIA_PADRAO "Output"
+#define ARQ_SEQUENCIA_PADRAO DIR_SEQUENCIA_PADRAO PATH_SEP "SistemaAcademico.csv.seq"
 #define DIR_BACKUPS "backups"
 #define MAX_LINE 2048
 
@@ -67,6 +77,7 @@ int parseLinhaUsuario(const char *line, UsuarioCSV *u);
 void formatarLinhaUsuario(const UsuarioCSV *u, char *out, size_t outsz);
 int verificarLoginUnico(const char *email, const char *senha, UsuarioCSV *out);
 int obterUltimoIDUsuarios(void);
+int reservarIDsUsuarios(int quantidade);
 int emailDuplicado(const char *email);
 int adicionarUsuario(const UsuarioCSV *u_in);
 int listarTodosUsuarios(void);
@@ -298,6 +309,68 @@ int obterUltimoIDUsuarios(void) {
     return maxID;
 }
 
+/* Caminho do arquivo .seq (variavel de ambiente ou padrao compartilhado). */
+static const char *arquivoSequencia(void) {
+    const char *caminho = getenv(VAR_SEQUENCIA);
+    if (caminho && *caminho) return caminho;
+    if (!arquivoExiste(DIR_SEQUENCIA_PADRAO)) MKDIR(DIR_SEQUENCIA_PADRAO);
+    return ARQ_SEQUENCIA_PADRAO;
+}
+
+/* Trava entre processos: so quem conseguiu criar o arquivo (modo "wx") segue. */
+static int travarSequencia(const char *trava) {
+    int tentativa;
+    for (tentativa = 0; tentativa < 500; tentativa++) {
+        FILE *f = fopen(trava, "wx");
+        if (f) { fputs("c\n", f); fclose(f); return 1; }
+        /* trava esquecida por um processo que caiu (mais de 30 s) */
+        struct stat st;
+        if (stat(trava, &st) == 0 && difftime(time(NULL), st.st_mtime) > 30) {
+            remove(trava);
+            continue;
+        }
+        ESPERAR_MS(10);
+    }
+    return 0;
+}
+
+/* Reserva "quantidade" IDs seguidos e devolve o primeiro (-1 em caso de erro).
+   Le e grava so o arquivo .seq, sem percorrer o CSV (exceto na primeira vez). */
+int reservarIDsUsuarios(int quantidade) {
+    if (quantidade < 1) return -1;
+    const char *seq = arquivoSequencia();
+    char trava[512], tmp[512];
+    snprintf(trava, sizeof(trava), "%s.lock", seq);
+    snprintf(tmp, sizeof(tmp), "%s.tmp", seq);
+    if (!travarSequencia(trava)) return -1;
+
+    int ultimo = -1;
+    FILE *f = fopen(seq, "r");
+    if (f) {
+        if (fscanf(f, "%d", &ultimo) != 1) ultimo = -1;
+        fclose(f);
+    }
+    if (ultimo < 0) ultimo = obterUltimoIDUsuarios(); /* sequencia ainda nao existe */
+
+    /* grava num temporario e renomeia, para nunca deixar o .seq pela metade */
+    f = fopen(tmp, "w");
+    if (!f) { remove(trava); return -1; }
+    fprintf(f, "%d\n", ultimo + quantidade);
+    fflush(f);
+    fclose(f);
+#ifdef _WIN32
+    /* rename nao sobrescreve no Windows; MoveFileEx troca o arquivo de uma vez */
+    if (!MoveFileExA(tmp, seq, MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH)) {
+        remove(trava); return -1;
+    }
+#else
+    if (rename(tmp, seq) != 0) { remove(trava); return -1; }
+#endif
+
+    remove(trava);
+    return ultimo + 1;
+}
+
 int emailDuplicado(const char *email) {
     if (!email || !arquivoExiste(ARQ_SISTEMA)) return 0;
     FILE *f = fopen(ARQ_SISTEMA, "r");
@@ -326,7 +399,8 @@ int adicionarUsuario(const UsuarioCSV *u_in) {
     if (!validarEmail(u_in->email)) { printf("Email invalido.\n"); return 0; }
     if (emailDuplicado(u_in->email)) { printf("Email ja cadastrado.\n"); return 0; }
 
-    int novoID = obterUltimoIDUsuarios() + 1;
+    int novoID = reservarIDsUsuarios(1);
+    if (novoID < 0) { printf("Erro ao reservar um novo ID.\n"); return 0; }
     UsuarioCSV u = *u_in;
     u.id = novoID;
     if (!u.atividade[0]) strncpy(u.atividade, "Ativo", sizeof(u.atividade)-1); u.atividade[sizeof(u.atividade)-1]=0;
@@ -0,0 +1,16 @@
+"""Configuração comum dos testes: módulos do projeto no sys.path e tabelas de exemplo."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import gerar_tabela_sintetica  # noqa: E402
+
+
+@pytest.fixture
+def tabela():
+    """Tabela de usuários pequena, com as colunas internas do App."""
+    return gerar_tabela_sintetica(200)
@@ -0,0 +1,47 @@
+"""Estatísticas de MEDIA por turma (agregados.py) contra o cálculo do NumPy."""
+
+import numpy as np
+import pytest
+
+from agregados import AgregadosTurmas, ResumoTurmas
+from notas import MotorNotas, PoliticaNotas
+
+QUANTIS = [0.5, 0.1, 0.9]
+
+
+@pytest.fixture
+def tres_casas(tabela):
+    """MEDIA com 3 casas, algumas fora de 0 a 10."""
+    tabela["MEDIA"] = MotorNotas(PoliticaNotas(casas=3)).calcular(tabela)
+    tabela.loc[tabela.index[:3], "MEDIA"] = [-1.0, 10.5, 12.25]
+    return tabela
+
+
+def _conferir(resumos, df):
+    alunos = df[df["NIVEL"] == "ALUNO"]
+    for turma, notas in alunos.groupby("ID_TURMAS", observed=True)["MEDIA"]:
+        e = resumos[str(turma)]
+        assert np.allclose(e.quantis(QUANTIS), np.quantile(notas, QUANTIS))
+        assert np.isclose(e.taxa_aprovacao, (notas >= 7).mean() * 100)
+        faixas = np.clip(np.floor(notas.to_numpy()).astype(int), 0, 9)
+        assert e.histograma() == np.bincount(faixas, minlength=10).tolist()
+
+
+def test_resumo_em_blocos_exato_com_tres_casas(tres_casas):
+    _conferir(ResumoTurmas().adicionar(tres_casas).turmas, tres_casas)
+
+
+def test_agregados_exatos_com_tres_casas_depois_de_editar(tres_casas):
+    agregados = AgregadosTurmas().reconstruir(tres_casas)
+    rng = np.random.default_rng(3)
+    coluna_media = tres_casas.columns.get_loc("MEDIA")
+    for rotulo in rng.choice(tres_casas.index.to_numpy(), 50):
+        tres_casas.iat[rotulo, coluna_media] = round(rng.uniform(0, 10), 3)
+        agregados.atualizar(tres_casas, rotulo)
+    _conferir(agregados.turmas, tres_casas)
+
+
+def test_duas_casas_em_float32_cabem_no_histograma(tabela):
+    tabela["MEDIA"] = MotorNotas().calcular(tabela).astype(np.float32)
+    turmas = AgregadosTurmas().reconstruir(tabela).turmas.values()
+    assert not any(e.fora for e in turmas)
@@ -0,0 +1,250 @@
+"""Persistência dos usuários (armazenamento.py)."""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import armazenamento as modulo_armazenamento
+from armazenamento import (
+    VARIAVEL_SEQUENCIA,
+    ArmazenamentoBase,
+    ArmazenamentoCSV,
+    CacheTabela,
+    GravadorEmSegundoPlano,
+    RegistroAlteracoes,
+    SequenciaIDs,
+)
+from armazenamento_sqlite import ArmazenamentoSQLite
+from benchmarks import gerar_tabela_sintetica
+from indices import anexar_linhas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("conteudo", ["corrompido", "", "-3\n"])
+def test_sequencia_corrompida_recomeca_do_maior_id(tmp_path, conteudo):
+    sequencia = SequenciaIDs(str(tmp_path / "usuarios.csv"))
+    with open(sequencia.caminho, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    assert list(sequencia.reservar(2, lambda: 10)) == [11, 12]
+    assert sequencia.ultimo() == 12
+
+
+def test_sequencia_compartilhada_vem_da_variavel_de_ambiente(tmp_path, monkeypatch):
+    caminho = tmp_path / "ids" / "compartilhada.seq"
+    monkeypatch.setenv(VARIAVEL_SEQUENCIA, str(caminho))
+    assert list(SequenciaIDs().reservar(3, lambda: 0)) == [1, 2, 3]
+    assert caminho.read_text(encoding="utf-8") == "3\n"
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="sem compilador C")
+def test_sequencia_compartilhada_com_o_programa_em_c(tmp_path, monkeypatch):
+    fonte = tmp_path / "reservar.c"
+    fonte.write_text(
+        '#include "sistemaAcademico_unificado.h"\n'
+        'int main(void) { printf("%d", reservarIDsUsuarios(5)); return 0; }\n'
+    )
+    programa = tmp_path / "reservar"
+    subprocess.run(
+        ["gcc", "-w", "-I", RAIZ, "-o", str(programa), str(fonte)], check=True
+    )
+    monkeypatch.setenv(VARIAVEL_SEQUENCIA, str(tmp_path / "usuarios.seq"))
+    sequencia = SequenciaIDs()
+    assert list(sequencia.reservar(2, lambda: 100)) == [101, 102]
+
+    saida = subprocess.run(
+        [str(programa)], cwd=tmp_path, capture_output=True, text=True, check=True
+    )
+    assert saida.stdout == "103"
+    assert list(sequencia.reservar(1)) == [108]
+
+
+def test_falha_do_snapshot_e_registrada_sem_deixar_temporario(
+    tmp_path, monkeypatch, caplog, tabela
+):
+    def falhar(origem, destino):
+        raise PermissionError("sem permissão")
+
+    monkeypatch.setattr(modulo_armazenamento.os, "replace", falhar)
+    cache = CacheTabela(usar_snapshot=True)
+    cache._agendar_snapshot(str(tmp_path / "dados.csv"), tabela, (1, 2), "hash")
+    erros = cache.aguardar_snapshots()
+    assert [type(e) for e in erros] == [PermissionError]
+    assert "Falha ao gravar o snapshot" in caplog.text
+    assert os.listdir(tmp_path) == []
+    assert cache.aguardar_snapshots() == []
+
+
+def test_backend_sem_gravar_falha_ao_ser_criado():
+    class BackendIncompleto(ArmazenamentoBase):
+        def carregar(self):
+            return None
+
+    with pytest.raises(TypeError):
+        BackendIncompleto()
+
+
+# === GRAVAÇÃO EM LOTE
+BACKENDS = {
+    "csv": lambda pasta: ArmazenamentoCSV(str(pasta / "usuarios.csv")),
+    "diario": lambda pasta: ArmazenamentoCSV(
+        str(pasta / "usuarios.csv"), usar_diario=True
+    ),
+    "sqlite": lambda pasta: ArmazenamentoSQLite(str(pasta / "usuarios.db")),
+}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def armazenamento(request, tmp_path, tabela):
+    """Backend com a tabela já gravada; conta as chamadas de _gravar."""
+    backend = BACKENDS[request.param](tmp_path)
+    backend.salvar(tabela)
+    backend.gravacoes = 0
+    gravar = backend._gravar
+
+    def contar(df, alteracoes):
+        backend.gravacoes += 1
+        return gravar(df, alteracoes)
+
+    backend._gravar = contar
+    return backend
+
+
+def _editar(df, rotulo, nota):
+    df.loc[rotulo, "NP1"] = nota
+    alteracoes = RegistroAlteracoes()
+    alteracoes.marcar_atualizado(df.at[rotulo, "ID"])
+    return alteracoes
+
+
+def _conferir_gravado(armazenamento, esperado):
+    colunas = ["ID", "EMAIL", "NP1"]
+    gravado = armazenamento.carregar()
+    pd.testing.assert_frame_equal(
+        gravado[colunas].sort_values("ID").reset_index(drop=True),
+        esperado[colunas].sort_values("ID").reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_lote_grava_varias_edicoes_uma_vez(armazenamento, tabela):
+    with armazenamento.lote():
+        for rotulo, nota in [(3, 1.5), (10, 2.5), (3, 9.75)]:
+            armazenamento.salvar(tabela, _editar(tabela, rotulo, nota))
+    assert armazenamento.gravacoes == 1
+    _conferir_gravado(armazenamento, tabela)
+
+
+def test_lote_junta_tabela_inteira_com_edicoes_depois(armazenamento, tabela):
+    novas = gerar_tabela_sintetica(3).assign(ID=[901, 902, 903])
+    novas["EMAIL"] = "novo." + novas["EMAIL"]
+    with armazenamento.lote():
+        armazenamento.salvar(tabela, _editar(tabela, 5, 4.25))
+        # Regravação completa no meio do lote (ex.: troca de política)
+        armazenamento.salvar(tabela, None)
+        armazenamento.salvar(tabela, _editar(tabela, 7, 8.5))
+
+        tabela = anexar_linhas(tabela, novas)
+        alteracoes = RegistroAlteracoes()
+        alteracoes.marcar_inseridos([901, 902, 903])
+        armazenamento.salvar(tabela, alteracoes)
+
+        excluidos = tabela["ID"].isin([902, tabela.at[9, "ID"]])
+        alteracoes = RegistroAlteracoes()
+        for user_id in tabela.loc[excluidos, "ID"]:
+            alteracoes.marcar_excluido(user_id)
+        tabela = tabela[~excluidos]
+        armazenamento.salvar(tabela, alteracoes)
+    assert armazenamento.gravacoes == 1
+    _conferir_gravado(armazenamento, tabela)
+
+
+def test_lote_sem_alteracoes_nao_grava(armazenamento, tabela):
+    with armazenamento.lote():
+        armazenamento.salvar(tabela, RegistroAlteracoes())
+    assert armazenamento.gravacoes == 0
+    assert armazenamento.ultimo_lote == {"linhas": 0, "bytes": 0}
+
+
+def test_lote_com_erro_nao_grava(armazenamento, tabela):
+    original = tabela.copy()
+    with pytest.raises(RuntimeError):
+        with armazenamento.lote():
+            armazenamento.salvar(tabela, _editar(tabela, 3, 0.5))
+            raise RuntimeError
+    assert armazenamento.gravacoes == 0
+    _conferir_gravado(armazenamento, original)
+
+
+def test_salvar_de_outra_thread_nao_entra_no_lote(armazenamento, tabela):
+    with armazenamento.lote():
+        outra = threading.Thread(
+            target=armazenamento.salvar, args=(tabela, _editar(tabela, 3, 6.0))
+        )
+        outra.start()
+        outra.join()
+        assert armazenamento.gravacoes == 1
+    assert armazenamento.gravacoes == 1
+
+
+# === GRAVAÇÃO EM SEGUNDO PLANO
+def _esperar(condicao, prazo=5.0):
+    limite = time.monotonic() + prazo
+    while not condicao() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_gravador_compacta_o_diario_quando_fica_ocioso(tmp_path, tabela):
+    caminho = str(tmp_path / "usuarios.csv")
+    backend = ArmazenamentoCSV(caminho, usar_diario=True)
+    backend.salvar(tabela)
+    gravador = GravadorEmSegundoPlano(backend, compactar_ocioso=0.05)
+    try:
+        gravador.enviar(tabela, _editar(tabela, 3, 4.25))
+        gravador.aguardar()
+        assert _esperar(lambda: len(backend.diario) == 0)
+    finally:
+        gravador.parar()
+    assert [r["erro"] for r in gravador.coletar_concluidos()] == [None]
+    # O CSV sozinho (o que o programa em C lê) já tem a edição
+    _conferir_gravado(ArmazenamentoCSV(caminho), tabela)
+
+
+def test_gravador_informa_falha_da_compactacao(tmp_path, tabela):
+    backend = ArmazenamentoCSV(str(tmp_path / "usuarios.csv"), usar_diario=True)
+    backend.salvar(tabela)
+
+    def falhar():
+        raise PermissionError("sem permissão")
+
+    backend.compactar = falhar
+    gravador = GravadorEmSegundoPlano(backend, compactar_ocioso=0.05)
+    concluidos = []
+    try:
+        gravador.enviar(tabela, _editar(tabela, 3, 4.25))
+        assert _esperar(
+            lambda: concluidos.extend(gravador.coletar_concluidos())
+            or len(concluidos) == 2
+        )
+    finally:
+        gravador.parar()
+    assert [r["compactacao"] for r in concluidos] == [False, True]
+    assert isinstance(concluidos[1]["erro"], PermissionError)
+
+
+def test_gravador_devolve_os_avisos_de_quem_foi_gravado(armazenamento, tabela):
+    gravador = GravadorEmSegundoPlano(armazenamento)
+    try:
+        gravador.enviar(tabela, _editar(tabela, 3, 4.25), ("Sucesso", "editado"))
+        gravador.enviar(tabela, _editar(tabela, 10, 6.5))
+        gravador.aguardar()
+    finally:
+        gravador.parar()
+    avisos = [a for r in gravador.coletar_concluidos() for a in r["avisos"]]
+    assert avisos == [("Sucesso", "editado")]
@@ -0,0 +1,51 @@
+"""Fluxo das telas de edição: validar todos os campos antes de gravar a linha."""
+
+import pytest
+
+from armazenamento import ArmazenamentoCSV, RegistroAlteracoes
+from armazenamento_sqlite import ArmazenamentoSQLite
+from indices import converter_campos_usuario, definir_valores
+from notas import motor_notas
+
+TEXTOS = {"NOME": "editado", "EMAIL": "Editado@unip.br", "NP1": "5", "NP2": "6"}
+
+
+def test_edicao_recusada_nao_muda_a_linha(tabela):
+    rotulo = tabela.index[100]
+    antes = tabela.loc[rotulo].copy()
+    alteracoes = RegistroAlteracoes()
+    # Campo inválido depois de campos válidos: nada pode ter sido gravado
+    with pytest.raises(ValueError):
+        definir_valores(
+            tabela, rotulo, converter_campos_usuario({**TEXTOS, "NP2": "11"})
+        )
+        alteracoes.marcar_atualizado(tabela.at[rotulo, "ID"])
+    assert tabela.loc[rotulo].equals(antes)
+    assert alteracoes.vazio
+
+
+@pytest.mark.parametrize(
+    "criar",
+    [
+        lambda pasta: ArmazenamentoCSV(str(pasta / "usuarios.csv"), usar_diario=True),
+        lambda pasta: ArmazenamentoSQLite(str(pasta / "usuarios.db")),
+    ],
+    ids=["diario", "sqlite"],
+)
+def test_edicao_corrigida_chega_ao_armazenamento(tabela, tmp_path, criar):
+    armazenamento = criar(tmp_path)
+    armazenamento.salvar(tabela)
+    rotulo = tabela.index[100]
+    user_id = tabela.at[rotulo, "ID"]
+
+    definir_valores(tabela, rotulo, converter_campos_usuario(TEXTOS))
+    motor_notas.recalcular(tabela, [rotulo])
+    alteracoes = RegistroAlteracoes()
+    alteracoes.marcar_atualizado(user_id)
+    armazenamento.salvar(tabela, alteracoes)
+
+    salvo = armazenamento.carregar()
+    linha = salvo[salvo["ID"] == user_id].iloc[0]
+    assert linha["NOME"] == "EDITADO"
+    assert linha["EMAIL"] == "editado@unip.br"
+    assert linha["NP2"] == 6
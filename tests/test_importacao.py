@@ -0,0 +1,58 @@
+"""Importação e exportação de usuários e notas (importacao.py)."""
+
+import json
+
+import pandas as pd
+import pytest
+
+from armazenamento import SequenciaIDs, compactar_tipos
+from importacao import exportar_usuarios, importar_notas, importar_usuarios
+from indices import IndiceUsuarios
+from notas import COLUNAS_PROVAS
+
+COLUNAS_IDA_E_VOLTA = ["NOME", "EMAIL", *COLUNAS_PROVAS, "MEDIA"]
+
+
+def test_jsonl_da_tabela_compacta_tem_duas_casas(tabela, tmp_path):
+    caminho = tmp_path / "usuarios.jsonl"
+    exportar_usuarios(compactar_tipos(tabela), str(caminho))
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            registro = json.loads(linha)
+            for col in ["np1", "np2", "pim", "media"]:
+                assert round(registro[col], 2) == registro[col], registro
+
+
+@pytest.mark.parametrize("extensao", ["csv", "jsonl"])
+def test_ida_e_volta_da_tabela_compacta(tabela, tmp_path, extensao):
+    caminho = tmp_path / f"usuarios.{extensao}"
+    exportar_usuarios(compactar_tipos(tabela), str(caminho))
+    volta, resultado = importar_usuarios(
+        None,
+        str(caminho),
+        IndiceUsuarios(None),
+        SequenciaIDs(str(tmp_path / "usuarios.csv")),
+    )
+    assert resultado["relatorio"].empty
+    pd.testing.assert_frame_equal(
+        volta[COLUNAS_IDA_E_VOLTA].reset_index(drop=True),
+        tabela[COLUNAS_IDA_E_VOLTA].reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_importar_notas_da_turma_recusa_outras_turmas(tabela, tmp_path):
+    alunos = tabela[tabela["NIVEL"] == "ALUNO"]
+    turma = str(alunos["ID_TURMAS"].iloc[0])
+    planilha = pd.DataFrame({"ID": alunos["ID"], "NP1": 5.0})
+    caminho = tmp_path / "notas.csv"
+    planilha.to_csv(caminho, sep=";", index=False)
+
+    resultado = importar_notas(
+        tabela, str(caminho), IndiceUsuarios(tabela), turma=turma
+    )
+    da_turma = (alunos["ID_TURMAS"].astype(str) == turma).to_numpy()
+    assert resultado["validas"] == da_turma.sum()
+    assert len(resultado["relatorio"]) == (~da_turma).sum()
+    assert (tabela.loc[alunos.index[da_turma], "NP1"] == 5.0).all()
+    assert (tabela.loc[alunos.index[~da_turma], "NP1"] != 5.0).any()
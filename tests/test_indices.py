@@ -0,0 +1,65 @@
+"""Índices em memória: busca por trecho e gravação de valores na tabela."""
+
+import numpy as np
+import pytest
+
+from armazenamento import COLUNAS_CATEGORICAS, compactar_tipos
+from benchmarks import gerar_tabela_sintetica
+from consultas import analisar_consulta, avaliar_consulta
+from indices import IndiceTrigramas, anexar_linhas, definir_valor, definir_valores
+
+
+def _com_cursos_vazios(tabela):
+    tabela["CURSO"] = tabela["CURSO"].astype(object)
+    tabela.loc[[0, 1], "CURSO"] = np.nan
+    return tabela
+
+
+def test_trigramas_montado_nao_casa_vazio_com_nan(tabela):
+    indice = IndiceTrigramas(_com_cursos_vazios(tabela)["CURSO"])
+    assert not len(indice.buscar("nan"))
+    assert not {0, 1} & set(indice.buscar("n"))
+
+
+def test_trigramas_atualizado_nao_casa_vazio_com_nan(tabela):
+    indice = IndiceTrigramas(tabela["CURSO"])
+    indice.atualizar(2, np.nan)
+    assert 2 not in set(indice.buscar("nan"))
+    assert 2 not in set(indice.buscar("n"))
+
+
+def test_contem_nao_casa_vazio_com_nan(tabela):
+    tabela = _com_cursos_vazios(tabela)
+    arvore = analisar_consulta('CURSO CONTEM "nan"', tabela)
+    assert not avaliar_consulta(tabela, arvore).any()
+
+
+def _tipos_numericos(df):
+    return df.dtypes.drop(COLUNAS_CATEGORICAS)
+
+
+@pytest.mark.parametrize("valor, esperado", [(20.5, 20), (np.nan, 0), (30.0, 30)])
+def test_definir_valor_mantem_int32(tabela, valor, esperado):
+    df = compactar_tipos(tabela)
+    tipos = _tipos_numericos(df)
+    definir_valor(df, 0, "IDADE", valor)
+    assert _tipos_numericos(df).equals(tipos)
+    assert df.at[0, "IDADE"] == esperado
+
+
+def test_definir_valores_mantem_tipos_compactos(tabela):
+    df = compactar_tipos(tabela)
+    tipos = _tipos_numericos(df)
+    definir_valores(df, 2, {"IDADE": 30.0, "NP1": 7.5, "MEDIA": np.nan})
+    assert _tipos_numericos(df).equals(tipos)
+    assert df.at[2, "IDADE"] == 30 and df.at[2, "NP1"] == np.float32(7.5)
+
+
+def test_anexar_linhas_com_idade_float_mantem_int32(tabela):
+    df = compactar_tipos(tabela)
+    tipos = _tipos_numericos(df)
+    novas = gerar_tabela_sintetica(2).astype({"IDADE": np.float64})
+    novas.loc[0, "IDADE"] = np.nan
+    df = anexar_linhas(df, novas)
+    assert _tipos_numericos(df).equals(tipos)
+    assert df["IDADE"].iloc[-2] == 0